@@ -0,0 +1,89 @@
+"""
+Size and scan time of the device_reading table.
+
+Reports data/index size and average row length from information_schema,
+then times a full scan aggregate over the typed columns and the RPM
+date range query. Run it before and after moving the raw payloads to
+device_reading_raw with a label for each run.
+
+Usage (with the same environment variables as the Lambda):
+    python benchmarks/device_reading_storage.py --label before [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "layers", "utilLayer"))
+
+TABLE_SIZE_QUERY = """
+SELECT table_name,
+       table_rows,
+       avg_row_length,
+       data_length,
+       index_length
+FROM   information_schema.tables
+WHERE  table_schema = DATABASE()
+       AND table_name IN ( 'device_reading', 'device_reading_raw' )
+"""
+
+FULL_SCAN_QUERY = """
+SELECT COUNT(*),
+       AVG(systolic),
+       AVG(diastolic),
+       AVG(pulse)
+FROM   device_reading
+"""
+
+RANGE_SCAN_QUERY = """
+SELECT imei,
+       DATE(timestamp),
+       COUNT(*)
+FROM   device_reading
+WHERE  timestamp >= NOW() - INTERVAL 30 DAY
+GROUP  BY imei,
+          DATE(timestamp)
+"""
+
+
+def time_query(cnx, query, runs):
+    timings = []
+    for _ in range(runs):
+        tic = time.perf_counter()
+        with cnx.cursor() as cursor:
+            cursor.execute(query)
+            cursor.fetchall()
+        timings.append(time.perf_counter() - tic)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--label", default="current")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from shared import get_db_connect, read_as_dict
+
+    cnx = get_db_connect()
+    with cnx.cursor() as cursor:
+        cursor.execute("ANALYZE TABLE device_reading")
+        cursor.fetchall()
+    print(f"[{args.label}]")
+    for row in read_as_dict(cnx, TABLE_SIZE_QUERY) or []:
+        row = {key.lower(): value for key, value in row.items()}
+        print(
+            f"{row['table_name']:20} rows {row['table_rows']:>12} "
+            f"avg row {row['avg_row_length']:>6} B  "
+            f"data {row['data_length'] / 2 ** 20:10.1f} MB  "
+            f"index {row['index_length'] / 2 ** 20:10.1f} MB"
+        )
+    for name, query in (("full scan", FULL_SCAN_QUERY), ("30d range", RANGE_SCAN_QUERY)):
+        median, worst = time_query(cnx, query, args.runs)
+        print(f"{name:10} median {median * 1000:10.2f} ms  max {worst * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Cold vs warm latency of the patient guidelines endpoint in one process.
+
+The first call includes the module import and the connection setup
+(Secrets Manager + MySQL connect), the following calls reuse the
+container state the same way warm Lambda invocations do.
+
+Usage (with the same environment variables as the Lambda):
+    python benchmarks/guidelines_latency.py <patient_id> [--calls 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "layers", "utilLayer"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "patient-service"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("patient_id")
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+    event = {"pathParameters": {"patient_id": args.patient_id}}
+
+    tic = time.perf_counter()
+    import patient_guidelines
+
+    patient_guidelines.lambda_handler(event, None)
+    cold = time.perf_counter() - tic
+
+    warm = []
+    for _ in range(args.calls):
+        tic = time.perf_counter()
+        response = patient_guidelines.lambda_handler(event, None)
+        warm.append(time.perf_counter() - tic)
+        assert response["statusCode"] == 200, response
+
+    warm.sort()
+    p50 = statistics.median(warm)
+    p95 = warm[int(len(warm) * 0.95) - 1]
+    print(f"cold call:  {cold * 1000:8.2f} ms")
+    print(f"warm p50:   {p50 * 1000:8.2f} ms")
+    print(f"warm p95:   {p95 * 1000:8.2f} ms")
+    print(f"warm/cold:  {p50 / cold:8.2%}")
+
+
+if __name__ == "__main__":
+    main()
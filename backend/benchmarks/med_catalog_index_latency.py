@@ -0,0 +1,134 @@
+"""
+Medication search latency, local prefix index vs the remote catalog.
+
+Builds the index from an RxTerms extract (--rxterms) or from a synthetic
+catalog of --products names, then runs the same typeahead queries against
+MedCatalogIndex.search and, without the catalog cache, against the remote
+search: the stand-in of med_catalog_latency.py with --delay ms by default,
+the NLM ClinicalTables service with --live.
+
+Usage:
+    python benchmarks/med_catalog_index_latency.py [--rxterms RxTerms202610.txt]
+        [--products 20000] [--queries 500] [--delay 120] [--live]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "layers", "utilLayer"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "medication-service"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "migration-script"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+LIVE_SEARCH_URL = (
+    "https://clinicaltables.nlm.nih.gov/api/rxterms/v3/search"
+    "?ef=STRENGTHS_AND_FORMS,RXCUIS&terms="
+)
+SYLLABLES = "met for lo sar tan am di pine ator va sta pro zole cef ex ol ril".split()
+ROUTES = ["(Oral Pill)", "(Oral Liquid)", "(Injectable)", "(Topical)"]
+
+
+def synthetic_products(count, rng):
+    products = {}
+    while len(products) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        name = f"{word} {rng.choice(ROUTES)}"
+        if rng.random() < 0.2:
+            other = rng.choice(SYLLABLES) + rng.choice(SYLLABLES)
+            name = f"{word} / {other} {ROUTES[0]}"
+        products[name] = {
+            "productName": name,
+            "strengthsAndForms": ["10 mg Tab", "20 mg Tab"],
+            "rxcuis": [str(rng.randint(100000, 999999)) for _ in range(2)],
+        }
+    return list(products.values())
+
+
+def typeahead_queries(products, count, rng):
+    queries = []
+    for _ in range(count):
+        word = rng.choice(products)["productName"].split()[0]
+        queries.append(word[: rng.randint(3, max(len(word), 3))])
+    return queries
+
+
+def timed(search, queries):
+    timings = []
+    for query in queries:
+        tic = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - tic)
+    return sorted(timings)
+
+
+def summary(label, timings):
+    p50 = statistics.median(timings)
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    print(f"{label:<14} p50 {p50 * 1000:9.3f} ms   p99 {p99 * 1000:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rxterms")
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=120, help="stand-in latency, ms")
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    from med_catalog import MedCatalogClient
+    from med_catalog_index import MedCatalogIndex, write_index
+
+    if args.rxterms:
+        from build_med_catalog_index import read_rxterms
+
+        products = read_rxterms(args.rxterms)
+    else:
+        products = synthetic_products(args.products, rng)
+    queries = typeahead_queries(products, args.queries, rng)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "med_catalog.idx")
+        tic = time.perf_counter()
+        product_count, key_count = write_index(products, path)
+        build = time.perf_counter() - tic
+        tic = time.perf_counter()
+        index = MedCatalogIndex(path)
+        load = time.perf_counter() - tic
+        print(
+            f"index: {product_count} products, {key_count} keys, "
+            f"{os.path.getsize(path) / 1024:.0f} KiB, built in {build:.2f} s, "
+            f"mapped in {load * 1000:.3f} ms"
+        )
+        summary("local index", timed(lambda query: index.search(query, 20), queries))
+        index.map.close()
+
+    if args.live:
+        search_url = LIVE_SEARCH_URL
+        server = None
+    else:
+        from med_catalog_latency import StandInCatalog
+
+        server = StandInCatalog(0, args.delay / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        search_url = server.search_url
+    # no cache, every query goes to the remote service like a cold lookup
+    remote = MedCatalogClient(search_url, "", 0, 0, 1)
+    remote_queries = queries[: min(len(queries), 100)]
+    summary(
+        "remote search",
+        timed(lambda query: remote.search_products(query, 20), remote_queries),
+    )
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
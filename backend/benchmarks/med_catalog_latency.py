@@ -0,0 +1,199 @@
+"""
+Typeahead latency of the medication search against a local stand-in
+of the RxNav / ClinicalTables web services.
+
+The stand-in answers the two endpoints the medication service calls with
+canned responses after --delay ms, the time a round trip to the NLM
+services usually takes from a Lambda. Two users type the same drug names
+one key at a time; the first pays a round trip per keystroke, the second
+is served from the catalog cache. A burst of concurrent identical lookups
+shows the coalescing: the stand-in sees one request for the burst.
+
+Usage:
+    python benchmarks/med_catalog_latency.py [--delay 120] [--threads 8]
+    python benchmarks/med_catalog_latency.py --serve [--port 8089]
+
+--serve only runs the stand-in, point CLINICALTABLES_URL and RXCUIS_URL
+at it to run the medication lambdas locally (sam local) without the NLM services.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "layers", "utilLayer"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "medication-service"))
+
+DRUG_NAMES = [
+    "metformin",
+    "lisinopril",
+    "amlodipine",
+    "atorvastatin",
+    "losartan",
+    "furosemide",
+    "carvedilol",
+    "levothyroxine",
+]
+FORMS = ["250 mg Tab", "500 mg Tab", "1000 mg Tab", "10 mg/ml Sol"]
+
+
+def search_response(terms, max_list):
+    names = [name for name in DRUG_NAMES if name.startswith(terms.lower())]
+    names = [f"{name} (Oral Pill)" for name in names][:max_list]
+    return [
+        len(names),
+        names,
+        {
+            "STRENGTHS_AND_FORMS": [FORMS for _ in names],
+            "RXCUIS": [[str(861000 + i), str(861100 + i)] for i in range(len(names))],
+        },
+        None,
+    ]
+
+
+def rxcui_response(rxcui):
+    return {
+        "rxcuiStatusHistory": {
+            "attributes": {"rxcui": rxcui, "name": "metformin 500 MG Oral Tablet"},
+            "definitionalFeatures": {
+                "ingredientAndStrength": [
+                    {
+                        "activeIngredientRxcui": "6809",
+                        "activeIngredientName": "metformin",
+                        "numeratorValue": "500",
+                        "numeratorUnit": "MG",
+                        "denominatorValue": "1",
+                        "denominatorUnit": "1",
+                    }
+                ],
+                "doseFormConcept": [{"doseFormName": "Oral Tablet"}],
+            },
+        }
+    }
+
+
+class StandInCatalog(ThreadingHTTPServer):
+    """
+    Stand-in of the NLM medication web services, counts the requests it served
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port, delay):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.delay = delay
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def search_url(self):
+        return (
+            f"http://127.0.0.1:{self.server_port}/api/rxterms/v3/search"
+            "?ef=STRENGTHS_AND_FORMS,RXCUIS&terms="
+        )
+
+    @property
+    def rxcui_url(self):
+        return (
+            f"http://127.0.0.1:{self.server_port}/REST/rxcui/{{rxcui}}/historystatus.json"
+        )
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.delay)
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if url.path.endswith("/search"):
+            query = parse_qs(url.query)
+            body = search_response(
+                query.get("terms", [""])[0], int(query.get("maxList", ["20"])[0])
+            )
+        elif parts[:2] == ["REST", "rxcui"] and len(parts) == 4:
+            body = rxcui_response(parts[2])
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def type_names(handler, timings):
+    """
+    Searches every drug name one keystroke at a time from 3 characters
+    """
+    for name in DRUG_NAMES:
+        for end in range(3, len(name) + 1):
+            event = {"queryStringParameters": {"name": name[:end], "max_results": "20"}}
+            tic = time.perf_counter()
+            response = handler(event, None)
+            timings.append(time.perf_counter() - tic)
+            assert response["statusCode"] == 200, response
+
+
+def summary(label, timings):
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    print(f"{label:<18} p50 {p50 * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=120, help="stand-in latency, ms")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--serve", action="store_true")
+    args = parser.parse_args()
+
+    server = StandInCatalog(args.port, args.delay / 1000)
+    if args.serve:
+        print(f"CLINICALTABLES_URL={server.search_url}")
+        print(f"RXCUIS_URL={server.rxcui_url}")
+        server.serve_forever()
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["CLINICALTABLES_URL"] = server.search_url
+    os.environ["RXCUIS_URL"] = server.rxcui_url
+
+    import find_med_webservice
+    from med_catalog import catalog
+
+    first, second = [], []
+    type_names(find_med_webservice.lambda_handler, first)
+    served = server.requests
+    type_names(find_med_webservice.lambda_handler, second)
+    summary("first user", first)
+    summary("second user", second)
+    print(f"stand-in requests: {served} then {server.requests - served}")
+
+    catalog.cache.clear()
+    served = server.requests
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(catalog.get_rxcui_history, ["861004"] * args.threads))
+    lookups = server.requests - served
+    print(f"{args.threads} concurrent rxcui lookups: {lookups} request(s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Per row vs columnar transform of the Remote vitals rows of the vital signs api.
+
+Generates synthetic device readings, checks both paths produce the same rows
+with the legacy fixed -5h AM/PM shift (Etc/GMT+5) and reports the time of
+each path at every size. No database is needed.
+
+Usage:
+    python benchmarks/rm_values_transform.py [--sizes 1000 10000 100000] [--runs 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from calendar import timegm
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "patient-service"))
+
+from rm_vitals import get_timezone, transform_rm_readings  # noqa: E402
+
+
+def make_rows(count):
+    random.seed(count)
+    now = datetime(2024, 3, 1)
+    return [
+        (
+            index,
+            random.randint(13000, 22000),
+            random.randint(8000, 13000),
+            random.randint(50, 110),
+            random.choice((0, 1)),
+            now - timedelta(seconds=random.randint(0, 180 * 24 * 3600)),
+        )
+        for index in range(count)
+    ]
+
+
+def to_epoch_rows(rows):
+    """
+    The rows as RM_VALES_QUERY returns them, timestamp in epoch seconds
+    """
+    return [row[:5] + (timegm(row[5].timetuple()),) for row in rows]
+
+
+def legacy_transform(rows):
+    """
+    The per row loop get_rm_values used before the columnar path
+    """
+    final_rm_values = []
+    for key_id, systolic, diastolic, pulse, irregular, bpt in rows:
+        bp_top = int(round(int(systolic) * 0.0075006))
+        bp_bot = int(round(int(diastolic) * 0.0075006))
+        bp_join = str(bp_top) + "/" + str(bp_bot)
+        final_rm_values.append(
+            {
+                "bp_taken_on": bpt.strftime("%m-%d-%Y %I:%M %p"),
+                "am_bp": bp_join
+                if (bpt - timedelta(hours=5)).strftime("%p") == "AM"
+                else "",
+                "pm_bp": bp_join
+                if (bpt - timedelta(hours=5)).strftime("%p") == "PM"
+                else "",
+                "h_pulse": pulse,
+                "reg": "Regular" if str(irregular) == "0" else "Irregular",
+                "key_id": key_id,
+            }
+        )
+    return final_rm_values
+
+
+def time_call(func, runs):
+    timings = []
+    for _ in range(runs):
+        tic = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - tic)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    fixed_offset = get_timezone("Etc/GMT+5")
+    local = get_timezone("America/Chicago")
+
+    for size in args.sizes:
+        rows = make_rows(size)
+        epoch_rows = to_epoch_rows(rows)
+        assert legacy_transform(rows) == transform_rm_readings(epoch_rows, fixed_offset)
+        legacy = time_call(lambda: legacy_transform(rows), args.runs)
+        columnar = time_call(
+            lambda: transform_rm_readings(epoch_rows, local), args.runs
+        )
+        print(
+            f"{size:>7} readings  per row {legacy * 1000:9.2f} ms  "
+            f"columnar {columnar * 1000:9.2f} ms  speedup {legacy / columnar:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import logging
+import os
+
+from billing_records import parse_billing_codes
+from custom_exception import GeneralException
+from shared import get_user_org_ids, read_as_dict
+from sqls.billing import (
+    GET_BILLING_BY_PATIENT_AND_ORGS,
+    GET_BILLING_BY_PATIENT_AND_PROVIDER,
+    GET_RM_ENABLED_PROVIDER,
+)
+
+logger = logging.getLogger(__name__)
+
+default_page_size = int(os.getenv("BILLING_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 500
+
+
+def get_page_params(query_params):
+    """
+    Returns the (page, page_size) of the listing, page is 0 based
+    and page_size is capped at MAX_PAGE_SIZE
+    """
+    query_params = query_params or {}
+    page = query_params.get("page")
+    page_size = query_params.get("page_size")
+    page = int(page) if page and page.isdigit() else 0
+    page_size = (
+        int(page_size)
+        if page_size and page_size.isdigit() and int(page_size) > 0
+        else default_page_size
+    )
+    return page, min(page_size, MAX_PAGE_SIZE)
+
+
+def get_common_org_id(cnx, patient_id, provider_id):
+    """
+    Returns list of common org ids for the input patient and provider
+    """
+    pat_orgs = get_user_org_ids(cnx, "patient", internal_id=patient_id)
+    prv_orgs = get_user_org_ids(cnx, "providers", internal_id=provider_id)
+    common_org = set(pat_orgs).intersection(set(prv_orgs))
+    if common_org:
+        return list(common_org)
+    return None
+
+
+def list_billing(
+    cnx, patient_id, provider_id, page=0, page_size=None, include_own=True
+):
+    """
+    Returns a page of bills of the patient, latest date of service first.
+    The bills of the common orgs are listed for RM enabled providers,
+    otherwise the bills of the provider. Approved bills are always included,
+    drafts only for the requesting provider when include_own is set.
+    Charges and diagnoses are returned as parsed lists
+    """
+    page_size = page_size or default_page_size
+    params = {
+        "patient_id": patient_id,
+        "provider_id": provider_id,
+        "include_own": include_own,
+        "offset": page * page_size,
+        "page_size": page_size,
+    }
+    query = GET_BILLING_BY_PATIENT_AND_PROVIDER
+    if read_as_dict(cnx, GET_RM_ENABLED_PROVIDER, {"provider_id": provider_id}):
+        orgs = get_common_org_id(cnx, patient_id, provider_id)
+        if orgs:
+            query = GET_BILLING_BY_PATIENT_AND_ORGS
+            params["org_ids"] = tuple(orgs)
+    records = read_as_dict(cnx, query, params) or []
+    for rec in records:
+        try:
+            rec["charges"] = parse_billing_codes(rec["charges"])
+            rec["diagnoses"] = parse_billing_codes(rec["diagnoses"])
+        except GeneralException as err:
+            logger.error("billing %s: %s", rec["id"], err)
+            rec["charges"], rec["diagnoses"] = [], []
+    return records
+
+
+def get_last_billing(cnx, patient_id, provider_id):
+    """
+    Returns the latest approved bill for the selected patient and provider
+    """
+    records = list_billing(cnx, patient_id, provider_id, page_size=1, include_own=False)
+    return records[0] if records else {}
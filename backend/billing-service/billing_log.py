@@ -1,65 +1,57 @@
 import json
 import logging
+from http import HTTPStatus
 
-from shared import get_db_connect, get_headers, get_phi_data_list, read_as_dict
+from billing_log_export import EXPORT_FORMATS, get_export_status, start_export
+from billing_log_listing import (
+    BillingLogReadError,
+    get_billing_log,
+    get_log_params,
+)
+from custom_exception import GeneralException
+from shared import get_db_connect, get_headers
 
 logger = logging.getLogger(__name__)
 cnx = get_db_connect()
 
 
-def get_billing_log(org_id):
-    """
-    This function returns list of approved bills for the input org id
-    """
-    query = """ SELECT DATE_FORMAT(billing_detail.date_of_service, '%%a, %%d %%b %%Y %%T') as date_of_service,
-                       billing_detail.billing_charge_code,
-                       providers.name,
-                       patients.username,
-                       patients.external_id
-                FROM   billing_detail
-                       join providers
-                         ON providers.internal_id = billing_detail.provider_internal_id
-                       join patients
-                         ON patients.internal_id = billing_detail.patient_internal_id
-                WHERE  billing_detail.billing_org_id = %s
-                       AND billing_detail.status = "approve"
-            """
-    billing_log = read_as_dict(cnx, query, (org_id))
-    ext_ids = [d.get("external_id") for d in billing_log] if billing_log else []
-    external_ids = list(set(ext_ids))
-    phi_data = get_phi_data_list(external_ids)
-    bill_charge = []
-    prov_name = []
-    dates_time = []
-    final_set = []
-    if billing_log:
-        for log in billing_log:
-            dates_time.append(log.get("date_of_service", ""))
-            prov_name.append(log.get("name", ""))
-            billing_charge_code = log.get("billing_charge_code", "").replace("'", '"')
-            bill_charge.append(json.loads(billing_charge_code))
-    for i, charges_on_a_date in enumerate(bill_charge):
-        phi = phi_data[ext_ids[i]]
-        for charge in charges_on_a_date:
-            item = {
-                "date_p": dates_time[i],
-                "patient": phi.get("first_name") + " " + phi.get("last_name"),
-                "prov": prov_name[i],
-                "code": charge.get("code", ""),
-                "desc": charge.get("desc", ""),
-            }
-            final_set.append(item)
-    return final_set
-
-
 def lambda_handler(event, context):
     """
     The api will handle listing for billing logs based on org id
     """
     auth_user = event["requestContext"].get("authorizer")
-    result = get_billing_log(auth_user["userOrg"])
+    query_params = event.get("queryStringParameters") or {}
+    path_params = event.get("pathParameters") or {}
+    try:
+        if path_params.get("export_id"):
+            result = get_export_status(auth_user["userOrg"], path_params["export_id"])
+            status_code = HTTPStatus.OK
+        elif query_params.get("export"):
+            if query_params["export"] not in EXPORT_FORMATS:
+                raise GeneralException("Invalid export format")
+            params = get_log_params(query_params)
+            result = start_export(auth_user["userOrg"], query_params["export"], params)
+            status_code = HTTPStatus.ACCEPTED
+        else:
+            params = get_log_params(query_params)
+            result = get_billing_log(cnx, auth_user["userOrg"], params)
+            status_code = HTTPStatus.OK
+    except BillingLogReadError as err:
+        logger.error(err)
+        return {
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
+    except GeneralException as err:
+        logger.error(err)
+        return {
+            "statusCode": HTTPStatus.BAD_REQUEST,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
     return {
-        "statusCode": 200,
+        "statusCode": status_code,
         "body": json.dumps(result, default=str),
         "headers": get_headers(),
     }
@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import date
+
+import boto3
+from billing_log_listing import iter_billing_log
+from botocore.exceptions import ClientError
+from custom_exception import GeneralException
+from s3_upload import S3MultipartWriter
+from shared import get_reusable_connection
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+aws_region = os.getenv("AWSREGION")
+export_bucket = os.getenv("EXPORT_BUCKET_NAME")
+export_function_name = os.getenv("EXPORT_FUNCTION_NAME")
+presigned_url_expiry = int(os.getenv("EXPORT_URL_EXPIRY", "900"))
+
+s3_client = boto3.client("s3", region_name=aws_region)
+lambda_client = boto3.client("lambda", region_name=aws_region)
+
+EXPORT_FORMATS = {"csv": "text/csv"}
+CSV_COLUMNS = ["date_p", "patient", "prov", "code", "desc"]
+# fail the export when less time than this is left, a timed out
+# invocation could not write its failure marker
+MIN_REMAINING_MILLIS = 30000
+
+
+def get_export_key(org_id, export_id):
+    """
+    Exports are keyed by org so a user can only poll the exports of their org
+    """
+    return f"billing-logs/{org_id}/{export_id}.csv"
+
+
+def get_failure_key(org_id, export_id):
+    """
+    Marker object written when an export fails, holding its error
+    """
+    return f"billing-logs/{org_id}/{export_id}.failed"
+
+
+def object_exists(key):
+    """
+    Returns True if the export bucket has the key
+    """
+    try:
+        s3_client.head_object(Bucket=export_bucket, Key=key)
+    except ClientError as err:
+        if err.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+            raise
+        return False
+    return True
+
+
+def start_export(org_id, export_format, params):
+    """
+    Invokes the export lambda asynchronously for the date range of params.
+    Returns the export id the client polls
+    """
+    export_id = uuid.uuid4().hex
+    lambda_client.invoke(
+        FunctionName=export_function_name,
+        InvocationType="Event",
+        Payload=json.dumps(
+            {
+                "export_id": export_id,
+                "org_id": org_id,
+                "export_format": export_format,
+                "params": params,
+            },
+            default=str,
+        ),
+    )
+    return {"export_id": export_id, "status": "queued"}
+
+
+def get_export_status(org_id, export_id):
+    """
+    Returns the download url once the export object exists,
+    the error once the failure marker exists
+    """
+    key = get_export_key(org_id, export_id)
+    if not object_exists(key):
+        try:
+            marker = s3_client.get_object(
+                Bucket=export_bucket, Key=get_failure_key(org_id, export_id)
+            )
+        except ClientError as err:
+            if err.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            return {"export_id": export_id, "status": "running"}
+        return {
+            "export_id": export_id,
+            "status": "failed",
+            "error": json.loads(marker["Body"].read())["error"],
+        }
+    return {
+        "export_id": export_id,
+        "status": "completed",
+        "url": s3_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": export_bucket, "Key": key},
+            ExpiresIn=presigned_url_expiry,
+        ),
+    }
+
+
+def run_export(cnx, event, context=None):
+    """
+    Streams every page of the billing log of the org to S3 as CSV.
+    Only one page of bills and its PHI is held in memory at a time,
+    the object only becomes visible when the upload completes.
+    A failed export writes its failure marker, an export that already
+    completed or failed is skipped on an asynchronous invoke retry.
+    Returns the number of rows, None when skipped
+    """
+    export_key = get_export_key(event["org_id"], event["export_id"])
+    failure_key = get_failure_key(event["org_id"], event["export_id"])
+    if object_exists(export_key) or object_exists(failure_key):
+        logger.info("Billing log export %s already ran", event["export_id"])
+        return None
+    writer = None
+    rows = 0
+    try:
+        params = dict(event["params"])
+        params["start_date"] = date.fromisoformat(params["start_date"])
+        params["end_date"] = date.fromisoformat(params["end_date"])
+        writer = S3MultipartWriter(
+            s3_client,
+            export_bucket,
+            export_key,
+            EXPORT_FORMATS[event["export_format"]],
+        )
+        writer.write(",".join(CSV_COLUMNS).encode() + b"\r\n")
+        for items in iter_billing_log(cnx, event["org_id"], params):
+            buffer = io.StringIO()
+            csv.DictWriter(buffer, fieldnames=CSV_COLUMNS).writerows(items)
+            writer.write(buffer.getvalue().encode())
+            rows += len(items)
+            if (
+                context
+                and context.get_remaining_time_in_millis() < MIN_REMAINING_MILLIS
+            ):
+                raise GeneralException("Export ran out of time")
+        writer.complete()
+    except Exception as err:
+        logger.exception(err)
+        if writer:
+            try:
+                writer.abort()
+            except ClientError as abort_err:
+                logger.error(abort_err)
+        s3_client.put_object(
+            Bucket=export_bucket,
+            Key=failure_key,
+            Body=json.dumps({"error": str(err)[:2000]}).encode(),
+            ContentType="application/json",
+        )
+        raise
+    return rows
+
+
+def lambda_handler(event, context):
+    """
+    Asynchronous task exporting the billing log of an org to S3
+    """
+    logger.info("Exporting billing log %s", event.get("export_id"))
+    rows = run_export(get_reusable_connection(), event, context)
+    logger.info("Exported %s billing log rows", rows)
+    return {"statusCode": 200, "body": json.dumps({"rows": rows})}
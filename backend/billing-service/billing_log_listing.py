@@ -0,0 +1,170 @@
+import base64
+import binascii
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from billing_listing import MAX_PAGE_SIZE, default_page_size
+from billing_records import parse_billing_codes
+from custom_exception import GeneralException
+from shared import get_phi_data_list, read_as_dict
+from sqls.billing import BILLING_LOG_AFTER, BILLING_LOG_PAGE, BILLING_LOG_SORT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+billing_log_days = int(os.getenv("BILLING_LOG_DAYS", "365"))
+
+SORT_ORDERS = {"asc": ("ASC", ">"), "desc": ("DESC", "<")}
+
+
+class BillingLogReadError(GeneralException):
+    """
+    A page of the billing log could not be read from MySQL
+    """
+
+
+def encode_cursor(row, sort):
+    """
+    Returns the opaque cursor of the page following the row
+    """
+    if sort == "provider":
+        value = row["name"] or ""
+    else:
+        value = str(row["date_of_service"])
+    return base64.urlsafe_b64encode(json.dumps([value, row["id"]]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (sort value, billing id) of the cursor
+    """
+    try:
+        value, billing_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(value), int(billing_id)
+    except (binascii.Error, ValueError, TypeError) as err:
+        raise GeneralException("Invalid cursor") from err
+
+
+def get_log_params(query_params):
+    """
+    Validates the billing log filters.
+    start_date and end_date are inclusive YYYY-MM-DD dates, the last
+    BILLING_LOG_DAYS by default. sort is date_of_service or provider,
+    order asc or desc
+    """
+    query_params = query_params or {}
+    try:
+        end_date = (
+            datetime.strptime(query_params["end_date"], "%Y-%m-%d").date()
+            if query_params.get("end_date")
+            else date.today()
+        )
+        start_date = (
+            datetime.strptime(query_params["start_date"], "%Y-%m-%d").date()
+            if query_params.get("start_date")
+            else end_date - timedelta(days=billing_log_days)
+        )
+    except ValueError as err:
+        raise GeneralException("Invalid Date format") from err
+    sort = query_params.get("sort") or "date_of_service"
+    order = query_params.get("order") or "desc"
+    if sort not in BILLING_LOG_SORT_COLUMNS:
+        raise GeneralException("Invalid sort")
+    if order not in SORT_ORDERS:
+        raise GeneralException("Invalid order")
+    page_size = query_params.get("page_size")
+    page_size = (
+        int(page_size)
+        if page_size and page_size.isdigit() and int(page_size) > 0
+        else default_page_size
+    )
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "sort": sort,
+        "order": order,
+        "page_size": min(page_size, MAX_PAGE_SIZE),
+        "cursor": query_params.get("cursor"),
+    }
+
+
+def get_billing_log_page(cnx, org_id, params):
+    """
+    Returns one page of approved bills of the org as
+    (bills, cursor of the next page or None).
+    Raises BillingLogReadError when the read fails, an empty page would end
+    the listing or the export early
+    """
+    column = BILLING_LOG_SORT_COLUMNS[params["sort"]]
+    direction, operator = SORT_ORDERS[params["order"]]
+    query_params = {
+        "org_id": org_id,
+        "start_date": params["start_date"],
+        "end_date": params["end_date"] + timedelta(days=1),
+        "page_size": params["page_size"] + 1,
+    }
+    after = ""
+    if params.get("cursor"):
+        query_params["after_value"], query_params["after_id"] = decode_cursor(
+            params["cursor"]
+        )
+        after = BILLING_LOG_AFTER.format(column=column, operator=operator)
+    query = BILLING_LOG_PAGE.format(after=after, column=column, direction=direction)
+    bills = read_as_dict(cnx, query, query_params)
+    if bills is None:
+        raise BillingLogReadError("Could not read the billing log")
+    next_cursor = None
+    if len(bills) > params["page_size"]:
+        bills = bills[: params["page_size"]]
+        next_cursor = encode_cursor(bills[-1], params["sort"])
+    return bills, next_cursor
+
+
+def iter_billing_log(cnx, org_id, params):
+    """
+    Yields the billing log items of every page of the date range,
+    PHI is only fetched for the bills of the current page
+    """
+    params = dict(params, cursor=None)
+    while True:
+        bills, params["cursor"] = get_billing_log_page(cnx, org_id, params)
+        yield to_log_items(bills)
+        if not params["cursor"]:
+            return
+
+
+def to_log_items(bills):
+    """
+    Expands the bills to one billing log item per charge
+    """
+    phi_data = get_phi_data_list(list({bill["external_id"] for bill in bills}))
+    items = []
+    for bill in bills:
+        try:
+            charges = parse_billing_codes(bill["billing_charge_code"])
+        except GeneralException as err:
+            logger.error("billing %s: %s", bill["id"], err)
+            continue
+        phi = phi_data.get(bill["external_id"]) or {}
+        patient = f"{phi.get('first_name', '')} {phi.get('last_name', '')}"
+        for charge in charges:
+            items.append(
+                {
+                    "date_p": bill["date_p"],
+                    "patient": patient,
+                    "prov": bill["name"],
+                    "code": charge.get("code", ""),
+                    "desc": charge.get("desc", ""),
+                }
+            )
+    return items
+
+
+def get_billing_log(cnx, org_id, params):
+    """
+    Returns a page of the approved bills of the org, one item per charge,
+    with the cursor of the next page
+    """
+    bills, next_cursor = get_billing_log_page(cnx, org_id, params)
+    return {"billing_log": to_log_items(bills), "next_cursor": next_cursor}
@@ -0,0 +1,57 @@
+import logging
+from datetime import datetime
+
+from shared import transaction
+from sqls.billing import (
+    APPROVE_DRAFT_BILLS,
+    ENQUEUE_CDS_SUBMISSION,
+    GET_UNSUBMITTED_APPROVED_BILLS,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def enqueue_cds_submissions(cursor, billing_ids):
+    """
+    Queues the approved bills for submission to CDS on the input cursor,
+    so the outbox rows commit with the approval.
+    Bills already submitted stay submitted
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "billing_id": billing_id,
+            "status": "queued",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_on": now,
+            "updated_on": now,
+        }
+        for billing_id in billing_ids
+    ]
+    if rows:
+        cursor.executemany(ENQUEUE_CDS_SUBMISSION, rows)
+    return len(rows)
+
+
+def approve_bills(cnx, billing_ids):
+    """
+    Approves the draft bills of providers with billing permission in one
+    statement and queues every approved bill without a CDS id for submission.
+    Returns the approved and queued bill ids
+    """
+    billing_ids = tuple({int(billing_id) for billing_id in billing_ids})
+    if not billing_ids:
+        return {"approved": 0, "queued": []}
+    with transaction(cnx) as cursor:
+        approved = cursor.execute(
+            APPROVE_DRAFT_BILLS,
+            {"billing_ids": billing_ids, "date_updated": datetime.now()},
+        )
+        cursor.execute(GET_UNSUBMITTED_APPROVED_BILLS, {"billing_ids": billing_ids})
+        queued = [row[0] for row in cursor.fetchall()]
+        enqueue_cds_submissions(cursor, queued)
+    logger.info("approved %s bills, queued %s for CDS", approved, len(queued))
+    return {"approved": approved, "queued": queued}
+
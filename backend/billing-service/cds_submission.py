@@ -0,0 +1,338 @@
+import json
+import logging
+import os
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from billing_records import parse_billing_codes
+from custom_exception import GeneralException
+from requests.adapters import HTTPAdapter
+from shared import (
+    get_phi_data_list,
+    get_reusable_connection,
+    get_secret_manager,
+    read_as_dict,
+    transaction,
+)
+from sqls.billing import (
+    CLAIM_CDS_SUBMISSIONS,
+    DELETE_CDS_DEAD_LETTERS,
+    FAIL_CDS_SUBMISSION,
+    GET_CLAIMED_CDS_SUBMISSIONS,
+    GET_LOCATIONS_OF_ZIPS,
+    INSERT_CDS_DEAD_LETTER,
+    MARK_CDS_SUBMITTED,
+    RETRY_CDS_SUBMISSION,
+    UPDATE_BILLING_REF_UID,
+)
+
+from cds_outbox import enqueue_cds_submissions
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+cds_secret_id = os.getenv("CDS_SECRET_ID", "")
+cds_concurrency = int(os.getenv("CDS_CONCURRENCY", "4"))
+cds_batch_size = int(os.getenv("CDS_BATCH_SIZE", "50"))
+cds_max_attempts = int(os.getenv("CDS_MAX_ATTEMPTS", "8"))
+cds_retry_base_seconds = int(os.getenv("CDS_RETRY_BASE_SECONDS", "60"))
+cds_retry_max_seconds = int(os.getenv("CDS_RETRY_MAX_SECONDS", "21600"))
+
+DEFAULT_LOCATION_ID = "26"
+CDS_TIMEOUT = (3.05, 10)
+# a claim older than this belongs to a worker that did not finish
+STALE_CLAIM_MINUTES = 15
+# stop claiming new batches when less time than this is left
+MIN_REMAINING_MILLIS = 30000
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+_cds_session = None
+
+
+class CdsSubmissionError(GeneralException):
+    """
+    A failed CDS submission, retryable unless the request itself is invalid
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def get_cds_session():
+    """
+    Returns the HTTP session to CDS, created once per container with a
+    connection pool sized to the submission concurrency
+    """
+    global _cds_session
+    if _cds_session is None:
+        cds_cred = get_secret_manager(cds_secret_id)
+        session = requests.Session()
+        session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=cds_concurrency, max_retries=0),
+        )
+        session.headers.update(
+            {
+                "Content-type": "application/json",
+                "Accept": "text/plain",
+                "Authorization": "Bearer " + cds_cred["CDS_TOKEN"],
+            }
+        )
+        session.encounters_url = cds_cred["CDS_SERVER"] + "encounters"
+        _cds_session = session
+    return _cds_session
+
+
+def list_procedures(charges, counter, record, diagnoses):
+    """
+    Returns Procedures Data based on input billing record,
+    diagnoses, priority, charges and diagnoses
+    """
+    procedures = []
+    icds = [
+        {"priority": d_count, "icd_code_name": diagnose["code"]}
+        for d_count, diagnose in enumerate(diagnoses, start=1)
+    ]
+    for charge in charges:
+        service_date = str(record["date_of_service"])[0:10]
+        procedures.append(
+            {
+                "cpt_code_name": charge["code"],
+                "quantity": 1,
+                "priority": counter,
+                "service_date_from": service_date,
+                "service_date_to": service_date,
+                "icds": icds,
+            }
+        )
+        counter = counter + 1
+    return procedures
+
+
+def get_provider_locations(cnx, submissions):
+    """
+    Returns provider external_id -> CDS location id, looked up by the zip code
+    of the provider address with one PHI batch and one location query.
+    Providers whose PHI or location could not be read are left out,
+    their bills are retried rather than sent to the default location
+    """
+    external_ids = list(
+        {sub["provider_external_id"] for sub in submissions if sub["provider_external_id"]}
+    )
+    if not external_ids:
+        return {}
+    phi_data = get_phi_data_list(external_ids)
+    zip_codes = {
+        external_id: phi_data[external_id].get("address_zip")
+        for external_id in external_ids
+        if phi_data.get(external_id)
+    }
+    zips = tuple({zip_code for zip_code in zip_codes.values() if zip_code})
+    location_ids = {}
+    if zips:
+        rows = read_as_dict(cnx, GET_LOCATIONS_OF_ZIPS, {"zips": zips})
+        if rows is None:
+            return {}
+        location_ids = {row["zip"]: row["ref_id"] for row in rows}
+    return {
+        external_id: location_ids.get(zip_code, DEFAULT_LOCATION_ID)
+        for external_id, zip_code in zip_codes.items()
+    }
+
+
+def build_cds_request(submission, location_id):
+    """
+    Returns the CDS encounter of the bill.
+    external_id_1 carries the billing id so a bill maps to one encounter
+    """
+    if not submission["patient_ref_uid"]:
+        raise CdsSubmissionError("patient ref_uid not found", retryable=False)
+    if not submission["provider_ref_uid"]:
+        raise CdsSubmissionError("provider ref_uid not found", retryable=False)
+    if location_id is None:
+        raise CdsSubmissionError("provider PHI or location not found")
+    return {
+        "service_provider_id": submission["provider_ref_uid"],
+        "service_location_id": location_id,
+        "patient_id": submission["patient_ref_uid"],
+        "procedures": list_procedures(
+            charges=parse_billing_codes(submission["billing_charge_code"]),
+            counter=1,
+            diagnoses=parse_billing_codes(submission["billing_diagnose_code"]),
+            record=submission,
+        ),
+        "external_id_1": str(submission["billing_id"]),
+        "external_id_2": str(submission["provider_internal_id"]),
+    }
+
+
+def post_encounter(cds_request):
+    """
+    Posts the encounter to CDS and returns the CDS id
+    """
+    session = get_cds_session()
+    try:
+        response = session.post(
+            session.encounters_url, data=json.dumps(cds_request), timeout=CDS_TIMEOUT
+        )
+    except requests.exceptions.RequestException as err:
+        raise CdsSubmissionError(f"CDS request failed: {err}") from err
+    if response.status_code >= 400:
+        raise CdsSubmissionError(
+            f"CDS responded {response.status_code}: {response.text[:500]}",
+            retryable=response.status_code in RETRYABLE_STATUS_CODES,
+        )
+    try:
+        response_json = response.json()
+        logger.info(
+            "for internal billing id %s: cds billing id assigned %s, "
+            "processed: %s, status_id: %s",
+            cds_request["external_id_1"],
+            response_json["id"],
+            response_json.get("processed"),
+            response_json.get("status_id"),
+        )
+        return response_json["id"]
+    except (ValueError, KeyError) as err:
+        raise CdsSubmissionError(f"Unexpected CDS response: {err}") from err
+
+
+def submit(submission, location_id):
+    """
+    Submits one claimed bill, returns (submission, request, cds_id, error)
+    """
+    cds_request = None
+    try:
+        if submission["ref_uid"]:
+            # already submitted by an earlier attempt
+            return submission, None, submission["ref_uid"], None
+        cds_request = build_cds_request(submission, location_id)
+        return submission, cds_request, post_encounter(cds_request), None
+    except GeneralException as err:
+        if not isinstance(err, CdsSubmissionError):
+            err = CdsSubmissionError(str(err), retryable=False)
+        return submission, cds_request, None, err
+
+
+def get_retry_delay(attempts):
+    """
+    Exponential backoff with jitter, capped at CDS_RETRY_MAX_SECONDS
+    """
+    delay = min(cds_retry_base_seconds * 2 ** (attempts - 1), cds_retry_max_seconds)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def record_results(cnx, results):
+    """
+    Stores the outcome of the submissions: the CDS id of the submitted bills,
+    the next attempt of the retryable failures and a dead letter for the bills
+    that failed permanently or ran out of attempts
+    """
+    now = datetime.utcnow()
+    summary = {"submitted": 0, "retried": 0, "dead_lettered": 0}
+    with transaction(cnx) as cursor:
+        for submission, cds_request, cds_id, error in results:
+            billing_id = submission["billing_id"]
+            attempts = submission["attempts"] + 1
+            if error is None:
+                params = {"billing_id": billing_id, "cds_id": cds_id, "updated_on": now}
+                cursor.execute(UPDATE_BILLING_REF_UID, params)
+                cursor.execute(MARK_CDS_SUBMITTED, params)
+                summary["submitted"] += 1
+                continue
+            logger.error("CDS submission of billing %s failed: %s", billing_id, error)
+            params = {
+                "billing_id": billing_id,
+                "attempts": attempts,
+                "last_error": str(error)[:2000],
+                "updated_on": now,
+            }
+            if error.retryable and attempts < cds_max_attempts:
+                params["next_attempt_at"] = now + get_retry_delay(attempts)
+                cursor.execute(RETRY_CDS_SUBMISSION, params)
+                summary["retried"] += 1
+                continue
+            cursor.execute(FAIL_CDS_SUBMISSION, params)
+            cursor.execute(
+                INSERT_CDS_DEAD_LETTER,
+                {
+                    **params,
+                    "request": json.dumps(cds_request) if cds_request else None,
+                    "failed_on": now,
+                },
+            )
+            summary["dead_lettered"] += 1
+    return summary
+
+
+def process_batch(cnx, worker_id):
+    """
+    Claims up to CDS_BATCH_SIZE due submissions and submits them
+    with CDS_CONCURRENCY parallel requests.
+    Returns the outcome counts, None when nothing was due
+    """
+    now = datetime.utcnow()
+    with transaction(cnx) as cursor:
+        claimed = cursor.execute(
+            CLAIM_CDS_SUBMISSIONS,
+            {
+                "worker_id": worker_id,
+                "now": now,
+                "stale_before": now - timedelta(minutes=STALE_CLAIM_MINUTES),
+                "batch_size": cds_batch_size,
+            },
+        )
+    if not claimed:
+        return None
+    submissions = read_as_dict(
+        cnx, GET_CLAIMED_CDS_SUBMISSIONS, {"worker_id": worker_id}
+    )
+    locations = get_provider_locations(cnx, submissions)
+    # created here, the submitting threads would race to create it
+    get_cds_session()
+    with ThreadPoolExecutor(max_workers=cds_concurrency) as executor:
+        results = list(
+            executor.map(
+                lambda sub: submit(sub, locations.get(sub["provider_external_id"])),
+                submissions,
+            )
+        )
+    return record_results(cnx, results)
+
+
+def requeue_dead_letters(cnx, billing_ids):
+    """
+    Moves dead lettered bills back to the outbox for a new round of attempts
+    """
+    with transaction(cnx) as cursor:
+        queued = enqueue_cds_submissions(cursor, billing_ids)
+        cursor.execute(DELETE_CDS_DEAD_LETTERS, {"billing_ids": tuple(billing_ids)})
+    return queued
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled worker of the CDS submission outbox.
+    Processes batches until the outbox has nothing due or the invocation
+    is close to its timeout. {"requeue_billing_ids": [...]} moves
+    dead lettered bills back to the outbox first
+    """
+    cnx = get_reusable_connection()
+    event = event or {}
+    if event.get("requeue_billing_ids"):
+        requeued = requeue_dead_letters(cnx, event["requeue_billing_ids"])
+        logger.info("requeued %s dead lettered bills", requeued)
+    worker_id = uuid.uuid4().hex
+    totals = {"submitted": 0, "retried": 0, "dead_lettered": 0}
+    while context is None or context.get_remaining_time_in_millis() > MIN_REMAINING_MILLIS:
+        summary = process_batch(cnx, worker_id)
+        if summary is None:
+            break
+        for key, count in summary.items():
+            totals[key] += count
+    logger.info("CDS submission run: %s", totals)
+    return {"statusCode": 200, "body": json.dumps(totals)}
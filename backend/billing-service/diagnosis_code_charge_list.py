@@ -1,6 +1,9 @@
 import json
 import logging
+from http import HTTPStatus
 
+from custom_exception import GeneralException
+from reference_data import get_reference_data, reference_data_response
 from shared import get_db_connect, get_headers, read_as_dict
 
 logger = logging.getLogger(__name__)
@@ -8,7 +11,7 @@ logger = logging.getLogger(__name__)
 cnx = get_db_connect()
 
 
-def get_diagnose_code_list():
+def get_diagnose_code_list(cnx):
     """
     Get the Diagnosis Code List
     """
@@ -20,7 +23,7 @@ def get_diagnose_code_list():
     return read_as_dict(cnx, query)
 
 
-def get_charge_code_list():
+def get_charge_code_list(cnx):
     """
     Get the Charge Code List
     """
@@ -36,8 +39,20 @@ def lambda_handler(event, context):
     """
     Handler Function
     """
-    if "charge" in event["path"].split("/"):
-        result = get_charge_code_list()
-    elif "diagnose" in event["path"].split("/"):
-        result = get_diagnose_code_list()
-    return {"statusCode": 200, "body": json.dumps(result), "headers": get_headers()}
+    try:
+        if "charge" in event["path"].split("/"):
+            body, etag = get_reference_data(
+                cnx, "charge_codes", ["code_detail"], get_charge_code_list
+            )
+        elif "diagnose" in event["path"].split("/"):
+            body, etag = get_reference_data(
+                cnx, "diagnosis_codes", ["code_detail"], get_diagnose_code_list
+            )
+    except GeneralException as err:
+        logger.exception(err)
+        return {
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR,
+            "body": json.dumps(str(err)),
+            "headers": get_headers(),
+        }
+    return reference_data_response(event, body, etag)
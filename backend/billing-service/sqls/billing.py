@@ -0,0 +1,233 @@
+GET_RM_ENABLED_PROVIDER = """
+SELECT 
+    remote_monitoring
+FROM
+    providers
+WHERE
+    internal_id = %(provider_id)s
+        AND remote_monitoring = 'Y';
+"""
+
+# Billing listing of a patient, the approved bills and the drafts
+# of the requesting provider (include_own), latest date of service first
+
+BILLING_LIST_COLUMNS = """
+SELECT 
+    CAST(billing_detail.patient_internal_id AS CHAR) AS patientId,
+    CAST(billing_detail.id AS CHAR) AS id,
+    CAST(billing_detail.provider_internal_id AS CHAR) AS providerId,
+    billing_detail.provider_name AS providerName,
+    billing_detail.billing_diagnose_code AS diagnoses,
+    billing_detail.billing_charge_code AS charges,
+    billing_detail.patient_location AS patientLocation,
+    billing_detail.provider_location AS providerLocation,
+    CAST(billing_detail.total_duration_billed AS CHAR) AS currentMonthContactTime,
+    billing_detail.`status` AS status,
+    DATE_FORMAT(billing_detail.date_of_service, '%%m-%%d-%%Y') AS dateOfService
+FROM
+    billing_detail
+"""
+
+BILLING_LIST_PAGE = """
+        AND (billing_detail.`status` = 'Approve'
+        OR (%(include_own)s
+        AND billing_detail.provider_internal_id = %(provider_id)s))
+ORDER BY billing_detail.date_of_service DESC, billing_detail.id DESC
+LIMIT %(offset)s, %(page_size)s;
+"""
+
+GET_BILLING_BY_PATIENT_AND_PROVIDER = (
+    BILLING_LIST_COLUMNS
+    + """
+WHERE
+    billing_detail.patient_internal_id = %(patient_id)s
+        AND billing_detail.provider_internal_id = %(provider_id)s"""
+    + BILLING_LIST_PAGE
+)
+
+GET_BILLING_BY_PATIENT_AND_ORGS = (
+    BILLING_LIST_COLUMNS
+    + """
+WHERE
+    billing_detail.patient_internal_id = %(patient_id)s
+        AND billing_detail.billing_org_id IN %(org_ids)s"""
+    + BILLING_LIST_PAGE
+)
+
+# CDS submission outbox, approved bills are queued in the approve transaction
+# and submitted to CDS by the cds_submission worker
+
+ENQUEUE_CDS_SUBMISSION = """
+INSERT INTO cds_submission_outbox (
+  billing_id, status, attempts, next_attempt_at, created_on, updated_on
+)
+VALUES
+  (
+    %(billing_id)s,
+    %(status)s,
+    %(attempts)s,
+    %(next_attempt_at)s,
+    %(created_on)s,
+    %(updated_on)s
+  )
+ON DUPLICATE KEY UPDATE
+  attempts = IF(status = 'submitted', attempts, 0),
+  next_attempt_at = IF(status = 'submitted', next_attempt_at, VALUES(next_attempt_at)),
+  last_error = IF(status = 'submitted', last_error, NULL),
+  updated_on = VALUES(updated_on),
+  status = IF(status = 'submitted', status, 'queued')
+"""
+
+APPROVE_DRAFT_BILLS = """
+UPDATE billing_detail
+       JOIN providers
+         ON providers.internal_id = billing_detail.provider_internal_id
+SET    billing_detail.`status` = 'Approve',
+       billing_detail.date_updated = %(date_updated)s
+WHERE  billing_detail.id IN %(billing_ids)s
+       AND billing_detail.`status` = 'Draft'
+       AND providers.billing_permission = 'Y'
+"""
+
+GET_UNSUBMITTED_APPROVED_BILLS = """
+SELECT id
+FROM   billing_detail
+WHERE  id IN %(billing_ids)s
+       AND `status` = 'Approve'
+       AND ref_uid IS NULL
+"""
+
+CLAIM_CDS_SUBMISSIONS = """
+UPDATE cds_submission_outbox
+SET    status = 'in_progress',
+       claimed_by = %(worker_id)s,
+       claimed_on = %(now)s
+WHERE  ( status = 'queued'
+         AND next_attempt_at <= %(now)s )
+        OR ( status = 'in_progress'
+             AND claimed_on < %(stale_before)s )
+ORDER  BY next_attempt_at
+LIMIT  %(batch_size)s
+"""
+
+GET_CLAIMED_CDS_SUBMISSIONS = """
+SELECT cds_submission_outbox.billing_id,
+       cds_submission_outbox.attempts,
+       billing_detail.patient_internal_id,
+       billing_detail.provider_internal_id,
+       billing_detail.date_of_service,
+       billing_detail.billing_charge_code,
+       billing_detail.billing_diagnose_code,
+       billing_detail.ref_uid,
+       patients.ref_uid AS patient_ref_uid,
+       providers.ref_uid AS provider_ref_uid,
+       providers.external_id AS provider_external_id
+FROM   cds_submission_outbox
+       JOIN billing_detail
+         ON billing_detail.id = cds_submission_outbox.billing_id
+       LEFT JOIN patients
+              ON patients.internal_id = billing_detail.patient_internal_id
+       LEFT JOIN providers
+              ON providers.internal_id = billing_detail.provider_internal_id
+WHERE  cds_submission_outbox.claimed_by = %(worker_id)s
+       AND cds_submission_outbox.status = 'in_progress'
+"""
+
+GET_LOCATIONS_OF_ZIPS = """
+SELECT zip,
+       ref_id
+FROM   location
+WHERE  zip IN %(zips)s
+"""
+
+MARK_CDS_SUBMITTED = """
+UPDATE cds_submission_outbox
+SET    status = 'submitted',
+       cds_id = %(cds_id)s,
+       attempts = attempts + 1,
+       last_error = NULL,
+       updated_on = %(updated_on)s
+WHERE  billing_id = %(billing_id)s
+"""
+
+UPDATE_BILLING_REF_UID = """
+UPDATE billing_detail
+SET    ref_uid = %(cds_id)s
+WHERE  id = %(billing_id)s
+"""
+
+RETRY_CDS_SUBMISSION = """
+UPDATE cds_submission_outbox
+SET    status = 'queued',
+       attempts = %(attempts)s,
+       next_attempt_at = %(next_attempt_at)s,
+       last_error = %(last_error)s,
+       updated_on = %(updated_on)s
+WHERE  billing_id = %(billing_id)s
+"""
+
+FAIL_CDS_SUBMISSION = """
+UPDATE cds_submission_outbox
+SET    status = 'failed',
+       attempts = %(attempts)s,
+       last_error = %(last_error)s,
+       updated_on = %(updated_on)s
+WHERE  billing_id = %(billing_id)s
+"""
+
+INSERT_CDS_DEAD_LETTER = """
+INSERT INTO cds_submission_dead_letter (
+  billing_id, attempts, last_error, request, failed_on
+)
+VALUES
+  (
+    %(billing_id)s,
+    %(attempts)s,
+    %(last_error)s,
+    %(request)s,
+    %(failed_on)s
+  )
+ON DUPLICATE KEY UPDATE
+  attempts = VALUES(attempts),
+  last_error = VALUES(last_error),
+  request = VALUES(request),
+  failed_on = VALUES(failed_on)
+"""
+
+DELETE_CDS_DEAD_LETTERS = """
+DELETE FROM cds_submission_dead_letter
+WHERE  billing_id IN %(billing_ids)s
+"""
+
+# org billing log, keyset paginated on (sort column, billing id)
+
+BILLING_LOG_SORT_COLUMNS = {
+    "date_of_service": "billing_detail.date_of_service",
+    "provider": "COALESCE(providers.name, '')",
+}
+
+BILLING_LOG_PAGE = """
+SELECT billing_detail.id,
+       billing_detail.date_of_service,
+       DATE_FORMAT(billing_detail.date_of_service, '%%a, %%d %%b %%Y %%T') AS date_p,
+       billing_detail.billing_charge_code,
+       providers.name,
+       patients.external_id
+FROM   billing_detail
+       JOIN providers
+         ON providers.internal_id = billing_detail.provider_internal_id
+       JOIN patients
+         ON patients.internal_id = billing_detail.patient_internal_id
+WHERE  billing_detail.billing_org_id = %(org_id)s
+       AND billing_detail.`status` = 'Approve'
+       AND billing_detail.date_of_service >= %(start_date)s
+       AND billing_detail.date_of_service < %(end_date)s
+       {after}
+ORDER  BY {column} {direction},
+          billing_detail.id {direction}
+LIMIT  %(page_size)s
+"""
+
+BILLING_LOG_AFTER = """AND ( {column} {operator} %(after_value)s
+             OR ( {column} = %(after_value)s
+                  AND billing_detail.id {operator} %(after_id)s ) )"""
@@ -1,6 +1,9 @@
 import json
 import logging
+from http import HTTPStatus
 
+from custom_exception import GeneralException
+from reference_data import get_reference_data, reference_data_response
 from shared import get_db_connect, get_headers, read_as_dict
 from sqls.call import CALL_NOTES
 
@@ -19,8 +22,15 @@ def lambda_handler(event, context):
     """
     Handler Function
     """
-    return {
-        "statusCode": 200,
-        "body": json.dumps(get_call_notes(connection)),
-        "headers": get_headers(),
-    }
+    try:
+        body, etag = get_reference_data(
+            connection, "call_notes", ["notes"], get_call_notes
+        )
+    except GeneralException as err:
+        logger.exception(err)
+        return {
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR,
+            "body": json.dumps(str(err)),
+            "headers": get_headers(),
+        }
+    return reference_data_response(event, body, etag)
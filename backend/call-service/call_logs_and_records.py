@@ -1,11 +1,19 @@
-import ast
 import json
 import logging
+import os
 from datetime import datetime
 from http import HTTPStatus
 from typing import Tuple
 
 import pymysql
+from call_records import (
+    FREE_TEXT_NOTE_ID,
+    dump_call_notes,
+    insert_call,
+    parse_call_notes,
+    update_call,
+)
+from custom_exception import GeneralException
 from shared import (
     find_user_by_external_id,
     get_db_connect,
@@ -14,7 +22,9 @@ from shared import (
     read_as_dict,
 )
 from sqls.call import (
-    CALL_BASE_QUERY,
+    CALL_LOGS_OF_PATIENT,
+    CALL_LOGS_OF_PATIENTS,
+    CALL_RECORDS_OF_PATIENT,
     DRAFT_CALL_RECORD_BELONGS_TO_PROVIDER,
     INSERT_CALL_RECORDS,
     REMOTE_MONITORING_PROVIDER,
@@ -28,6 +38,28 @@ logger.setLevel(logging.INFO)
 
 connection = get_db_connect()
 
+default_page_size = int(os.getenv("CALL_LOG_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 500
+MAX_PATIENTS = 500
+CALL_LOG_STATUSES = ("DRAFT", "COMPLETED")
+
+
+def get_page_params(query_params):
+    """
+    Returns the (page, page_size) of the listing, page is 0 based
+    and page_size is capped at MAX_PAGE_SIZE
+    """
+    query_params = query_params or {}
+    page = query_params.get("page")
+    page_size = query_params.get("page_size")
+    page = int(page) if page and page.isdigit() else 0
+    page_size = (
+        int(page_size)
+        if page_size and page_size.isdigit() and int(page_size) > 0
+        else default_page_size
+    )
+    return page, min(page_size, MAX_PAGE_SIZE)
+
 
 def get_common_org_id(cnx, patient_id, provider_id):
     """
@@ -63,92 +95,106 @@ def consider_org_id(cnx, patient_id, provider_id):
     return 0
 
 
-def get_call_base_query(cnx, patient_id, org_id=None):
+def get_org_ids(org_id):
+    """
+    Returns the org filter of the listings as a tuple
+    """
+    return tuple(org_id) if isinstance(org_id, (list, tuple, set)) else (org_id,)
+
+
+def to_call_log(call, date_format):
+    """
+    Returns the api item of a call_logs row
+    """
+    return {
+        "call_duration": int(call.get("duration", "0") or 0),
+        "status": call.get("status"),
+        "prv_name": call.get("provider_name"),
+        "provider_internal_id": call.get("provider_internal_id"),
+        "patient_internal_id": call.get("patient_internal_id"),
+        "id": call["id"],
+        "date_p": (
+            call["start_timestamp"].strftime(date_format)
+            if call.get("start_timestamp")
+            else ""
+        ),
+        "call_type": call.get("type_of_call"),
+    }
+
+
+def get_call_logs(cnx, patient_id, org_id, page=0, page_size=None):
     """
-    Get Call Base Query
+    Get a page of the Call Logs of the patient, latest call first
     :params patient_id, org_id
-    :return call records
+    :return dict call logs
     """
-    n_org_id = True if org_id else None
+    page_size = page_size or default_page_size
     params = {
-        "org_ids": org_id,
         "patient_id": patient_id,
-        "n_org_id": n_org_id,
-        "status": tuple(["DRAFT", "COMPLETED"]),
+        "org_ids": get_org_ids(org_id),
+        "status": CALL_LOG_STATUSES,
+        "offset": page * page_size,
+        "page_size": page_size,
     }
-    call_records = read_as_dict(cnx, CALL_BASE_QUERY, params)
-    return call_records
+    call_logs = read_as_dict(cnx, CALL_LOGS_OF_PATIENT, params) or []
+    return [to_call_log(call, "%m-%d-%Y %I:%M %p") for call in call_logs]
 
 
-def get_call_logs(cnx, patient_id, org_id):
+def get_call_logs_of_patients(cnx, patient_ids, org_id, page=0, page_size=None):
     """
-    Get Call Logs
-    :params patient_id, org_id
+    Get a page of the Call Logs of several patients, latest call first
+    :params patient_ids, org_id
     :return dict call logs
     """
-    call_logs = get_call_base_query(cnx, patient_id, org_id)
-    final_set = []
-    for call in call_logs:
-        item = {
-            "call_duration": int(call.get("duration", "0") or 0),
-            "status": call.get("status"),
-            "prv_name": call.get("provider_name"),
-            "provider_internal_id": call.get("provider_internal_id"),
-            "patient_internal_id": call.get("patient_internal_id"),
-            "id": call["id"],
-            "date_p": (
-                call["start_timestamp"].strftime("%m-%d-%Y %I:%M %p")
-                if call.get("start_timestamp")
-                else ""
-            ),
-            "call_type": call.get("type_of_call"),
-        }
-        final_set.append(item)
-    return final_set
+    page_size = page_size or default_page_size
+    params = {
+        "patient_ids": tuple(patient_ids),
+        "org_ids": get_org_ids(org_id),
+        "status": CALL_LOG_STATUSES,
+        "offset": page * page_size,
+        "page_size": page_size,
+    }
+    call_logs = read_as_dict(cnx, CALL_LOGS_OF_PATIENTS, params) or []
+    return [to_call_log(call, "%m-%d-%Y %I:%M %p") for call in call_logs]
 
 
-def get_call_records(cnx, patient_id, org_id):
+def get_call_records(cnx, patient_id, org_id, page=0, page_size=None):
     """
-    Get Call Records
+    Get a page of the Call Records of the patient with their notes
     :params patient_id, org_id
     :return call records
     """
-    call_records = get_call_base_query(cnx, patient_id, org_id)
+    page_size = page_size or default_page_size
+    params = {
+        "patient_id": patient_id,
+        "org_ids": get_org_ids(org_id),
+        "status": CALL_LOG_STATUSES,
+        "offset": page * page_size,
+        "page_size": page_size,
+    }
+    call_records = read_as_dict(cnx, CALL_RECORDS_OF_PATIENT, params) or []
     final_set = []
     for call in call_records:
-        item = {
-            "call_duration": int(call.get("duration", "0") or 0),
-            "id": call["id"],
-            "status": call.get("status"),
-            "call_type": call.get("type_of_call"),
-            "prv_name": call.get("provider_name"),
-            "provider_internal_id": call.get("provider_internal_id"),
-            "patient_internal_id": call.get("patient_internal_id"),
-            "date_p": (
-                call["start_timestamp"].strftime("%B %d, %Y %I:%M %p")
-                if call.get("start_timestamp")
-                else ""
-            ),
-        }
-        notes = call.get("notes")
-        if not notes or notes == "[]":
-            item["desc"] = ""
-            item["notes"] = ""
-        else:
-            notes = ast.literal_eval(notes.replace("\n", ""))
-            item["desc"] = "<br>".join(
-                [d.get("desc") for d in notes if d.get("id") != "999"]
-            )
-            item["notes"] = "<br>".join(
-                [n.get("desc") for n in notes if n.get("id") == "999"]
-            )
+        item = to_call_log(call, "%B %d, %Y %I:%M %p")
+        try:
+            notes = parse_call_notes(call.get("notes"))
+        except GeneralException as err:
+            logger.error("call %s: %s", call["id"], err)
+            notes = []
+        item["desc"] = "<br>".join(
+            note["desc"] for note in notes if note["id"] != FREE_TEXT_NOTE_ID
+        )
+        item["notes"] = "<br>".join(
+            note["desc"] for note in notes if note["id"] == FREE_TEXT_NOTE_ID
+        )
         final_set.append(item)
     return final_set
 
 
 def add_call_records(cnx, data):
     """
-    Insert Call Record based on input data
+    Insert Call Record based on input data.
+    Raises GeneralException for invalid notes
     """
     org_id = get_common_org_id(cnx, data["patient_id"], data["provider_id"])
     org_id = 0 if not org_id else org_id[0]
@@ -160,21 +206,20 @@ def add_call_records(cnx, data):
         "status": data["status"],
         "type_of_call": data["typeOfCall"],
         "org_id": org_id,
-        "notes": json.dumps(data["notes"]),
+        "notes": dump_call_notes(data["notes"]),
     }
     try:
-        with cnx.cursor() as cursor:
-            cursor.execute(INSERT_CALL_RECORDS, params)
-            cnx.commit()
-            return "success"
-    except pymysql.MySQLError as err:
+        insert_call(cnx, INSERT_CALL_RECORDS, params)
+        return "success"
+    except (pymysql.MySQLError, GeneralException) as err:
         logger.error(err)
 
 
 def update_call_records(cnx, data, call_id):
     """
     Update call record data based on
-    type of call in the input call record data
+    type of call in the input call record data.
+    Raises GeneralException for invalid notes
     """
     if data["typeOfCall"] == "Manual":
         params = {
@@ -183,26 +228,24 @@ def update_call_records(cnx, data, call_id):
             ),
             "duration": data["callLength"],
             "status": data["status"],
-            "notes": json.dumps(data["notes"]),
+            "notes": dump_call_notes(data["notes"]),
             "id": call_id,
         }
     else:
         params = {
-            "notes": json.dumps(data["notes"]),
+            "notes": dump_call_notes(data["notes"]),
             "status": data["status"],
             "id": call_id,
         }
     try:
-        with cnx.cursor() as cursor:
-            query = (
-                UPDATE_MANUAL_CALL_RECORDS
-                if data["typeOfCall"] == "Manual"
-                else UPDATE_CALL_RECORDS
-            )
-            cursor.execute(query, params)
-            cnx.commit()
-            return "updated successfully"
-    except pymysql.MySQLError as err:
+        query = (
+            UPDATE_MANUAL_CALL_RECORDS
+            if data["typeOfCall"] == "Manual"
+            else UPDATE_CALL_RECORDS
+        )
+        update_call(cnx, query, params, call_id=call_id)
+        return "updated successfully"
+    except (pymysql.MySQLError, GeneralException) as err:
         logger.error(err)
 
 
@@ -233,9 +276,9 @@ def delete_call_record(
 
     # Update the status of call_id to `DELETED`
     try:
-        with cnx.cursor() as cursor:
-            cursor.execute(SOFT_DELETE_DRAFT_CALL_RECORD, {"call_id": call_id})
-            cnx.commit()
+        update_call(
+            cnx, SOFT_DELETE_DRAFT_CALL_RECORD, {"call_id": call_id}, call_id=call_id
+        )
     except pymysql.MySQLError as err:
         logger.error(err)
         return HTTPStatus.INTERNAL_SERVER_ERROR, "Delete operation failed."
@@ -243,6 +286,32 @@ def delete_call_record(
     return HTTPStatus.OK, "Call Record deleted successfully."
 
 
+def get_provider_org_ids(cnx, provider_id):
+    """
+    Returns the org ids of the provider if remote monitoring is enabled
+    for the provider, the call logs of several patients are filtered by them
+    """
+    if not read_as_dict(cnx, REMOTE_MONITORING_PROVIDER, {"provider_id": provider_id}):
+        return []
+    return get_user_org_ids(cnx, "providers", internal_id=provider_id)
+
+
+def get_patient_ids(query_params):
+    """
+    Returns the patient internal ids of the comma separated patient_ids param
+    """
+    patient_ids = {
+        int(patient_id)
+        for patient_id in (query_params.get("patient_ids") or "").split(",")
+        if patient_id.strip().isdigit()
+    }
+    if not patient_ids:
+        raise GeneralException("patient_ids is required")
+    if len(patient_ids) > MAX_PATIENTS:
+        raise GeneralException(f"At most {MAX_PATIENTS} patient_ids are allowed")
+    return patient_ids
+
+
 def lambda_handler(event, context):
     """
     Handler Function.
@@ -250,9 +319,37 @@ def lambda_handler(event, context):
     status_code = None
 
     auth_user = event["requestContext"].get("authorizer")
+    patient_id = None
     if event["pathParameters"]:
         patient_id = event["pathParameters"].get("patient_id")
-    if event["httpMethod"] == "GET":
+    query_params = event.get("queryStringParameters") or {}
+    if (
+        event["httpMethod"] == "GET"
+        and not patient_id
+        and "call_logs" in event["path"].split("/")
+    ):
+        try:
+            patient_ids = get_patient_ids(query_params)
+        except GeneralException as err:
+            return {
+                "statusCode": HTTPStatus.BAD_REQUEST.value,
+                "body": json.dumps(str(err)),
+                "headers": get_headers(),
+            }
+        if auth_user.get("userOrg"):
+            org_id = [auth_user["userOrg"]]
+        else:
+            user = find_user_by_external_id(
+                connection, auth_user["userSub"], "providers"
+            )
+            org_id = get_provider_org_ids(connection, user["internal_id"])
+        page, page_size = get_page_params(query_params)
+        result = (
+            get_call_logs_of_patients(connection, patient_ids, org_id, page, page_size)
+            if org_id
+            else []
+        )
+    elif event["httpMethod"] == "GET":
         if auth_user.get("userOrg"):
             org_id = [auth_user["userOrg"]]
         else:
@@ -260,19 +357,29 @@ def lambda_handler(event, context):
                 connection, auth_user["userSub"], "providers"
             )
             org_id = consider_org_id(connection, patient_id, user["internal_id"])
+        page, page_size = get_page_params(query_params)
         if not org_id:
             result = []
         elif "call_logs" in event["path"].split("/"):
-            result = get_call_logs(connection, patient_id, org_id)
+            result = get_call_logs(connection, patient_id, org_id, page, page_size)
         elif "call_records" in event["path"].split("/"):
-            result = get_call_records(connection, patient_id, org_id)
-    elif event["httpMethod"] == "POST":
-        form_data = json.loads(event["body"])
-        result = add_call_records(connection, form_data)
-    elif event["httpMethod"] == "PUT":
-        call_id = event["pathParameters"].get("call_id")
+            result = get_call_records(connection, patient_id, org_id, page, page_size)
+    elif event["httpMethod"] in ("POST", "PUT"):
         form_data = json.loads(event["body"])
-        result = update_call_records(connection, form_data, call_id)
+        try:
+            if event["httpMethod"] == "POST":
+                result = add_call_records(connection, form_data)
+            else:
+                call_id = event["pathParameters"].get("call_id")
+                result = update_call_records(connection, form_data, call_id)
+        except GeneralException as err:
+            # invalid notes, raised by dump_call_notes
+            logger.error(err)
+            return {
+                "statusCode": HTTPStatus.BAD_REQUEST.value,
+                "body": json.dumps(str(err)),
+                "headers": get_headers(),
+            }
     elif event["httpMethod"] == "DELETE":
         call_id = event["pathParameters"].get("call_id")
         status_code, result = delete_call_record(
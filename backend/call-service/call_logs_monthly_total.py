@@ -1,5 +1,6 @@
 import json
 import logging
+from datetime import date
 
 from shared import (
     get_db_connect,
@@ -36,10 +37,13 @@ def get_common_org_id(cnx, patient_id, provider_id):
 
 def get_call_logs_monthly_total(cnx, patient_id, provider_id, year, month):
     """
-    Get the call logs monthly Total.
+    Get the call logs monthly Total from the monthly aggregate,
+    months are calendar months in CST.
     :params patient_id, provider_id, year, month
     :Return call logs monthly total
     """
+    period = date(int(year), int(month), 1)
+    status = tuple(["COMPLETED", "DRAFT"])
     rm_enabled = read_query(
         cnx, REMOTE_MONITORING_PROVIDER, {"provider_id": provider_id}
     )
@@ -51,13 +55,16 @@ def get_call_logs_monthly_total(cnx, patient_id, provider_id, year, month):
         params = {
             "org_id": org_id[0],
             "patient_id": patient_id,
-            "month": month,
-            "year": year,
-            "status": tuple(["COMPLETED", "DRAFT"]),
+            "period": period,
+            "status": status,
         }
         result = read_as_dict(cnx, CALL_LOGS_MONTHLY_TOTAL_RM_PRV, params)
     else:
-        result = read_as_dict(cnx, CALL_LOGS_MONTHLY_TOTAL, (patient_id, month, year))
+        result = read_as_dict(
+            cnx,
+            CALL_LOGS_MONTHLY_TOTAL,
+            {"patient_id": patient_id, "period": period, "status": status},
+        )
     return int(result[0]["total"]) if result[0]["total"] else 0
 
 
@@ -4,27 +4,48 @@ SELECT id,
 FROM   notes
 WHERE  note_type = 'call_notes' 
 """
-CALL_BASE_QUERY = """
-SELECT DISTINCT Concat(providers.name, ', ', providers.degree) AS provider_name,
-                call_logs.provider_internal_id,
-                call_logs.patient_internal_id,
-                call_logs.id,
-                call_logs.duration,
-                call_logs.start_timestamp,
-                call_logs.type_of_call,
-                call_logs.notes,
-                call_logs.status,
-                call_logs.start_timestamp
-FROM            call_logs
-JOIN            providers
-ON              call_logs.provider_internal_id = providers.internal_id
-WHERE           call_logs.patient_internal_id = %(patient_id)s
-AND             providers.remote_monitoring = "Y"
-AND             (%(n_org_id)s IS NULL OR  call_logs.org_id = %(org_ids)s)
-AND             call_logs.status IN %(status)s
-ORDER BY        call_logs.start_timestamp DESC
+CALL_LOG_COLUMNS = """
+SELECT Concat(providers.name, ', ', providers.degree) AS provider_name,
+       call_logs.provider_internal_id,
+       call_logs.patient_internal_id,
+       call_logs.id,
+       call_logs.duration,
+       call_logs.start_timestamp,
+       call_logs.type_of_call,
+       call_logs.status
 """
 
+CALL_LOG_PAGE = """
+FROM   call_logs
+       JOIN providers
+         ON call_logs.provider_internal_id = providers.internal_id
+WHERE  {patient_filter}
+       AND providers.remote_monitoring = "Y"
+       AND call_logs.org_id IN %(org_ids)s
+       AND call_logs.status IN %(status)s
+ORDER  BY call_logs.start_timestamp DESC,
+          call_logs.id DESC
+LIMIT  %(offset)s, %(page_size)s
+"""
+
+CALL_LOGS_OF_PATIENT = CALL_LOG_COLUMNS + CALL_LOG_PAGE.format(
+    patient_filter="call_logs.patient_internal_id = %(patient_id)s"
+)
+
+CALL_RECORDS_OF_PATIENT = (
+    CALL_LOG_COLUMNS.rstrip()
+    + """,
+       call_logs.notes
+"""
+    + CALL_LOG_PAGE.format(
+        patient_filter="call_logs.patient_internal_id = %(patient_id)s"
+    )
+)
+
+CALL_LOGS_OF_PATIENTS = CALL_LOG_COLUMNS + CALL_LOG_PAGE.format(
+    patient_filter="call_logs.patient_internal_id IN %(patient_ids)s"
+)
+
 REMOTE_MONITORING_PROVIDER = """
 SELECT remote_monitoring
 FROM   providers
@@ -69,25 +90,23 @@ WHERE  call_logs.id = %(id)s
 """
 
 CALL_LOGS_MONTHLY_TOTAL_RM_PRV = """
-SELECT SUM(duration) AS total
-FROM   call_logs calls
-       left join providers prv
-              ON calls.provider_internal_id = prv.internal_id
-WHERE  org_id = %(org_id)s
-       AND patient_internal_id = %(patient_id)s
+SELECT SUM(totals.total_duration) AS total
+FROM   call_log_monthly_totals totals
+       JOIN providers prv
+         ON totals.provider_internal_id = prv.internal_id
+WHERE  totals.org_id = %(org_id)s
+       AND totals.patient_internal_id = %(patient_id)s
        AND prv.remote_monitoring = 'Y'
-       AND Month(start_timestamp) = %(month)s
-       AND Year(start_timestamp) = %(year)s
-       AND status IN %(status)s
+       AND totals.period = %(period)s
+       AND totals.status IN %(status)s
 """
 
 CALL_LOGS_MONTHLY_TOTAL = """
-SELECT SUM(duration) AS total
-FROM   call_logs calls
-WHERE  patient_internal_id = %(patient_id)s
-       AND Month(start_timestamp) = %(month)s
-       AND Year(start_timestamp) = %(year)s
-       AND status IN %(status)s
+SELECT SUM(totals.total_duration) AS total
+FROM   call_log_monthly_totals totals
+WHERE  totals.patient_internal_id = %(patient_id)s
+       AND totals.period = %(period)s
+       AND totals.status IN %(status)s
 """
 
 DRAFT_CALL_RECORD_BELONGS_TO_PROVIDER = """
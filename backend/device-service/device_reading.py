@@ -2,169 +2,76 @@ import base64
 import json
 import logging
 import os
-from datetime import datetime
+import time
 from http import HTTPStatus
 
-import boto3
-import pymysql
 from custom_exception import GeneralException
-from notification import insert_to_remote_vital_notification_table
-from shared import (
-    encrypt,
-    get_db_connect,
-    get_headers,
-    get_phi_data_list,
-    get_secret_manager,
-    read_as_dict,
-)
-from sqls.device import GET_NETWORK_PROVIDERS, INSERT_DEVICE_READING
+from device_reading_queue import enqueue_readings, get_reading_queue
+from shared import get_headers, get_secret_manager
 
 api_secret_id = os.getenv("API_KEYS")
-environment = os.getenv("ENVIRONMENT")
-bucket_name = os.getenv("BUCKET_NAME")
-file_name = os.getenv("S3_FILE_NAME")
-aws_region = os.getenv("AWSREGION")
-s3_client = boto3.client("s3", region_name=aws_region)
-
+device_secret_ttl = int(os.getenv("DEVICE_SECRET_TTL", "300"))
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-dynamodb = boto3.resource("dynamodb")
-connection = get_db_connect()
-
-
-DEFAULT_NOTIFICATION_STATUS = 1
-DEFAULT_NOTIFICATION_LEVEL = 1
+reading_queue = get_reading_queue()
 
+SUPPORTED_DEVICE_TYPES = ("BT105",)
+READING_VALUE_KEYS = ("systolic", "diastolic", "pulse", "irregular", "unit")
 
-def post_device_reading(cnx, d_type, record_dict):
-    """
-    Insert Device Reading into device_reading Table
-    """
-    device_reading_id = None
-    if d_type != "BT105":
-        return HTTPStatus.BAD_REQUEST, "Device Type is Not supported", device_reading_id
-    if not record_dict.get("values"):
-        logger.info("Device Ping")
-        return (
-            HTTPStatus.CONTINUE,
-            f"Device Ping from device imei {record_dict['imei']}",
-            device_reading_id,
-        )
-    time_utc = datetime.utcfromtimestamp(float(record_dict["ts"]) / 1000.0)
-    params = {
-        "imei": record_dict["imei"],
-        "timestamp": time_utc,
-        "battery_voltage": record_dict["batteryVoltage"],
-        "signalStrength": record_dict["signalStrength"],
-        "systolic": record_dict["values"]["systolic"],
-        "diastolic": record_dict["values"]["diastolic"],
-        "pulse": record_dict["values"]["pulse"],
-        "irregular": record_dict["values"]["irregular"],
-        "unit": record_dict["values"]["unit"],
-        "raw": json.dumps(record_dict),
-    }
-    try:
-        with cnx.cursor() as cursor:
-            cursor.execute(INSERT_DEVICE_READING, params)
-            device_reading_id = cursor.lastrowid
-            cnx.commit()
-        return HTTPStatus.OK, "Device Details Inserted Successfully ", device_reading_id
-    except pymysql.MySQLError as err:
-        logger.error(err)
-    except KeyError as kerr:
-        logger.error(kerr)
-    return (
-        HTTPStatus.INTERNAL_SERVER_ERROR,
-        f"Error While updating device Reading for {record_dict['imei']}.",
-        device_reading_id,
-    )
+# Device credential cached across warm invocations, refreshed every
+# device_secret_ttl seconds so a rotated password is picked up
+_device_secret = {"value": None, "expires_at": 0}
 
 
-def get_name_from_phi_data(phi_data):
+def get_device_secret():
     """
-    Construct name string from input phi_data dict
+    Returns the device password secret, Secrets Manager is only called
+    when the cached value expired
     """
-    return f"{phi_data['first_name']}, {phi_data['last_name']}"
+    if time.time() >= _device_secret["expires_at"]:
+        _device_secret["value"] = get_secret_manager(api_secret_id)
+        _device_secret["expires_at"] = time.time() + device_secret_ttl
+    return _device_secret["value"]
 
 
-def get_notification_details(phi_data_dict, patient_external_id):
+def is_valid_reading(record_dict):
     """
-    Construct notification_details string for selected patient
+    Checks the reading has the fields the queue consumer inserts
     """
-    name = get_name_from_phi_data(phi_data_dict[patient_external_id])
-    return f"A Remote Vital device reading has been reported for {name}"
-
-
-def insert_notification_for_network_providers(
-    network_prv_dict: list,
-    patient_internal_id: int,
-    notification_details: str,
-    device_reading_id: int,
-):
-    """
-    Inserts remote vital notification for all network users
-    """
-    current_time = datetime.utcnow()
-    for user in network_prv_dict:
-        user_internal_id = user["internal_id"]
-        insert_to_remote_vital_notification_table(
-            remote_vital_id=device_reading_id,
-            patient_internal_id=patient_internal_id,
-            notifier_internal_id=user_internal_id,
-            level=DEFAULT_NOTIFICATION_LEVEL,
-            notification_details=encrypt(notification_details),
-            created_on=current_time,
-            updated_on=current_time,
-            created_by=patient_internal_id,
-            updated_by=patient_internal_id,
-            notification_status=DEFAULT_NOTIFICATION_STATUS,
+    try:
+        float(record_dict["ts"])
+        return (
+            bool(record_dict["imei"])
+            and "batteryVoltage" in record_dict
+            and "signalStrength" in record_dict
+            and all(key in record_dict["values"] for key in READING_VALUE_KEYS)
         )
+    except (KeyError, TypeError, ValueError):
+        return False
 
 
-def notify_network_providers(cnx, imei: str, device_reading_id):
+def acknowledge_device_readings(queue, d_type, records):
     """
-    This Function:
-    1. Gets all network users linked to the patient
-       with whom the device is paired
-    2. Inserts Remote Vital Notification for network users
-    3. Sends SMS to network users with alert_receiver enabled
+    Validates the device readings and enqueues them for the
+    device_reading_consumer, device pings are acknowledged without being queued
     """
-    if not imei:
-        return HTTPStatus.BAD_REQUEST, "Invalid Imei value"
-    try:
-        network_prv_dict = read_as_dict(cnx, GET_NETWORK_PROVIDERS, {"imei": str(imei)})
-        network_external_ids = []
-        if network_prv_dict:
-            for prv in network_prv_dict:
-                if prv["user_alert_receiver"] == 1:
-                    network_external_ids.append(prv["external_id"])
-        if (
-            isinstance(network_prv_dict, list)
-            and len((network_prv_dict)) > 0
-            and device_reading_id
-        ):
-            patient_internal_id: int = network_prv_dict[0].get("patient_internal_id")
-            patient_external_id: int = network_prv_dict[0].get("patient_external_id")
-            phi_external_ids = network_external_ids + [patient_external_id]
-            phi_data_dict = get_phi_data_list(phi_external_ids, dynamodb)
-            notification_details = get_notification_details(
-                phi_data_dict, patient_external_id
-            )
-            insert_notification_for_network_providers(
-                network_prv_dict,
-                patient_internal_id,
-                notification_details,
-                device_reading_id,
-            )
-            return HTTPStatus.OK, "Successfully notified network providers"
-    except pymysql.MySQLError as err:
-        logger.error(err)
-    except KeyError as kerr:
-        logger.error(kerr)
-    except GeneralException as err:
-        logger.error(err)
-    return HTTPStatus.INTERNAL_SERVER_ERROR, "Failed to notify network providers"
+    if d_type not in SUPPORTED_DEVICE_TYPES:
+        return HTTPStatus.BAD_REQUEST, "Device Type is Not supported"
+    readings = [record for record in records if record.get("values")]
+    if not all(is_valid_reading(reading) for reading in readings):
+        return HTTPStatus.BAD_REQUEST, "Invalid device reading"
+    if readings:
+        try:
+            enqueue_readings(queue, d_type, readings)
+        except GeneralException as err:
+            logger.error(err)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, "Error While queuing device readings"
+    return HTTPStatus.ACCEPTED, {
+        "received": len(records),
+        "queued": len(readings),
+        "pings": len(records) - len(readings),
+    }
 
 
 def lambda_handler(event, context):
@@ -181,7 +88,7 @@ def lambda_handler(event, context):
     basic_auth = base64.b64decode(authorization).decode()
     auth = basic_auth.split(":")
     username, password = auth[0], auth[1]
-    device_secret = get_secret_manager(api_secret_id)
+    device_secret = get_device_secret()
     secret = device_secret["device_password"] if device_secret else ""
     secret = secret + "_" + username
     model_type = event["pathParameters"].get("model_type")
@@ -193,15 +100,10 @@ def lambda_handler(event, context):
             "headers": get_headers(),
         }
     form_data = json.loads(event["body"])
-    status_code, result, device_reading_id = post_device_reading(
-        connection, model_type, form_data
+    records = form_data if isinstance(form_data, list) else [form_data]
+    status_code, result = acknowledge_device_readings(
+        reading_queue, model_type, records
     )
-    if status_code == HTTPStatus.OK:
-        notification_status_code, notification_result = notify_network_providers(
-            connection, form_data.get("imei", ""), device_reading_id
-        )
-        logger.info(str(notification_status_code) + notification_result)
-        result = result + notification_result
     return {
         "statusCode": status_code,
         "body": json.dumps(result),
@@ -0,0 +1,276 @@
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http import HTTPStatus
+
+import pymysql
+from botocore.exceptions import ClientError
+from custom_exception import GeneralException
+from device_reading_raw import store_raw_readings
+from notification import insert_to_remote_vital_notification_table_bulk
+from shared import encrypt, get_phi_data_list, read_as_dict
+from sqls.device import (
+    GET_DEVICE_READINGS_OF_IMEIS,
+    GET_NETWORK_PROVIDERS_OF_PATIENTS,
+    GET_PAIRINGS_OF_IMEIS,
+    INSERT_DEVICE_READING_DAILY_ROWS,
+    INSERT_DEVICE_READINGS_IGNORE_DUPLICATES,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_NOTIFICATION_STATUS = 1
+DEFAULT_NOTIFICATION_LEVEL = 1
+
+
+def get_reading_params(record_dict):
+    """
+    Returns the device_reading row of a BT105 reading.
+    The timestamp is truncated to the second like its dedupe key, MySQL would
+    otherwise round the milliseconds and store it a second later
+    """
+    return {
+        "imei": str(record_dict["imei"]),
+        "timestamp": datetime.utcfromtimestamp(
+            float(record_dict["ts"]) / 1000.0
+        ).replace(microsecond=0),
+        "battery_voltage": record_dict["batteryVoltage"],
+        "signalStrength": record_dict["signalStrength"],
+        "systolic": record_dict["values"]["systolic"],
+        "diastolic": record_dict["values"]["diastolic"],
+        "pulse": record_dict["values"]["pulse"],
+        "irregular": record_dict["values"]["irregular"],
+        "unit": record_dict["values"]["unit"],
+        "raw": json.dumps(record_dict),
+    }
+
+
+def reading_key(imei, timestamp):
+    """
+    Dedupe key of a reading, readings of a device are unique per second
+    """
+    return str(imei), timestamp.replace(microsecond=0)
+
+
+def get_stored_readings(cnx, readings, cursor=None):
+    """
+    Returns a dict of reading key -> device_reading id of the stored readings
+    of the devices in the time range of the input readings.
+    Passing a DictCursor reads within its open transaction
+    """
+    timestamps = [reading["timestamp"] for reading in readings]
+    params = {
+        "imeis": tuple({reading["imei"] for reading in readings}),
+        "start_ts": min(timestamps) - timedelta(seconds=1),
+        "end_ts": max(timestamps) + timedelta(seconds=1),
+    }
+    if cursor:
+        cursor.execute(GET_DEVICE_READINGS_OF_IMEIS, params)
+        rows = cursor.fetchall()
+    else:
+        rows = read_as_dict(cnx, GET_DEVICE_READINGS_OF_IMEIS, params)
+    return {reading_key(row["imei"], row["timestamp"]): row["id"] for row in rows or []}
+
+
+def get_paired_patient(pairings, reading):
+    """
+    Returns the patient the device was paired with when the reading was taken
+    """
+    for pairing in pairings.get(reading["imei"], []):
+        if pairing["start_date"] < reading["timestamp"] and (
+            pairing["end_date"] is None or reading["timestamp"] <= pairing["end_date"]
+        ):
+            return pairing["patient_internal_id"]
+    return None
+
+
+def get_daily_rollup_rows(readings_by_patient):
+    """
+    Aggregates the new readings per patient, device and UTC day
+    into device_reading_daily increments
+    """
+    rollup = {}
+    updated_on = datetime.utcnow()
+    for patient_internal_id, readings in readings_by_patient.items():
+        for reading in readings:
+            key = (patient_internal_id, reading["imei"], reading["timestamp"].date())
+            row = rollup.get(key)
+            if row is None:
+                rollup[key] = {
+                    "patient_internal_id": patient_internal_id,
+                    "imei": reading["imei"],
+                    "reading_date": reading["timestamp"].date(),
+                    "reading_count": 1,
+                    "min_systolic": reading["systolic"],
+                    "max_systolic": reading["systolic"],
+                    "min_diastolic": reading["diastolic"],
+                    "max_diastolic": reading["diastolic"],
+                    "min_pulse": reading["pulse"],
+                    "max_pulse": reading["pulse"],
+                    "updated_on": updated_on,
+                }
+                continue
+            row["reading_count"] += 1
+            for column in ("systolic", "diastolic", "pulse"):
+                row["min_" + column] = min(row["min_" + column], reading[column])
+                row["max_" + column] = max(row["max_" + column], reading[column])
+    return list(rollup.values())
+
+
+def notify_network_providers_bulk(cnx, dynamodb, reading_ids_by_patient):
+    """
+    This Function:
+    1. Gets the network users of all patients with new readings in one query
+    2. Batch fetches the PHI of the patients
+    3. Inserts one Remote Vital Notification per patient and network user
+       for the whole batch, linked to the latest reading of the patient
+    """
+    network_rows = read_as_dict(
+        cnx,
+        GET_NETWORK_PROVIDERS_OF_PATIENTS,
+        {"patient_internal_ids": tuple(reading_ids_by_patient)},
+    )
+    network_by_patient = defaultdict(list)
+    for row in network_rows or []:
+        network_by_patient[row["patient_internal_id"]].append(row)
+    if not network_by_patient:
+        return 0
+    phi_data_dict = get_phi_data_list(
+        list({rows[0]["patient_external_id"] for rows in network_by_patient.values()}),
+        dynamodb,
+    )
+    current_time = datetime.utcnow()
+    notifications = []
+    for patient_internal_id, network in network_by_patient.items():
+        phi_data = phi_data_dict.get(network[0]["patient_external_id"])
+        if not phi_data:
+            logger.warning("PHI not found for patient %s", patient_internal_id)
+            continue
+        reading_ids = reading_ids_by_patient[patient_internal_id]
+        name = f"{phi_data['first_name']}, {phi_data['last_name']}"
+        if len(reading_ids) == 1:
+            details = f"A Remote Vital device reading has been reported for {name}"
+        else:
+            details = (
+                f"{len(reading_ids)} Remote Vital device readings "
+                f"have been reported for {name}"
+            )
+        encrypted_details = encrypt(details)
+        notifications.extend(
+            {
+                "remote_vital_id": max(reading_ids),
+                "patient_internal_id": patient_internal_id,
+                "notifier_internal_id": user["internal_id"],
+                "level": DEFAULT_NOTIFICATION_LEVEL,
+                "notification_details": encrypted_details,
+                "created_on": current_time,
+                "created_by": patient_internal_id,
+                "updated_on": current_time,
+                "updated_by": patient_internal_id,
+                "notification_status": DEFAULT_NOTIFICATION_STATUS,
+            }
+            for user in network
+        )
+    insert_to_remote_vital_notification_table_bulk(notifications)
+    return len(notifications)
+
+
+def post_device_readings(cnx, dynamodb, d_type, records):
+    """
+    This function ingests a batch of device readings:
+    1. Skips device pings and readings already present in the batch
+       or stored for the same device and second
+    2. Inserts the typed columns of all new readings with one multi-row
+       statement, stores the raw payloads of the rows it actually wrote in the
+       cold raw store and adds them to the daily rollup of the paired patients
+       in the same transaction
+    3. Inserts one notification per patient and network user for those rows
+    """
+    if d_type != "BT105":
+        return HTTPStatus.BAD_REQUEST, "Device Type is Not supported"
+    result = {"received": len(records), "pings": 0, "duplicates": 0, "inserted": 0}
+    readings = {}
+    try:
+        for record_dict in records:
+            if not record_dict.get("values"):
+                result["pings"] += 1
+                continue
+            reading = get_reading_params(record_dict)
+            key = reading_key(reading["imei"], reading["timestamp"])
+            if key in readings:
+                result["duplicates"] += 1
+                continue
+            readings[key] = reading
+    except (KeyError, TypeError, ValueError) as err:
+        logger.error(err)
+        return HTTPStatus.BAD_REQUEST, "Invalid device reading in batch"
+    if not readings:
+        return HTTPStatus.OK, result
+    try:
+        stored = get_stored_readings(cnx, list(readings.values()))
+        new_readings = {
+            key: reading for key, reading in readings.items() if key not in stored
+        }
+        result["duplicates"] += len(readings) - len(new_readings)
+        if not new_readings:
+            return HTTPStatus.OK, result
+        pairings = defaultdict(list)
+        for pairing in read_as_dict(
+            cnx,
+            GET_PAIRINGS_OF_IMEIS,
+            {"imeis": tuple({r["imei"] for r in new_readings.values()})},
+        ) or []:
+            pairings[pairing["imei"]].append(pairing)
+        with cnx.cursor(pymysql.cursors.DictCursor) as cursor:
+            # both reads share the snapshot of the transaction, the ids only
+            # in the second are the rows INSERT IGNORE wrote, not the ones a
+            # redelivery or a concurrent consumer stored
+            existing = get_stored_readings(cnx, list(new_readings.values()), cursor)
+            cursor.executemany(
+                INSERT_DEVICE_READINGS_IGNORE_DUPLICATES, list(new_readings.values())
+            )
+            stored = get_stored_readings(cnx, list(new_readings.values()), cursor)
+            inserted = {
+                key: stored[key]
+                for key in new_readings
+                if key in stored and key not in existing
+            }
+            store_raw_readings(
+                cursor,
+                {
+                    reading_id: new_readings[key]["raw"]
+                    for key, reading_id in inserted.items()
+                },
+            )
+            readings_by_patient = defaultdict(list)
+            for key, reading_id in inserted.items():
+                patient_internal_id = get_paired_patient(pairings, new_readings[key])
+                if patient_internal_id:
+                    readings_by_patient[patient_internal_id].append(
+                        dict(new_readings[key], id=reading_id)
+                    )
+            rollup_rows = get_daily_rollup_rows(readings_by_patient)
+            if rollup_rows:
+                cursor.executemany(INSERT_DEVICE_READING_DAILY_ROWS, rollup_rows)
+            cnx.commit()
+        result["inserted"] = len(inserted)
+        result["duplicates"] += len(new_readings) - len(inserted)
+    except (pymysql.MySQLError, ClientError) as err:
+        logger.error(err)
+        cnx.rollback()
+        return HTTPStatus.INTERNAL_SERVER_ERROR, "Error While inserting device readings"
+    try:
+        reading_ids_by_patient = {
+            patient_internal_id: [reading["id"] for reading in patient_readings]
+            for patient_internal_id, patient_readings in readings_by_patient.items()
+        }
+        if reading_ids_by_patient:
+            result["notifications"] = notify_network_providers_bulk(
+                cnx, dynamodb, reading_ids_by_patient
+            )
+    except (pymysql.MySQLError, GeneralException, KeyError) as err:
+        logger.error(err)
+        result["notifications"] = 0
+    return HTTPStatus.OK, result
@@ -0,0 +1,70 @@
+import json
+import logging
+from collections import defaultdict
+from http import HTTPStatus
+
+import boto3
+from device_reading_batch import post_device_readings
+from shared import get_reusable_connection
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+dynamodb = boto3.resource("dynamodb")
+
+
+def parse_messages(records):
+    """
+    Returns a dict of model_type -> list of (message id, readings)
+    of the SQS records. Unreadable messages are logged and dropped
+    """
+    messages = defaultdict(list)
+    for record in records:
+        try:
+            body = json.loads(record["body"])
+            messages[body["model_type"]].append(
+                (record["messageId"], body["readings"])
+            )
+        except (KeyError, TypeError, ValueError) as err:
+            logger.error("Dropping message %s: %s", record.get("messageId"), err)
+    return messages
+
+
+def ingest_messages(cnx, model_type, messages):
+    """
+    Ingests the readings of all messages as a single batch.
+    If the batch is rejected, every message is retried alone
+    so an invalid message does not drop the others.
+    Returns the ids of the messages to redeliver
+    """
+    readings = [
+        reading for _, message_readings in messages for reading in message_readings
+    ]
+    status_code, result = post_device_readings(cnx, dynamodb, model_type, readings)
+    logger.info("%s readings of %s: %s", model_type, len(readings), result)
+    if status_code == HTTPStatus.OK:
+        return []
+    if status_code != HTTPStatus.BAD_REQUEST:
+        return [message_id for message_id, _ in messages]
+    if len(messages) == 1:
+        logger.error("Dropping invalid message %s: %s", messages[0][0], result)
+        return []
+    failed = []
+    for message in messages:
+        failed.extend(ingest_messages(cnx, model_type, [message]))
+    return failed
+
+
+def lambda_handler(event, context):
+    """
+    Consumer of the device reading queue.
+    The SQS event source delivers the messages in micro batches bounded by
+    size and batching window, each delivery is written with one connection
+    and failed messages are reported back for redelivery
+    """
+    cnx = get_reusable_connection()
+    failed = []
+    for model_type, messages in parse_messages(event.get("Records", [])).items():
+        failed.extend(ingest_messages(cnx, model_type, messages))
+    return {
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]
+    }
@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import uuid
+
+import boto3
+from custom_exception import GeneralException
+from shared import chunks
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+reading_queue_url = os.getenv("READING_QUEUE_URL")
+aws_region = os.getenv("AWSREGION")
+readings_per_message = int(os.getenv("READINGS_PER_MESSAGE", "25"))
+
+# SendMessageBatch accepts at most 10 messages
+SQS_BATCH_LIMIT = 10
+LOCAL_QUEUE_URL = "local"
+
+
+class SqsReadingQueue:
+    """
+    Device reading queue backed by SQS
+    """
+
+    def __init__(self, queue_url, client=None):
+        self.queue_url = queue_url
+        self.client = client or boto3.client("sqs", region_name=aws_region)
+
+    def send(self, bodies):
+        """
+        Sends the message bodies in SendMessageBatch calls of 10 messages
+        """
+        for body_chunk in chunks(bodies, SQS_BATCH_LIMIT):
+            response = self.client.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {"Id": str(index), "MessageBody": body}
+                    for index, body in enumerate(body_chunk)
+                ],
+            )
+            if response.get("Failed"):
+                logger.error(response["Failed"])
+                raise GeneralException("Failed to enqueue device readings")
+
+
+class LocalReadingQueue:
+    """
+    In memory stand-in of the SQS queue for local runs.
+    to_sqs_event returns the queued messages as the SQS event
+    the consumer lambda receives
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, bodies):
+        """
+        Appends the message bodies to the queue
+        """
+        self.messages.extend(bodies)
+
+    def to_sqs_event(self):
+        """
+        Drains the queue into an SQS event
+        """
+        records = [
+            {"messageId": uuid.uuid4().hex, "body": body} for body in self.messages
+        ]
+        self.messages = []
+        return {"Records": records}
+
+
+def get_reading_queue():
+    """
+    Returns the device reading queue, READING_QUEUE_URL=local
+    uses the in memory stand-in. A missing READING_QUEUE_URL raises
+    instead of accepting readings that would never be stored
+    """
+    if not reading_queue_url:
+        raise GeneralException("READING_QUEUE_URL is not set")
+    if reading_queue_url == LOCAL_QUEUE_URL:
+        return LocalReadingQueue()
+    return SqsReadingQueue(reading_queue_url)
+
+
+def enqueue_readings(queue, model_type, readings):
+    """
+    Enqueues the readings in messages of readings_per_message readings.
+    Returns the number of messages sent
+    """
+    bodies = [
+        json.dumps({"model_type": model_type, "readings": reading_chunk})
+        for reading_chunk in chunks(readings, readings_per_message)
+    ]
+    queue.send(bodies)
+    return len(bodies)
@@ -0,0 +1,177 @@
+import gzip
+import json
+import logging
+import os
+import struct
+import zlib
+from datetime import datetime
+from http import HTTPStatus
+
+import boto3
+from shared import (
+    check_user_access_for_patient_data,
+    find_user_by_external_id,
+    get_headers,
+    get_reusable_connection,
+    read_as_dict,
+)
+from sqls.device import (
+    GET_DEVICE_READING_RAW,
+    GET_PATIENT_OF_DEVICE_READING,
+    INSERT_DEVICE_READING_RAW,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+aws_region = os.getenv("AWSREGION")
+raw_reading_store = os.getenv("RAW_READING_STORE", "table")
+raw_reading_bucket = os.getenv("RAW_READING_BUCKET")
+
+RAW_STORE_TABLE = "table"
+RAW_STORE_S3 = "s3"
+
+s3_client = boto3.client("s3", region_name=aws_region)
+
+
+def compress_raw(raw):
+    """
+    Compresses the raw payload in the format of MySQL COMPRESS(),
+    a 4 byte little endian length followed by the zlib stream,
+    so the rows written here and by the backfill both read with UNCOMPRESS()
+    """
+    data = raw.encode("utf-8")
+    return struct.pack("<I", len(data)) + zlib.compress(data)
+
+
+def get_archive_key(reading_ids, created_on):
+    """
+    Returns the S3 key of the archive of a batch of readings
+    """
+    return (
+        f"raw-readings/{created_on:%Y/%m/%d}/"
+        f"{min(reading_ids)}-{max(reading_ids)}.ndjson.gz"
+    )
+
+
+def archive_raw_readings(raw_by_id, created_on):
+    """
+    Writes the raw payloads of the batch as one gzipped NDJSON object
+    of reading_id / raw lines and returns its key
+    """
+    body = "".join(
+        json.dumps({"reading_id": reading_id, "raw": raw}) + "\n"
+        for reading_id, raw in raw_by_id.items()
+    )
+    s3_key = get_archive_key(list(raw_by_id), created_on)
+    s3_client.put_object(
+        Bucket=raw_reading_bucket,
+        Key=s3_key,
+        Body=gzip.compress(body.encode("utf-8")),
+        ContentType="application/x-ndjson",
+        ContentEncoding="gzip",
+        ServerSideEncryption="AES256",
+    )
+    return s3_key
+
+
+def store_raw_readings(cursor, raw_by_id):
+    """
+    Stores the raw payloads of the new readings keyed by reading id.
+    RAW_READING_STORE=table keeps them compressed in device_reading_raw,
+    RAW_READING_STORE=s3 archives the batch to S3 and only keeps its key
+    """
+    if not raw_by_id:
+        return
+    created_on = datetime.utcnow()
+    if raw_reading_store == RAW_STORE_S3:
+        s3_key = archive_raw_readings(raw_by_id, created_on)
+        rows = [
+            {
+                "reading_id": reading_id,
+                "raw": None,
+                "s3_key": s3_key,
+                "created_on": created_on,
+            }
+            for reading_id in raw_by_id
+        ]
+    else:
+        rows = [
+            {
+                "reading_id": reading_id,
+                "raw": compress_raw(raw),
+                "s3_key": None,
+                "created_on": created_on,
+            }
+            for reading_id, raw in raw_by_id.items()
+        ]
+    cursor.executemany(INSERT_DEVICE_READING_RAW, rows)
+
+
+def read_archived_raw(s3_key, reading_id):
+    """
+    Scans the S3 archive of the batch for the raw payload of the reading
+    """
+    response = s3_client.get_object(Bucket=raw_reading_bucket, Key=s3_key)
+    for line in gzip.decompress(response["Body"].read()).splitlines():
+        archived = json.loads(line)
+        if archived["reading_id"] == reading_id:
+            return archived["raw"]
+    return None
+
+
+def get_raw_reading(cnx, reading_id):
+    """
+    Returns the raw payload of the reading as received from the device,
+    loaded from the cold table or its S3 archive on request
+    """
+    row = read_as_dict(
+        cnx, GET_DEVICE_READING_RAW, {"reading_id": reading_id}, fetchone=True
+    )
+    if not row:
+        return None
+    if row["raw"] is not None:
+        raw = row["raw"]
+        return json.loads(raw.decode("utf-8") if isinstance(raw, bytes) else raw)
+    if row["s3_key"]:
+        raw = read_archived_raw(row["s3_key"], int(reading_id))
+        return json.loads(raw) if raw else None
+    return None
+
+
+def lambda_handler(event, context):
+    """
+    Handler function of the raw view of a device reading
+    """
+    cnx = get_reusable_connection()
+    auth_user = event["requestContext"].get("authorizer")
+    role = auth_user["userRole"]
+    reading_id = event["pathParameters"].get("reading_id")
+    patient = read_as_dict(
+        cnx, GET_PATIENT_OF_DEVICE_READING, {"reading_id": reading_id}, fetchone=True
+    )
+    if not patient:
+        status_code, result = HTTPStatus.NOT_FOUND, {"message": "Reading not found"}
+    else:
+        user_data = find_user_by_external_id(cnx, auth_user["userSub"], role)
+        is_allowed, access_result = check_user_access_for_patient_data(
+            cnx=cnx,
+            role=role,
+            user_data=user_data,
+            patient_internal_id=patient["patient_internal_id"],
+        )
+        if not is_allowed:
+            status_code, result = HTTPStatus.BAD_REQUEST, access_result
+        else:
+            raw = get_raw_reading(cnx, reading_id)
+            if raw is None:
+                status_code, result = HTTPStatus.NOT_FOUND, {
+                    "message": "Raw reading not found"
+                }
+            else:
+                status_code, result = HTTPStatus.OK, raw
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(result, default=str),
+        "headers": get_headers(),
+    }
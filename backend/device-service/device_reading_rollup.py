@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+import pymysql
+from custom_exception import GeneralException
+from shared import get_reusable_connection, transaction
+from sqls.device import REBUILD_DEVICE_READING_DAILY
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+days_per_batch = int(os.getenv("ROLLUP_DAYS_PER_BATCH", "7"))
+
+# The nightly run re-aggregates the last days to heal readings
+# that were inserted without updating the rollup
+DEFAULT_RECONCILE_DAYS = 2
+
+
+def rebuild_daily_rollup(cnx, start_date: date, end_date: date):
+    """
+    This function re-aggregates device_reading into device_reading_daily
+    for the days between start_date and end_date (both included)
+    in batches of days_per_batch days, one transaction per batch.
+    Existing rollup rows of the rebuilt days are overwritten
+    so the job can be re-run safely
+    """
+    rows = 0
+    batch_start = start_date
+    while batch_start <= end_date:
+        batch_end = min(batch_start + timedelta(days=days_per_batch - 1), end_date)
+        with transaction(cnx) as cursor:
+            rows += cursor.execute(
+                REBUILD_DEVICE_READING_DAILY,
+                {
+                    "start_dt": datetime.combine(batch_start, datetime.min.time()),
+                    "end_dt": datetime.combine(
+                        batch_end + timedelta(days=1), datetime.min.time()
+                    ),
+                },
+            )
+        logger.info("Rebuilt device reading rollup from %s to %s", batch_start, batch_end)
+        batch_start = batch_end + timedelta(days=1)
+    return rows
+
+
+def lambda_handler(event, context):
+    """
+    Backfill and nightly reconcile job of the daily device reading rollup.
+    The event can carry "start_date" and "end_date" (YYYY-MM-DD)
+    to backfill a date range, by default the last DEFAULT_RECONCILE_DAYS
+    days are rebuilt
+    """
+    event = event or {}
+    today = datetime.utcnow().date()
+    try:
+        start_date = (
+            datetime.strptime(event["start_date"], "%Y-%m-%d").date()
+            if event.get("start_date")
+            else today - timedelta(days=DEFAULT_RECONCILE_DAYS - 1)
+        )
+        end_date = (
+            datetime.strptime(event["end_date"], "%Y-%m-%d").date()
+            if event.get("end_date")
+            else today
+        )
+    except ValueError as err:
+        logger.error(err)
+        return {"statusCode": 400, "body": json.dumps("Invalid date range")}
+    try:
+        rows = rebuild_daily_rollup(get_reusable_connection(), start_date, end_date)
+        return {
+            "statusCode": 200,
+            "body": json.dumps(
+                {
+                    "start_date": str(start_date),
+                    "end_date": str(end_date),
+                    "rows": rows,
+                }
+            ),
+        }
+    except (pymysql.MySQLError, GeneralException) as err:
+        logger.exception(err)
+        return {"statusCode": 500, "body": json.dumps(str(err))}
@@ -1,23 +1,3 @@
-INSERT_DEVICE_READING = """
-INSERT INTO device_reading (
-  imei, timestamp, battery_voltage, 
-  signalStrength, systolic, diastolic, 
-  pulse, unit, irregular, raw
-) 
-VALUES 
-  (
-    %(imei)s, 
-    %(timestamp)s, 
-    %(battery_voltage)s, 
-    %(signalStrength)s, 
-    %(systolic)s, 
-    %(diastolic)s, 
-    %(pulse)s, 
-    %(unit)s, 
-    %(irregular)s, 
-    %(raw)s
-  )
-"""
 INSERT_DEVICE_PAIRING = """
 INSERT INTO device_pairing
             (patient_internal_id,
@@ -76,7 +56,121 @@ WHERE  active = 'Y'
        AND imei = %(imei)s
 """
 
-GET_NETWORK_PROVIDERS = """
+# Daily device reading rollup, one row per patient, device and UTC day
+
+REBUILD_DEVICE_READING_DAILY = """
+INSERT INTO device_reading_daily (
+  patient_internal_id, imei, reading_date,
+  reading_count, min_systolic, max_systolic,
+  min_diastolic, max_diastolic, min_pulse,
+  max_pulse, updated_on
+)
+SELECT
+  device_pairing.patient_internal_id,
+  device_reading.imei,
+  DATE(device_reading.timestamp),
+  COUNT(*),
+  MIN(device_reading.systolic),
+  MAX(device_reading.systolic),
+  MIN(device_reading.diastolic),
+  MAX(device_reading.diastolic),
+  MIN(device_reading.pulse),
+  MAX(device_reading.pulse),
+  UTC_TIMESTAMP()
+FROM
+  device_reading
+    INNER JOIN
+  device_pairing ON device_reading.imei = device_pairing.imei
+    AND device_reading.timestamp > device_pairing.start_date
+    AND (device_reading.timestamp <= device_pairing.end_date
+      OR device_pairing.end_date IS NULL)
+WHERE
+  device_reading.timestamp >= %(start_dt)s
+  AND device_reading.timestamp < %(end_dt)s
+GROUP BY device_pairing.patient_internal_id, device_reading.imei, DATE(device_reading.timestamp)
+ON DUPLICATE KEY UPDATE
+  reading_count = VALUES(reading_count),
+  min_systolic = VALUES(min_systolic),
+  max_systolic = VALUES(max_systolic),
+  min_diastolic = VALUES(min_diastolic),
+  max_diastolic = VALUES(max_diastolic),
+  min_pulse = VALUES(min_pulse),
+  max_pulse = VALUES(max_pulse),
+  updated_on = VALUES(updated_on)
+"""
+
+# Batch ingestion
+
+INSERT_DEVICE_READINGS_IGNORE_DUPLICATES = """
+INSERT IGNORE INTO device_reading (
+  imei, timestamp, battery_voltage,
+  signalStrength, systolic, diastolic,
+  pulse, unit, irregular
+)
+VALUES
+  (
+    %(imei)s,
+    %(timestamp)s,
+    %(battery_voltage)s,
+    %(signalStrength)s,
+    %(systolic)s,
+    %(diastolic)s,
+    %(pulse)s,
+    %(unit)s,
+    %(irregular)s
+  )
+"""
+
+GET_DEVICE_READINGS_OF_IMEIS = """
+SELECT id, imei, timestamp
+FROM   device_reading
+WHERE  imei IN %(imeis)s
+       AND timestamp >= %(start_ts)s
+       AND timestamp <= %(end_ts)s
+"""
+
+GET_PAIRINGS_OF_IMEIS = """
+SELECT patient_internal_id,
+       imei,
+       start_date,
+       end_date
+FROM   device_pairing
+WHERE  imei IN %(imeis)s
+"""
+
+INSERT_DEVICE_READING_DAILY_ROWS = """
+INSERT INTO device_reading_daily (
+  patient_internal_id, imei, reading_date,
+  reading_count, min_systolic, max_systolic,
+  min_diastolic, max_diastolic, min_pulse,
+  max_pulse, updated_on
+)
+VALUES
+  (
+    %(patient_internal_id)s,
+    %(imei)s,
+    %(reading_date)s,
+    %(reading_count)s,
+    %(min_systolic)s,
+    %(max_systolic)s,
+    %(min_diastolic)s,
+    %(max_diastolic)s,
+    %(min_pulse)s,
+    %(max_pulse)s,
+    %(updated_on)s
+  )
+ON DUPLICATE KEY UPDATE
+  reading_count = reading_count + VALUES(reading_count),
+  min_systolic = LEAST(min_systolic, VALUES(min_systolic)),
+  max_systolic = GREATEST(max_systolic, VALUES(max_systolic)),
+  min_diastolic = LEAST(min_diastolic, VALUES(min_diastolic)),
+  max_diastolic = GREATEST(max_diastolic, VALUES(max_diastolic)),
+  min_pulse = LEAST(min_pulse, VALUES(min_pulse)),
+  max_pulse = GREATEST(max_pulse, VALUES(max_pulse)),
+  updated_on = VALUES(updated_on)
+"""
+
+GET_NETWORK_PROVIDERS_OF_PATIENTS = """
 SELECT DISTINCT union_table.external_id AS external_id,
                 union_table.internal_id AS internal_id,
                 networks.alert_receiver AS user_alert_receiver,
@@ -93,9 +187,38 @@ FROM   networks
          ON union_table.internal_id = networks.user_internal_id
        JOIN patients
          ON networks._patient_id = patients.id
+WHERE  patients.internal_id IN %(patient_internal_ids)s
+"""
+
+# Raw device payloads, kept out of device_reading in the cold device_reading_raw
+# table, compressed in the MySQL COMPRESS() format or archived to S3
+
+INSERT_DEVICE_READING_RAW = """
+INSERT IGNORE INTO device_reading_raw (reading_id, raw, s3_key, created_on)
+VALUES
+  (
+    %(reading_id)s,
+    %(raw)s,
+    %(s3_key)s,
+    %(created_on)s
+  )
+"""
+
+GET_DEVICE_READING_RAW = """
+SELECT reading_id,
+       UNCOMPRESS(raw) AS raw,
+       s3_key
+FROM   device_reading_raw
+WHERE  reading_id = %(reading_id)s
+"""
+
+GET_PATIENT_OF_DEVICE_READING = """
+SELECT device_pairing.patient_internal_id
+FROM   device_reading
        JOIN device_pairing
-         ON patients.internal_id = device_pairing.patient_internal_id
-WHERE  device_pairing.imei = %(imei)s
-       AND device_pairing.active = 'Y'
-       AND device_pairing.end_date IS NULL; 
+         ON device_reading.imei = device_pairing.imei
+            AND device_reading.timestamp > device_pairing.start_date
+            AND ( device_reading.timestamp <= device_pairing.end_date
+                   OR device_pairing.end_date IS NULL )
+WHERE  device_reading.id = %(reading_id)s
 """
@@ -0,0 +1,99 @@
+import ast
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from billing_sqls import GET_BILLING_OF_PATIENTS
+from custom_exception import GeneralException
+from shared import chunks, read_as_dict
+
+logger = logging.getLogger(__name__)
+
+IN_CLAUSE_CHUNK_SIZE = 500
+BILLING_STATUS_APPROVED = "Approve"
+
+
+def parse_billing_codes(value):
+    """
+    Returns the list of {"code": ..., "desc": ...} objects stored in the
+    billing_charge_code / billing_diagnose_code columns.
+    The columns hold JSON, rows written before the JSON columns
+    were stored as python literals and are read with literal_eval.
+    Raises GeneralException if the value is not a list of code objects
+    """
+    if value is None or value == "":
+        return []
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    codes = value
+    if isinstance(value, str):
+        try:
+            codes = json.loads(value)
+        except ValueError:
+            try:
+                codes = ast.literal_eval(value)
+            except (ValueError, SyntaxError) as err:
+                raise GeneralException(f"Invalid billing codes: {err}") from err
+    if not isinstance(codes, list) or not all(
+        isinstance(code, dict) and code.get("code") not in (None, "") for code in codes
+    ):
+        raise GeneralException("Billing codes must be a list of objects with a code")
+    for code in codes:
+        code["code"] = str(code["code"])
+    return codes
+
+
+def dump_billing_codes(value):
+    """
+    Validates the billing codes and returns them as the JSON stored in the DB
+    """
+    return json.dumps(parse_billing_codes(value))
+
+
+def get_charge_codes(value):
+    """
+    Returns the codes of the billing charges
+    """
+    return [charge["code"] for charge in parse_billing_codes(value)]
+
+
+def parse_billing_record(record):
+    """
+    Replaces the stored charges and diagnoses of a billing_detail row
+    with their parsed lists. Unreadable values are logged and left empty
+    """
+    for column in ("billing_charge_code", "billing_diagnose_code"):
+        if column not in record:
+            continue
+        try:
+            record[column] = parse_billing_codes(record[column])
+        except GeneralException as err:
+            logger.error("billing %s %s: %s", record.get("id"), column, err)
+            record[column] = []
+    return record
+
+
+def get_billing_of_patients(
+    cnx,
+    patient_internal_ids,
+    status=BILLING_STATUS_APPROVED,
+    start_dt=None,
+    end_dt=None,
+):
+    """
+    Bulk variant of the billing readers.
+    Returns a dict of patient_internal_id -> parsed billing records,
+    latest date of service first, queried IN_CLAUSE_CHUNK_SIZE patients at a time
+    """
+    billing = defaultdict(list)
+    params = {
+        "status": status,
+        "start_dt": start_dt or datetime.min,
+        "end_dt": end_dt or datetime.max,
+    }
+    for id_chunk in chunks(list(set(patient_internal_ids)), IN_CLAUSE_CHUNK_SIZE):
+        params["patient_ids"] = tuple(id_chunk)
+        for record in read_as_dict(cnx, GET_BILLING_OF_PATIENTS, params) or []:
+            billing[record["patient_internal_id"]].append(parse_billing_record(record))
+    return billing
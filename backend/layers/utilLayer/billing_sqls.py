@@ -0,0 +1,20 @@
+GET_BILLING_OF_PATIENTS = """
+SELECT 
+    billing_detail.id,
+    billing_detail.patient_internal_id,
+    billing_detail.provider_internal_id,
+    billing_detail.provider_name,
+    billing_detail.billing_org_id,
+    billing_detail.billing_charge_code,
+    billing_detail.billing_diagnose_code,
+    billing_detail.date_of_service,
+    billing_detail.`status`
+FROM
+    billing_detail
+WHERE
+    billing_detail.patient_internal_id IN %(patient_ids)s
+        AND billing_detail.`status` = %(status)s
+        AND billing_detail.date_of_service >= %(start_dt)s
+        AND billing_detail.date_of_service <= %(end_dt)s
+ORDER BY billing_detail.date_of_service DESC, billing_detail.id DESC;
+"""
@@ -0,0 +1,127 @@
+import ast
+import json
+from datetime import date
+
+import pymysql
+from call_sqls import (
+    ADD_CALL_MONTHLY_TOTAL,
+    GET_CALL_FOR_UPDATE,
+    GET_MEETING_CALL_FOR_UPDATE,
+)
+from custom_exception import GeneralException
+from shared import transaction, utc_to_cst
+
+# notes with this id hold the free text of the caller,
+# the other ids are picked from the call_notes list
+FREE_TEXT_NOTE_ID = "999"
+
+
+def parse_call_notes(value):
+    """
+    Returns the list of {"id": ..., "desc": ...} notes stored in call_logs.notes.
+    The column holds JSON, rows written before the JSON column
+    were stored as python literals and are read with literal_eval.
+    Raises GeneralException if the value is not a list of note objects
+    """
+    if value is None or value == "":
+        return []
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    notes = value
+    if isinstance(value, str):
+        try:
+            notes = json.loads(value)
+        except ValueError:
+            try:
+                notes = ast.literal_eval(value.replace("\n", ""))
+            except (ValueError, SyntaxError) as err:
+                raise GeneralException(f"Invalid call notes: {err}") from err
+    if not isinstance(notes, list) or not all(
+        isinstance(note, dict) and "desc" in note for note in notes
+    ):
+        raise GeneralException("Call notes must be a list of objects with a desc")
+    for note in notes:
+        note["id"] = str(note.get("id", ""))
+        note["desc"] = str(note["desc"] or "")
+    return notes
+
+
+def dump_call_notes(value):
+    """
+    Validates the call notes and returns them as the JSON stored in the DB
+    """
+    return json.dumps(parse_call_notes(value))
+
+
+def get_call_period(start_timestamp):
+    """
+    Returns the first day of the month (CST) of the UTC call start
+    """
+    local = utc_to_cst(start_timestamp)
+    return date(local.year, local.month, 1)
+
+
+def apply_call_totals(cursor, old_call=None, new_call=None):
+    """
+    Moves a call between the buckets of call_log_monthly_totals on the input
+    cursor, in the transaction changing the call.
+    old_call is the row before the change (None on insert),
+    new_call the row after it (None on hard delete).
+    Calls without a start or a duration are not counted
+    """
+    rows = []
+    for call, sign in ((old_call, -1), (new_call, 1)):
+        if not call or not call.get("start_timestamp") or call.get("duration") is None:
+            continue
+        rows.append(
+            {
+                "patient_internal_id": call["patient_internal_id"],
+                "provider_internal_id": call["provider_internal_id"],
+                "org_id": call.get("org_id") or 0,
+                "status": call["status"] or "",
+                "period": get_call_period(call["start_timestamp"]),
+                "total_duration": sign * int(call["duration"] or 0),
+                "call_count": sign,
+            }
+        )
+    if rows:
+        cursor.executemany(ADD_CALL_MONTHLY_TOTAL, rows)
+
+
+def get_calls_for_update(cursor, call_id=None, meeting_id=None):
+    """
+    Locks and returns the call_logs rows counted in the monthly totals,
+    by call id or meeting id, as a dict of id -> row.
+    cursor must be a DictCursor
+    """
+    if meeting_id is not None:
+        cursor.execute(GET_MEETING_CALL_FOR_UPDATE, {"meeting_id": meeting_id})
+    else:
+        cursor.execute(GET_CALL_FOR_UPDATE, {"call_id": call_id})
+    return {call["id"]: call for call in cursor.fetchall()}
+
+
+def update_call(cnx, query, params, call_id=None, meeting_id=None):
+    """
+    Runs the update of the call(s) of the call id or meeting id and moves
+    them between the monthly total buckets in the same transaction
+    """
+    with transaction(cnx, pymysql.cursors.DictCursor) as cursor:
+        old_calls = get_calls_for_update(cursor, call_id, meeting_id)
+        cursor.execute(query, params)
+        new_calls = get_calls_for_update(cursor, call_id, meeting_id)
+        for key in old_calls.keys() | new_calls.keys():
+            apply_call_totals(cursor, old_calls.get(key), new_calls.get(key))
+
+
+def insert_call(cnx, query, params):
+    """
+    Inserts a call and adds it to its monthly total bucket
+    in the same transaction. Returns the call id
+    """
+    with transaction(cnx, pymysql.cursors.DictCursor) as cursor:
+        cursor.execute(query, params)
+        call_id = cursor.lastrowid
+        for call in get_calls_for_update(cursor, call_id=call_id).values():
+            apply_call_totals(cursor, new_call=call)
+    return call_id
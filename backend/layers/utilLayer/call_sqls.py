@@ -0,0 +1,45 @@
+GET_CALL_FOR_UPDATE = """
+SELECT id,
+       patient_internal_id,
+       provider_internal_id,
+       org_id,
+       `status`,
+       start_timestamp,
+       duration
+FROM   call_logs
+WHERE  id = %(call_id)s
+FOR UPDATE
+"""
+
+GET_MEETING_CALL_FOR_UPDATE = """
+SELECT id,
+       patient_internal_id,
+       provider_internal_id,
+       org_id,
+       `status`,
+       start_timestamp,
+       duration
+FROM   call_logs
+WHERE  meeting_id = %(meeting_id)s
+FOR UPDATE
+"""
+
+ADD_CALL_MONTHLY_TOTAL = """
+INSERT INTO call_log_monthly_totals (
+  patient_internal_id, provider_internal_id, org_id, `status`, period,
+  total_duration, call_count
+)
+VALUES
+  (
+    %(patient_internal_id)s,
+    %(provider_internal_id)s,
+    %(org_id)s,
+    %(status)s,
+    %(period)s,
+    %(total_duration)s,
+    %(call_count)s
+  )
+ON DUPLICATE KEY UPDATE
+  total_duration = total_duration + VALUES(total_duration),
+  call_count = call_count + VALUES(call_count)
+"""
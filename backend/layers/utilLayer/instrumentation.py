@@ -0,0 +1,206 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import boto3
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+instrumentation_enabled = os.getenv("INSTRUMENTATION_ENABLED", "1") == "1"
+metrics_namespace = os.getenv("METRICS_NAMESPACE", "Carex")
+
+# name -> [count, total milliseconds] of the current invocation
+_metrics = {}
+_lock = threading.Lock()
+_installed = False
+
+
+def record(name, elapsed_ms):
+    """
+    Adds one call of elapsed_ms milliseconds to the counter name
+    """
+    with _lock:
+        counter = _metrics.setdefault(name, [0, 0.0])
+        counter[0] += 1
+        counter[1] += elapsed_ms
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+def get_metrics():
+    """
+    Returns {name: (count, total milliseconds)} of the current invocation
+    """
+    with _lock:
+        return {name: (count, total) for name, (count, total) in _metrics.items()}
+
+
+@contextmanager
+def measure(name):
+    """
+    Counts and times the block under name
+    """
+    tic = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - tic) * 1000)
+
+
+def instrumented(name=None):
+    """
+    Decorator counting and timing every call of the function
+    under name, the function name by default
+    """
+
+    def decorator(func):
+        metric_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(metric_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _instrument_cursor():
+    """
+    Counts every statement sent by a pymysql cursor, executemany included:
+    it runs execute once per batch or per row, one round trip each
+    """
+    execute = pymysql.cursors.Cursor.execute
+
+    @functools.wraps(execute)
+    def instrumented_execute(self, query, args=None):
+        with measure("sql"):
+            return execute(self, query, args)
+
+    pymysql.cursors.Cursor.execute = instrumented_execute
+
+
+def _before_aws_call(context=None, **kwargs):
+    if context is not None:
+        context["instrumentation_started"] = time.perf_counter()
+
+
+def _after_aws_call(event_name, context=None, **kwargs):
+    # the start is missing if an earlier before-call handler answered the call
+    started = (context or {}).pop("instrumentation_started", None)
+    elapsed_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+    # after-call.<service>.<operation> / after-call-error.<service>.<operation>
+    _, service, operation = event_name.split(".", 2)
+    record(f"aws.{service}.{operation}", elapsed_ms)
+
+
+def _instrument_aws():
+    """
+    Counts every boto3 call of the clients and resources created afterwards
+    from the default session, by service and operation
+    """
+    events = boto3._get_default_session().events
+    events.register("before-call", _before_aws_call, "instrumentation-before")
+    events.register("after-call", _after_aws_call, "instrumentation-after")
+    events.register("after-call-error", _after_aws_call, "instrumentation-error")
+
+
+def install():
+    """
+    Hooks the pymysql cursors and the boto3 default session, once per container.
+    Imported by shared so it runs before the service modules create clients
+    """
+    global _installed
+    if _installed or not instrumentation_enabled:
+        return
+    _installed = True
+    _instrument_cursor()
+    _instrument_aws()
+
+
+def get_route(event):
+    """
+    Returns the API Gateway route of the event, the function runs for
+    scheduled or asynchronous events
+    """
+    if isinstance(event, dict) and event.get("resource"):
+        return f"{event.get('httpMethod', '')} {event['resource']}".strip()
+    return "invoke"
+
+
+def emit_metrics(function_name, route, duration_ms, status):
+    """
+    Prints the counters of the invocation as one CloudWatch embedded metric
+    format line: <name>.count and <name>.time for each counter
+    """
+    metrics = get_metrics()
+    line = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": metrics_namespace,
+                    "Dimensions": [["Function", "Route"]],
+                    "Metrics": [{"Name": "duration", "Unit": "Milliseconds"}]
+                    + [
+                        metric
+                        for name in sorted(metrics)
+                        for metric in (
+                            {"Name": f"{name}.count", "Unit": "Count"},
+                            {"Name": f"{name}.time", "Unit": "Milliseconds"},
+                        )
+                    ],
+                }
+            ],
+        },
+        "Function": function_name,
+        "Route": route,
+        "status": status,
+        "duration": round(duration_ms, 3),
+    }
+    for name, (count, total) in metrics.items():
+        line[f"{name}.count"] = count
+        line[f"{name}.time"] = round(total, 3)
+    print(json.dumps(line))
+
+
+def instrument_handler(handler):
+    """
+    Lambda handler decorator emitting the SQL, AWS and shared function
+    counters and timings of each invocation as one structured log line
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not instrumentation_enabled:
+            return handler(event, context)
+        reset_metrics()
+        status = "error"
+        tic = time.perf_counter()
+        try:
+            response = handler(event, context)
+            status = (
+                response.get("statusCode", "ok") if isinstance(response, dict) else "ok"
+            )
+            return response
+        finally:
+            try:
+                emit_metrics(
+                    getattr(context, "function_name", None) or handler.__module__,
+                    get_route(event),
+                    (time.perf_counter() - tic) * 1000,
+                    str(getattr(status, "value", status)),
+                )
+            except (TypeError, ValueError) as err:
+                logger.error(err)
+
+    return wrapper
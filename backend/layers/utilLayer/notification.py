@@ -120,6 +120,22 @@ def insert_to_remote_vital_notification_table(
         print(e)
 
 
+def insert_to_remote_vital_notification_table_bulk(notifications):
+    """
+    Inserts the rows in remote_vital_notifications Table with one
+    multi-row statement, every row has the insert_to_remote_vital_notification_table
+    arguments as keys
+    """
+    if not notifications:
+        return
+    try:
+        with cnx.cursor() as cursor:
+            cursor.executemany(INSERT_REMOTE_VITAL_NOTIFICATION, notifications)
+        cnx.commit()
+    except GeneralException as e:
+        print(e)
+
+
 def insert_to_care_team_notification_table(
     ct_member_internal_id,
     patient_internal_id,
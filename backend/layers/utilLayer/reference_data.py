@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from http import HTTPStatus
+
+from custom_exception import GeneralException
+from shared import get_headers, read_query
+
+logger = logging.getLogger(__name__)
+
+# seconds a container serves a dataset before checking its version again
+reference_data_ttl = int(os.getenv("REFERENCE_DATA_TTL", "300"))
+# seconds clients and CloudFront may reuse a response without revalidating
+reference_data_max_age = int(os.getenv("REFERENCE_DATA_MAX_AGE", "300"))
+
+GET_REFERENCE_DATA_VERSIONS = """
+SELECT name,
+       version
+FROM   reference_data_version
+WHERE  name IN %(names)s
+ORDER  BY name
+"""
+
+# name -> {"marker", "checked_at", "body", "etag"}, kept for the container lifetime
+_datasets = {}
+
+
+def get_data_marker(cnx, tables):
+    """
+    Returns the change marker of the tables, the versions bumped by the
+    triggers of the reference tables. Tables without a version row
+    have no marker and are reloaded every REFERENCE_DATA_TTL
+    """
+    if not tables:
+        return None
+    rows = read_query(cnx, GET_REFERENCE_DATA_VERSIONS, {"names": tuple(tables)})
+    if not rows or len(rows) < len(tables):
+        return None
+    return tuple((name, int(version)) for name, version in rows)
+
+
+def get_reference_data(cnx, name, tables, loader):
+    """
+    Returns the (json body, etag) of a reference dataset.
+    The dataset is loaded with loader(cnx) on first use, served from memory
+    afterwards and only reloaded when the marker of its tables changed.
+    MySQL is not queried at all within REFERENCE_DATA_TTL of the last check.
+    Loaders return None when their read failed, GeneralException is raised
+    and nothing is cached. An empty dataset is cached like any other
+    """
+    now = time.monotonic()
+    dataset = _datasets.get(name)
+    if dataset and now - dataset["checked_at"] < reference_data_ttl:
+        return dataset["body"], dataset["etag"]
+    marker = get_data_marker(cnx, tables)
+    if dataset and marker is not None and marker == dataset["marker"]:
+        dataset["checked_at"] = now
+        return dataset["body"], dataset["etag"]
+    data = loader(cnx)
+    if data is None:
+        raise GeneralException(f"Reference data {name} could not be loaded")
+    body = json.dumps(data, default=str)
+    etag = '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32]
+    logger.info("Loaded reference data %s, version %s", name, marker)
+    _datasets[name] = {"marker": marker, "checked_at": now, "body": body, "etag": etag}
+    return body, etag
+
+
+def get_request_header(event, header):
+    """
+    Returns the request header, API Gateway keeps the case the client sent
+    """
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == header.lower():
+            return value
+    return None
+
+
+def reference_data_response(event, body, etag):
+    """
+    Returns the api response of a reference dataset with its ETag and
+    Cache-Control, 304 without a body if the client already has it
+    """
+    headers = {
+        **get_headers(),
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={reference_data_max_age}",
+    }
+    if_none_match = get_request_header(event, "If-None-Match") or ""
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return {
+            "statusCode": HTTPStatus.NOT_MODIFIED.value,
+            "body": "",
+            "headers": headers,
+        }
+    return {"statusCode": HTTPStatus.OK.value, "body": body, "headers": headers}
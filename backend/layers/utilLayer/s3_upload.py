@@ -0,0 +1,64 @@
+# S3 multipart parts must be at least 5 MB except the last one
+PART_SIZE = 8 * 1024 * 1024
+
+
+class S3MultipartWriter:
+    """
+    File like writer uploading to S3 with a multipart upload.
+    Only one part is buffered in memory at a time
+    """
+
+    def __init__(self, client, bucket, key, content_type, part_size=PART_SIZE):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.parts = []
+        self.upload_id = client.create_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            ContentType=content_type,
+            ServerSideEncryption="AES256",
+        )["UploadId"]
+
+    def write(self, data: bytes):
+        """
+        Buffers the data and uploads a part when the buffer is full
+        """
+        self.buffer.extend(data)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer),
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self.buffer.clear()
+
+    def complete(self):
+        """
+        Uploads the remaining data and completes the upload
+        """
+        if self.buffer or not self.parts:
+            self._upload_part()
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+
+    def abort(self):
+        """
+        Aborts the upload so S3 discards the uploaded parts
+        """
+        self.client.abort_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+        )
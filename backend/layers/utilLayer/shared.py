@@ -6,6 +6,7 @@ import logging
 import os
 import sys
 import time
+from contextlib import contextmanager
 from datetime import date
 from enum import Enum
 from typing import Union
@@ -21,6 +22,7 @@ from Crypto.Cipher import AES
 from custom_exception import GeneralException
 from dateutil import tz
 from dotenv import load_dotenv
+from instrumentation import install, instrumented, record
 from utils_query import GET_LINKED_PATIENTS_OF_PROVIDER
 
 load_dotenv()
@@ -37,8 +39,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# counts the SQL and AWS calls of the clients created from here on
+install()
+
 client = boto3.client("secretsmanager")
 
+# Connections kept open across warm invocations of the same container
+_reusable_connections = {}
+
+# retries of the UnprocessedKeys of a PHI batch_get_item, backoff in seconds
+PHI_BATCH_RETRIES = 5
+PHI_BATCH_BACKOFF = 0.05
+
 
 class User(Enum):
     """
@@ -75,6 +87,7 @@ class User(Enum):
         return role == User.CAREGIVER_USER.value
 
 
+@instrumented()
 def get_secret_manager(secret_id):
     """
     Get the details from Secrets Manager
@@ -172,6 +185,58 @@ def get_analytics_connect():
         return connection
 
 
+def get_reusable_connection(secret_name=None):
+    """
+    Returns a PyMysql Connection object that is reused across
+    warm invocations of the Lambda container.
+    The connection is pinged before being returned and transparently
+    reconnected with the cached credentials if it was dropped,
+    so Secrets Manager is only called on a cold start.
+    :param secret_name: DB secret name, defaults to DB_SECRET_NAME
+    :return: db connection.
+    """
+    secret_name = secret_name or db_secret_name
+    connection = _reusable_connections.get(secret_name)
+    if connection:
+        try:
+            connection.ping(reconnect=True)
+            return connection
+        except pymysql.MySQLError as err:
+            logger.warning(err)
+    db_details = get_secret_manager(secret_name)
+    try:
+        connection = pymysql.connect(
+            host=db_details["host"],
+            user=db_details["username"],
+            passwd=db_details["password"],
+            db=db_details["dbname"],
+            connect_timeout=5,
+        )
+    except pymysql.MySQLError as err:
+        logger.error(err)
+        sys.exit()
+    _reusable_connections[secret_name] = connection
+    return connection
+
+
+@contextmanager
+def transaction(connection, cursor_class=None):
+    """
+    Yields a cursor on the input connection.
+    Commits when the block completes and rolls back if it raises
+    """
+    cursor = connection.cursor(cursor_class) if cursor_class else connection.cursor()
+    try:
+        yield cursor
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+@instrumented()
 def read_query(connection, query, params=None):
     """
     Execute the Select Query and return the result
@@ -189,6 +254,7 @@ def read_query(connection, query, params=None):
         logger.error(err)
 
 
+@instrumented()
 def read_as_dict(connection, query, params=None, fetchone=None):
     """
     Execute a select query and return the outcome as a dict
@@ -282,7 +348,8 @@ def get_db_id_from_external_id(connection, table_name, external_id):
 
 def timer(func):
     """
-    Function creates a timer wrapper for the function passed as the input
+    Function creates a timer wrapper for the function passed as the input,
+    the calls are also counted in the invocation metrics under its name
     """
 
     @functools.wraps(func)
@@ -291,6 +358,7 @@ def timer(func):
         value = func(*args, **kwargs)
         toc = time.perf_counter()
         elapsed_time = toc - tic
+        record(func.__name__, elapsed_time * 1000)
         print(f"Elapsed time: {elapsed_time:0.4f} seconds")
         return value
 
@@ -332,6 +400,7 @@ def get_logged_in_user(access_token, dynamodb=None):
         logging.error(e.response["Error"]["Message"])
 
 
+@instrumented()
 def get_phi_data(external_id, dynamodb=None):
     """
     Get the user PHI data based on external id/user sub
@@ -359,6 +428,7 @@ def chunks(lst, n):
         yield lst[i : i + n]
 
 
+@instrumented()
 def get_phi_data_list(external_ids, dynamodb=None):
     """
     Get the user PHI data based on external id/user sub
@@ -371,17 +441,30 @@ def get_phi_data_list(external_ids, dynamodb=None):
         keys = [{"external_id": external_id} for external_id in external_ids]
         if not dynamodb:
             dynamodb = boto3.resource("dynamodb", dynamodb_region)
-        try:
-            response = dynamodb.batch_get_item(
-                RequestItems={"user_pii": {"Keys": keys, "ConsistentRead": True}},
-                ReturnConsumedCapacity="TOTAL",
-            )
-        except ClientError as e:
-            logger.error(e.response["Error"]["Message"])
-        else:
-            items = response["Responses"]["user_pii"]
-            for item in items:
+        request_items = {"user_pii": {"Keys": keys, "ConsistentRead": True}}
+        # throttled keys come back in UnprocessedKeys, retried with backoff
+        for attempt in range(PHI_BATCH_RETRIES + 1):
+            if attempt:
+                time.sleep(PHI_BATCH_BACKOFF * 2 ** (attempt - 1))
+            try:
+                response = dynamodb.batch_get_item(
+                    RequestItems=request_items,
+                    ReturnConsumedCapacity="TOTAL",
+                )
+            except ClientError as e:
+                logger.error(e.response["Error"]["Message"])
+                break
+            for item in response["Responses"].get("user_pii", []):
                 phi_data[item["external_id"]] = item
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                break
+        else:
+            logger.error(
+                "PHI of %s users unprocessed after %s retries",
+                len(request_items["user_pii"]["Keys"]),
+                PHI_BATCH_RETRIES,
+            )
     return phi_data
     # print(json.dumps(item, indent=4, cls=DecimalEncoder))
 
@@ -649,6 +732,7 @@ def get_org_name(cnx, org_ids):
     return read_as_dict(cnx, query, tuple(org_ids))
 
 
+@instrumented()
 def get_phi_data_from_internal_id(cnx, dynamodb, internal_id, role=None):
     """
     This Function:
@@ -1,14 +1,41 @@
 import json
+import logging
+from http import HTTPStatus
 
+from custom_exception import GeneralException
+from med_catalog import MedCatalogError
+from med_catalog_index import get_catalog_index
 from med_utils import get_product_by_names
 from shared import get_headers
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def search_local_catalog(name, max_result_set):
+    """
+    Searches the local medication index, None if there is no index
+    or it has no match for the name
+    """
+    index = get_catalog_index()
+    if index is None:
+        return None
+    try:
+        return index.search(name, max_result_set) or None
+    except (ValueError, IndexError) as err:
+        logger.exception(err)
+        return None
+
 
 def get_medication_by_name(name, max_result_set):
     """
-    Fetches the medications that matches the name from a web Service.
+    Fetches the medications that matches the name from the local index,
+    from the web Service if there is no local match.
     Returns the medication names
     """
+    local_result = search_local_catalog(name, max_result_set)
+    if local_result:
+        return local_result
     result = get_product_by_names(name, max_result_set)
     final_result = []
     for product in range(len(result[1])):
@@ -25,7 +52,26 @@ def lambda_handler(event, context):
     """
     Find Medication Handler
     """
-    name = event["queryStringParameters"].get("name")
-    max_result_set = event["queryStringParameters"].get("max_results", 20)
-    result = get_medication_by_name(name, max_result_set)
+    query_params = event.get("queryStringParameters") or {}
+    name = query_params.get("name")
+    try:
+        max_result_set = int(query_params.get("max_results", 20))
+        if not name or not name.strip() or max_result_set < 1:
+            raise GeneralException("name and a positive max_results are required")
+    except (ValueError, GeneralException) as err:
+        logger.error(err)
+        return {
+            "statusCode": HTTPStatus.BAD_REQUEST.value,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
+    try:
+        result = get_medication_by_name(name, max_result_set)
+    except MedCatalogError as err:
+        logger.exception(err)
+        return {
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR.value,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
     return {"statusCode": 200, "body": json.dumps(result), "headers": get_headers()}
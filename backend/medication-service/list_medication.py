@@ -1,20 +1,23 @@
-import ast
 from http import HTTPStatus
 import json
 import logging
 
 import boto3
 from custom_exception import GeneralException
-from med_utils import get_external_id_form_internal_id, med_dup_check
+from med_listing import get_listing_params, get_medication_page
+from med_utils import (
+    find_duplicates,
+    get_external_id_form_internal_id,
+    get_ingredient_index,
+    parse_ingredients,
+)
 from shared import (
     find_user_by_external_id,
     get_db_connect,
     get_headers,
     get_phi_data_list,
-    read_as_dict,
     check_user_access_for_patient_data,
 )
-from sqls.medication import med_base_query
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -24,53 +27,13 @@ dynamodb = boto3.resource("dynamodb")
 connection = get_db_connect()
 
 
-def get_ingredient(ingredient, search_filter):
-    """
-    Eval Function to filter medication based on ingredients
-    Returns True if search value is present in the ingredient list given as input
-    """
-    for ing in ingredient:
-        if search_filter.lower() in ing["Name"].lower():
-            return True
-
-
-def filter_med_by_name(name, medication):
-    """
-    Filter medication list based on :
-    1. Search Value being present in medication name
-    2. Search Value being present in medication ingredient names
-    """
-    unique_ids = []
-    filtered_med = []
-    for rec in medication:
-        if name.lower() in rec["ProductShortName"].lower() or get_ingredient(
-            ast.literal_eval(rec["Ingredient"]), name
-        ):
-            if rec["RecordId"] not in unique_ids:
-                unique_ids.append(rec["RecordId"])
-                filtered_med.append(rec)
-    return filtered_med
-
-
-def get_med_base_result(cnx, patient_id, status, name_filter=None, med_reasons=None):
+def get_med_base_result(cnx, patient_id, status, params):
     """Get the medication Base Results."""
-    query = med_base_query
-    if med_reasons:
-        conditions = " OR ".join(
-            [
-                "medication.medication_reasons like " + "'%%" + reason + "%%'"
-                for reason in med_reasons
-            ]
-        )
-        query = query + " AND " + "(" + conditions + ")"
-    medication = read_as_dict(
-        cnx, query, {"patient_id": patient_id, "status": tuple(status)}
-    )
-    if name_filter:
-        medication = filter_med_by_name(name_filter, medication)
+    medication, next_cursor = get_medication_page(cnx, patient_id, status, params)
     response_dict = {}
     if not medication:
         return response_dict
+    response_dict["next_cursor"] = next_cursor
     dup_list = []
     internal_ids = set()
     for med in medication:
@@ -79,11 +42,13 @@ def get_med_base_result(cnx, patient_id, status, name_filter=None, med_reasons=N
     ext_int_id_mapping = get_external_id_form_internal_id(cnx, internal_ids)
     external_ids = list(ext_int_id_mapping.values())
     phi_data = get_phi_data_list(external_ids, dynamodb)
+    ingredient_index = get_ingredient_index(cnx, patient_id) if status == "A" else {}
     try:
         for med in medication:
-            if status == "A":
-                dup_check_list = med_dup_check(
-                    cnx, med["PatientId"], ast.literal_eval(med["Ingredient"]), False
+            med["Ingredient"] = parse_ingredients(med["Ingredient"])
+            if status == "A" and med["Status"] == "A":
+                dup_check_list = find_duplicates(
+                    ingredient_index, med["Ingredient"], False
                 )
                 med["isDuplicate"] = "1" if len(dup_check_list) > 1 else "0"
                 dup_list.extend(dup_check_list)
@@ -98,7 +63,6 @@ def get_med_base_result(cnx, patient_id, status, name_filter=None, med_reasons=N
             med["MedReasons"] = (
                 med["MedReasons"].split(",") if med["MedReasons"] else []
             )
-            med["Ingredient"] = ast.literal_eval(med["Ingredient"])
             med["DiscontinuedReason"] = (
                 json.loads(med["DiscontinuedReason"])
                 if med["DiscontinuedReason"]
@@ -114,23 +78,19 @@ def get_med_base_result(cnx, patient_id, status, name_filter=None, med_reasons=N
         logger.exception(e)
 
 
-def get_active_medication(cnx, patient_id, name_filter=None, med_reasons=None):
+def get_active_medication(cnx, patient_id, params):
     """
     Returns the Active Medications for a patient
     """
-    active_medication = get_med_base_result(
-        cnx, patient_id, "A", name_filter, med_reasons
-    )
+    active_medication = get_med_base_result(cnx, patient_id, "A", params)
     return active_medication
 
 
-def get_stopped_medication(cnx, patient_id, name_filter=None, med_reasons=None):
+def get_stopped_medication(cnx, patient_id, params):
     """
     Returns the Stopped Medication for a patient.
     """
-    stopped_medication = get_med_base_result(
-        cnx, patient_id, "S", name_filter, med_reasons
-    )
+    stopped_medication = get_med_base_result(cnx, patient_id, "S", params)
     if stopped_medication:
         stopped_medication.pop("Duplication", None)
         stopped_medication.pop("PatientId", None)
@@ -147,12 +107,15 @@ def lambda_handler(event, context):
     query_params = (
         event["queryStringParameters"] if event["queryStringParameters"] else {}
     )
-    name_filter = query_params.get("name_filter", None)
-    med_reasons = (
-        query_params["med_reasons"].split(",")
-        if query_params.get("med_reasons")
-        else None
-    )
+    try:
+        params = get_listing_params(query_params)
+    except GeneralException as err:
+        logger.error(err)
+        return {
+            "statusCode": HTTPStatus.BAD_REQUEST,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
     is_allowed, access_result = check_user_access_for_patient_data(
         cnx=connection,
         role=role,
@@ -161,14 +124,10 @@ def lambda_handler(event, context):
     )
     if is_allowed and access_result and access_result["message"] == "Success":
         if "listactivemedication" in event["path"].split("/"):
-            medication = get_active_medication(
-                connection, patient_id, name_filter, med_reasons
-            )
+            medication = get_active_medication(connection, patient_id, params)
             status_code = HTTPStatus.OK
         else:
-            medication = get_stopped_medication(
-                connection, patient_id, name_filter, med_reasons
-            )
+            medication = get_stopped_medication(connection, patient_id, params)
             status_code = HTTPStatus.OK
     else:
         status_code = HTTPStatus.BAD_REQUEST
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+import requests
+from custom_exception import GeneralException
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+load_dotenv()
+
+clinical_table_url = os.getenv("CLINICALTABLES_URL")
+rxcui_url = os.getenv("RXCUIS_URL")
+catalog_cache_size = int(os.getenv("MED_CATALOG_CACHE_SIZE", "2048"))
+catalog_cache_ttl = int(os.getenv("MED_CATALOG_CACHE_TTL", "21600"))
+catalog_pool_size = int(os.getenv("MED_CATALOG_POOL_SIZE", "4"))
+
+CATALOG_TIMEOUT = (3.05, 5)
+
+
+class MedCatalogError(GeneralException):
+    """
+    The medication catalog (RxNav / ClinicalTables) could not be reached
+    or returned an error
+    """
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire ttl seconds after they were stored
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns (True, value) for a live entry, (False, None) otherwise
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _PendingLookup:
+    """
+    A lookup in flight, the threads asking for the same key wait on it
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class MedCatalogClient:
+    """
+    Client of the medication catalog web services.
+    Keeps one pooled HTTP session per container, caches the responses and
+    runs a single request for concurrent lookups of the same key.
+    Cached responses are shared, callers must not modify them
+    """
+
+    def __init__(self, search_url, rxcui_url, cache_size, cache_ttl, pool_size):
+        self.search_url = search_url
+        self.rxcui_url = rxcui_url
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _get_json(self, url):
+        try:
+            response = self.session.get(url, timeout=CATALOG_TIMEOUT)
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as err:
+            raise MedCatalogError(f"Medication catalog request failed: {err}") from err
+
+    def _lookup(self, key, url):
+        """
+        Returns the cached response of key or fetches url,
+        concurrent callers of the same key share one request.
+        Failures are raised to every waiting caller and not cached
+        """
+        found, value = self.cache.get(key)
+        if found:
+            return value
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _PendingLookup()
+        if not owner:
+            pending.done.wait()
+            if pending.error:
+                raise pending.error
+            return pending.value
+        try:
+            pending.value = self._get_json(url)
+            self.cache.set(key, pending.value)
+            return pending.value
+        except Exception as err:
+            pending.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+
+    def search_products(self, name, max_results):
+        """
+        Returns the ClinicalTables RxTerms response of the products
+        whose name starts with name
+        """
+        prefix = " ".join(name.split()).lower()
+        max_results = int(max_results)
+        url = f"{self.search_url}{quote(prefix)}&maxList={max_results}"
+        return self._lookup(("search", prefix, max_results), url)
+
+    def get_rxcui_history(self, rxcui):
+        """
+        Returns the RxNav history status of the rxcui
+        """
+        rxcui = str(rxcui).strip()
+        url = self.rxcui_url.format(rxcui=quote(rxcui))
+        return self._lookup(("rxcui", rxcui), url)
+
+
+catalog = MedCatalogClient(
+    clinical_table_url,
+    rxcui_url,
+    catalog_cache_size,
+    catalog_cache_ttl,
+    catalog_pool_size,
+)
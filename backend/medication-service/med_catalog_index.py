@@ -0,0 +1,233 @@
+import bisect
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+
+import boto3
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# index shipped in a Lambda layer, or downloaded from S3 to /tmp
+catalog_index_path = os.getenv("MED_CATALOG_INDEX", "/opt/med_catalog/med_catalog.idx")
+catalog_index_bucket = os.getenv("MED_CATALOG_INDEX_BUCKET")
+catalog_index_key = os.getenv("MED_CATALOG_INDEX_KEY", "med_catalog/med_catalog.idx")
+
+INDEX_MAGIC = b"MEDCAT01"
+# magic, products, keys, offsets of the product table, product blob,
+# key table and key blob
+HEADER = struct.Struct("<8sIIQQQQ")
+PRODUCT_ENTRY = struct.Struct("<I")
+# key offset, product id, token position in the name, name length
+KEY_ENTRY = struct.Struct("<IIHH")
+MAX_TOKEN_POSITION = 0xFFFF
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+_index = None
+_index_loaded = False
+
+
+def tokenize(name):
+    """
+    Returns the lower case words of a medication name
+    """
+    return TOKEN_PATTERN.findall(name.lower())
+
+
+def write_index(products, path):
+    """
+    Writes the products, dicts of productName, strengthsAndForms and rxcuis,
+    as a prefix index file. Product ids follow the order of the names so ties
+    in the ranking come out alphabetically
+    """
+    products = sorted(products, key=lambda product: product["productName"].lower())
+    product_blob = bytearray()
+    product_offsets = []
+    keys = []
+    for product_id, product in enumerate(products):
+        product_offsets.append(len(product_blob))
+        product_blob += json.dumps(product, separators=(",", ":")).encode()
+        name = product["productName"]
+        for position, token in enumerate(tokenize(name)):
+            keys.append(
+                (
+                    token.encode(),
+                    product_id,
+                    min(position, MAX_TOKEN_POSITION),
+                    min(len(name), MAX_TOKEN_POSITION),
+                )
+            )
+    product_offsets.append(len(product_blob))
+    keys.sort()
+
+    key_blob = bytearray()
+    key_table = bytearray()
+    for token, product_id, position, name_length in keys:
+        key_table += KEY_ENTRY.pack(len(key_blob), product_id, position, name_length)
+        key_blob += token
+    key_table += KEY_ENTRY.pack(len(key_blob), 0, 0, 0)
+
+    product_table = b"".join(PRODUCT_ENTRY.pack(offset) for offset in product_offsets)
+    product_table_offset = HEADER.size
+    product_blob_offset = product_table_offset + len(product_table)
+    key_table_offset = product_blob_offset + len(product_blob)
+    key_blob_offset = key_table_offset + len(key_table)
+    with open(path, "wb") as index_file:
+        index_file.write(
+            HEADER.pack(
+                INDEX_MAGIC,
+                len(products),
+                len(keys),
+                product_table_offset,
+                product_blob_offset,
+                key_table_offset,
+                key_blob_offset,
+            )
+        )
+        index_file.write(product_table)
+        index_file.write(product_blob)
+        index_file.write(key_table)
+        index_file.write(key_blob)
+    return len(products), len(keys)
+
+
+class _Keys:
+    """
+    Sorted tokens of the index as a sequence for bisect, read from the map
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.key_count
+
+    def __getitem__(self, position):
+        return self.index.get_key(position)[0]
+
+
+class MedCatalogIndex:
+    """
+    Memory-mapped medication prefix index written by write_index.
+    Only the pages touched by a search are read from the file
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as index_file:
+            self.map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            self.product_count,
+            self.key_count,
+            self.product_table,
+            self.product_blob,
+            self.key_table,
+            self.key_blob,
+        ) = HEADER.unpack_from(self.map)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a medication catalog index")
+        self.keys = _Keys(self)
+
+    def __len__(self):
+        return self.product_count
+
+    def get_key(self, position):
+        """
+        Returns the (token, product id, token position, name length) of a key
+        """
+        offset, product_id, token_position, name_length = KEY_ENTRY.unpack_from(
+            self.map, self.key_table + position * KEY_ENTRY.size
+        )
+        end = KEY_ENTRY.unpack_from(
+            self.map, self.key_table + (position + 1) * KEY_ENTRY.size
+        )[0]
+        token = self.map[self.key_blob + offset : self.key_blob + end]
+        return token, product_id, token_position, name_length
+
+    def get_product(self, product_id):
+        start, end = struct.unpack_from(
+            "<II", self.map, self.product_table + product_id * PRODUCT_ENTRY.size
+        )
+        return json.loads(self.map[self.product_blob + start : self.product_blob + end])
+
+    def match_prefix(self, prefix):
+        """
+        Returns {product id: (token position, name length)} of the products
+        having a word starting with prefix, the first such word of each
+        """
+        prefix = prefix.encode()
+        low = bisect.bisect_left(self.keys, prefix)
+        high = bisect.bisect_left(self.keys, prefix + b"\xff", low)
+        matches = {}
+        for position in range(low, high):
+            _, product_id, token_position, name_length = self.get_key(position)
+            if product_id not in matches or token_position < matches[product_id][0]:
+                matches[product_id] = (token_position, name_length)
+        return matches
+
+    def search(self, name, max_results):
+        """
+        Returns the products having a word starting with every word of name.
+        Names starting with the first word come first, then shorter names,
+        then alphabetical order
+        """
+        tokens = tokenize(name)
+        if not tokens:
+            return []
+        candidates = self.match_prefix(tokens[0])
+        for token in tokens[1:]:
+            if not candidates:
+                break
+            matches = self.match_prefix(token)
+            candidates = {
+                product_id: rank
+                for product_id, rank in candidates.items()
+                if product_id in matches
+            }
+        ranked = sorted(
+            candidates,
+            key=lambda product_id: (
+                candidates[product_id][0] != 0,
+                candidates[product_id][1],
+                product_id,
+            ),
+        )
+        return [self.get_product(product_id) for product_id in ranked[:max_results]]
+
+
+def download_index(path):
+    """
+    Downloads the index from MED_CATALOG_INDEX_BUCKET to path
+    """
+    tmp_path = path + ".part"
+    boto3.client("s3").download_file(catalog_index_bucket, catalog_index_key, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def get_catalog_index():
+    """
+    Returns the local medication index of the container, None if there is no
+    index, in which case searches go to the remote catalog.
+    Loaded once, a missing or corrupt index is not retried
+    """
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    _index_loaded = True
+    path = catalog_index_path
+    try:
+        if not os.path.exists(path) and catalog_index_bucket:
+            path = os.path.join("/tmp", os.path.basename(catalog_index_key))
+            if not os.path.exists(path):
+                download_index(path)
+        if os.path.exists(path):
+            _index = MedCatalogIndex(path)
+            logger.info("Loaded medication index %s, %s products", path, len(_index))
+    except (OSError, ValueError, struct.error, ClientError) as err:
+        logger.exception(err)
+        _index = None
+    return _index
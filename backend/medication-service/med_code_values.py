@@ -1,7 +1,13 @@
 import json
+import logging
+from http import HTTPStatus
 
+from custom_exception import GeneralException
+from reference_data import get_reference_data, reference_data_response
 from shared import get_db_connect, get_headers, read_as_dict, read_query
 
+logger = logging.getLogger(__name__)
+
 connection = get_db_connect()
 
 
@@ -11,6 +17,8 @@ def get_med_duration(cnx):
     """
     query = """ SELECT duration_name FROM med_duration """
     med_duration = read_query(cnx, query)
+    if med_duration is None:
+        return None
     result_set = [duration[0] for duration in med_duration]
     return result_set
 
@@ -21,6 +29,8 @@ def get_med_sig(cnx):
     """
     query = """ SELECT medsig_name FROM med_sig """
     med_sig = read_query(cnx, query)
+    if med_sig is None:
+        return None
     result_set = [sig[0] for sig in med_sig]
     return result_set
 
@@ -31,6 +41,8 @@ def get_med_unit(cnx):
     """
     query = """ SELECT medunit_name FROM med_unit """
     med_unit = read_query(cnx, query)
+    if med_unit is None:
+        return None
     result_set = [unit[0] for unit in med_unit]
     return result_set
 
@@ -41,6 +53,8 @@ def get_med_info_from(cnx):
     """
     query = """ SELECT infofrom_name FROM med_info_from """
     med_info_from = read_query(cnx, query)
+    if med_info_from is None:
+        return None
     result_set = [info[0] for info in med_info_from]
     return result_set
 
@@ -51,6 +65,8 @@ def get_med_reasons(cnx):
     """
     query = """ SELECT medication_reasons FROM med_reasons WHERE entity_active = 'Y' """
     med_reasons = read_query(cnx, query)
+    if med_reasons is None:
+        return None
     result_set = [reason[0] for reason in med_reasons]
     return result_set
 
@@ -61,26 +77,37 @@ def get_med_discontinue_reason(cnx):
     """
     query = """ SELECT discontinue_code as id, discontinue_reason FROM med_discontinue WHERE entity_active = 'Y' """
     result = read_as_dict(cnx, query)
+    if result is None:
+        return None
     return [{"id": item["id"], "reason": item["discontinue_reason"]} for item in result]
 
 
+# api path -> (dataset name, source table, loader)
+MED_CODE_VALUES = {
+    "sig": ("med_sig", "med_sig", get_med_sig),
+    "medreasons": ("med_reasons", "med_reasons", get_med_reasons),
+    "unit": ("med_unit", "med_unit", get_med_unit),
+    "info_from": ("med_info_from", "med_info_from", get_med_info_from),
+    "duration": ("med_duration", "med_duration", get_med_duration),
+    "discontinue": ("med_discontinue", "med_discontinue", get_med_discontinue_reason),
+}
+
+
 def lambda_handler(event, context):
     """
     Medication Unit Handler
     """
     paths = event["path"].split("/")
-    if "sig" in paths:
-        result = get_med_sig(connection)
-    elif "medreasons" in paths:
-        result = get_med_reasons(connection)
-    elif "unit" in paths:
-        result = get_med_unit(connection)
-    elif "info_from" in paths:
-        result = get_med_info_from(connection)
-    elif "duration" in paths:
-        result = get_med_duration(connection)
-    elif "discontinue" in paths:
-        result = get_med_discontinue_reason(connection)
-    else:
-        result = []
-    return {"statusCode": 200, "body": json.dumps(result), "headers": get_headers()}
+    for path, (name, table, loader) in MED_CODE_VALUES.items():
+        if path in paths:
+            try:
+                body, etag = get_reference_data(connection, name, [table], loader)
+            except GeneralException as err:
+                logger.exception(err)
+                return {
+                    "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR,
+                    "body": json.dumps(str(err)),
+                    "headers": get_headers(),
+                }
+            return reference_data_response(event, body, etag)
+    return {"statusCode": 200, "body": json.dumps([]), "headers": get_headers()}
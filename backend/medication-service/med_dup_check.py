@@ -1,6 +1,8 @@
 import json
 import logging
+from http import HTTPStatus
 
+from med_catalog import MedCatalogError
 from med_utils import get_product_name_on_rxcui, med_dup_check
 from shared import get_db_connect, get_headers
 
@@ -97,8 +99,17 @@ def lambda_handler(event, context):
     """
     patient_id = event["pathParameters"].get("patient_id")
     product_id = event["pathParameters"].get("rxcui_id")
+    try:
+        result = dup_check(connection, patient_id, product_id)
+    except MedCatalogError as err:
+        logger.exception(err)
+        return {
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR.value,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
     return {
         "statusCode": 200,
-        "body": json.dumps(dup_check(connection, patient_id, product_id)),
+        "body": json.dumps(result),
         "headers": get_headers(),
     }
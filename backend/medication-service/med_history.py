@@ -1,11 +1,13 @@
 import json
 import logging
+from http import HTTPStatus
 
 import boto3
 from custom_exception import GeneralException
+from med_catalog import MedCatalogError
+from med_listing import get_listing_params, get_medication_page
 from med_utils import get_external_id_form_internal_id, get_product_name_on_rxcui
-from shared import get_db_connect, get_headers, get_phi_data_list, read_as_dict
-from sqls.medication import med_base_query
+from shared import get_db_connect, get_headers, get_phi_data_list
 
 dynamodb = boto3.resource("dynamodb")
 
@@ -15,28 +17,44 @@ logger.setLevel(logging.INFO)
 connection = get_db_connect()
 
 
-def find_medication_by_ingredient_list(cnx, patient_id, ingredients):
+HISTORY_STATUSES = ("M", "S")
+
+
+def get_history_params(query_params):
+    """
+    Validates the history filters, the medication list filters and status,
+    a comma separated subset of the modified (M) and stopped (S) statuses
+    """
+    query_params = query_params or {}
+    params = get_listing_params(query_params)
+    statuses = [
+        status.strip().upper()
+        for status in (query_params.get("status") or "").split(",")
+        if status.strip()
+    ]
+    if any(status not in HISTORY_STATUSES for status in statuses):
+        raise GeneralException("Invalid status")
+    params["statuses"] = tuple(statuses) or HISTORY_STATUSES
+    return params
+
+
+def find_medication_by_ingredient_list(cnx, patient_id, ingredients, params):
     """
-    Find the list of medications having the same ingredients
+    Find the page of medications having the same ingredients,
+    every medication of the history if the drug has no ingredient
     """
-    query = med_base_query
-    if ingredients:
-        conditions = " OR ".join(
-            [
-                "Lower(medication.ingredient) like " + "'%%" + ing["Name"] + "%%'"
-                for ing in ingredients
-            ]
-        )
-        query += " AND " + "(" + conditions + ")"
-    medication = read_as_dict(
-        cnx, query, {"patient_id": patient_id, "status": tuple(["M", "S"])}
+    return get_medication_page(
+        cnx,
+        patient_id,
+        params["statuses"],
+        params,
+        [ing["Name"] for ing in ingredients] if ingredients else None,
     )
-    return medication
 
 
-def get_med_history(cnx, patient_id, rxcui_id):
+def get_med_history(cnx, patient_id, rxcui_id, params):
     """
-    This API Fetches the Medication History for a drug.
+    This API Fetches the Medication History for a drug, a page at a time.
     """
     rxcui_history = get_product_name_on_rxcui(rxcui_id)["rxcuiStatusHistory"].get(
         "definitionalFeatures"
@@ -49,9 +67,11 @@ def get_med_history(cnx, patient_id, rxcui_id):
         for rx in rxcui_history["ingredientAndStrength"]
     ]
     logger.info(ingredients)
-    med_hist = find_medication_by_ingredient_list(cnx, patient_id, ingredients)
+    med_hist, next_cursor = find_medication_by_ingredient_list(
+        cnx, patient_id, ingredients, params
+    )
     if not med_hist:
-        return []
+        return {"Medication": [], "next_cursor": None}
     internal_ids = set()
     for med in med_hist:
         internal_ids.update([med["ModifiedBy"], med["CreatedBy"]])
@@ -81,7 +101,7 @@ def get_med_history(cnx, patient_id, rxcui_id):
         logger.exception(err)
     except GeneralException as err:
         logger.exception(err)
-    return med_hist
+    return {"Medication": med_hist, "next_cursor": next_cursor}
 
 
 def lambda_handler(event, context):
@@ -90,8 +110,26 @@ def lambda_handler(event, context):
     """
     patient_id = event["pathParameters"].get("patient_id")
     rxcui_id = event["pathParameters"].get("rxcui_id")
+    try:
+        params = get_history_params(event.get("queryStringParameters"))
+    except GeneralException as err:
+        logger.error(err)
+        return {
+            "statusCode": HTTPStatus.BAD_REQUEST.value,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
+    try:
+        result = get_med_history(connection, patient_id, rxcui_id, params)
+    except MedCatalogError as err:
+        logger.exception(err)
+        return {
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR.value,
+            "body": json.dumps({"message": str(err)}),
+            "headers": get_headers(),
+        }
     return {
         "statusCode": 200,
-        "body": json.dumps(get_med_history(connection, patient_id, rxcui_id)),
+        "body": json.dumps(result),
         "headers": get_headers(),
     }
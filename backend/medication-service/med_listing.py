@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+
+from custom_exception import GeneralException
+from med_utils import normalize_ingredient_name
+from shared import read_as_dict
+from sqls.medication import (
+    MEDICATION_AFTER,
+    MEDICATION_INGREDIENTS_IN,
+    MEDICATION_NAME_FILTER,
+    MEDICATION_PAGE,
+    MEDICATION_REASON_FILTER,
+    MEDICATION_UPDATED_SINCE,
+    med_base_query,
+)
+
+default_page_size = int(os.getenv("MED_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 500
+# statuses returned by an incremental sync, so clients also see the
+# medications that left the list (modified, stopped, deleted) since then
+SYNC_STATUSES = ("A", "M", "S", "D")
+UPDATED_SINCE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d")
+
+
+def encode_cursor(row):
+    """
+    Returns the opaque cursor of the page following the medication row
+    """
+    value = [row["ModifiedDate"], int(row["RecordId"])]
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (update time, medication id) of the cursor
+    """
+    try:
+        value, medication_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.strptime(value, UPDATED_SINCE_FORMATS[0]), int(medication_id)
+    except (binascii.Error, ValueError, TypeError) as err:
+        raise GeneralException("Invalid cursor") from err
+
+
+def escape_like(value):
+    """
+    Escapes the LIKE wildcards of a user value
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_listing_params(query_params):
+    """
+    Validates the medication list filters.
+    name_filter matches the product name or an ingredient, med_reasons is a
+    comma separated list, updated_since a UTC "YYYY-MM-DD HH:MM:SS" and
+    cursor the next_cursor of the previous page
+    """
+    query_params = query_params or {}
+    updated_since = None
+    if query_params.get("updated_since"):
+        for date_format in UPDATED_SINCE_FORMATS:
+            try:
+                updated_since = datetime.strptime(
+                    query_params["updated_since"], date_format
+                )
+                break
+            except ValueError:
+                continue
+        else:
+            raise GeneralException("Invalid updated_since format")
+    page_size = query_params.get("page_size")
+    page_size = (
+        int(page_size)
+        if page_size and page_size.isdigit() and int(page_size) > 0
+        else default_page_size
+    )
+    return {
+        "name_filter": (query_params.get("name_filter") or "").strip() or None,
+        "med_reasons": [
+            reason.strip()
+            for reason in (query_params.get("med_reasons") or "").split(",")
+            if reason.strip()
+        ],
+        "updated_since": updated_since,
+        "after": decode_cursor(query_params["cursor"])
+        if query_params.get("cursor")
+        else None,
+        "page_size": min(page_size, MAX_PAGE_SIZE),
+    }
+
+
+def get_medication_page(cnx, patient_id, statuses, params, ingredients=None):
+    """
+    Returns (medications, next cursor) of a page of the medications of the
+    patient, filtered in SQL and ordered by update time then id.
+    With updated_since every status is returned so the client can apply
+    the changes to its copy. ingredients limits the page to the medications
+    having one of them
+    """
+    if params["updated_since"]:
+        statuses = SYNC_STATUSES
+    sql_params = {
+        "patient_id": patient_id,
+        "status": tuple(statuses),
+        "page_size": params["page_size"] + 1,
+    }
+    conditions = []
+    if params["name_filter"]:
+        conditions.append(MEDICATION_NAME_FILTER)
+        sql_params["name"] = f"%{escape_like(params['name_filter'])}%"
+        sql_params["ingredient_name"] = (
+            f"%{escape_like(normalize_ingredient_name(params['name_filter']))}%"
+        )
+    if params["med_reasons"]:
+        reason_filters = []
+        for position, reason in enumerate(params["med_reasons"]):
+            reason_filters.append(
+                MEDICATION_REASON_FILTER.format(name=f"reason_{position}")
+            )
+            sql_params[f"reason_{position}"] = f"%{escape_like(reason)}%"
+        conditions.append("AND ( " + " OR ".join(reason_filters) + " )")
+    if ingredients is not None:
+        names = {normalize_ingredient_name(ingredient) for ingredient in ingredients}
+        names.discard("")
+        if not names:
+            return [], None
+        conditions.append(MEDICATION_INGREDIENTS_IN)
+        sql_params["ingredients"] = tuple(sorted(names))
+    if params["updated_since"]:
+        conditions.append(MEDICATION_UPDATED_SINCE)
+        sql_params["updated_since"] = params["updated_since"]
+    if params["after"]:
+        conditions.append(MEDICATION_AFTER)
+        sql_params["after_time"], sql_params["after_id"] = params["after"]
+    query = med_base_query + MEDICATION_PAGE.format(conditions="\n".join(conditions))
+    medication = read_as_dict(cnx, query, sql_params) or []
+    if len(medication) <= params["page_size"]:
+        return medication, None
+    medication = medication[: params["page_size"]]
+    return medication, encode_cursor(medication[-1])
@@ -5,7 +5,10 @@ from datetime import datetime, timedelta
 from http import HTTPStatus
 import boto3
 import pymysql
+from custom_exception import GeneralException
+from med_utils import get_ingredient_rows, parse_ingredients
 from notification import insert_to_medication_notifications_table
+from notification_sqls import INSERT_MEDICATION_NOTIFICATION
 from shared import (
     encrypt,
     find_user_by_external_id,
@@ -14,12 +17,14 @@ from shared import (
     get_headers,
     get_phi_data_from_internal_id,
     read_as_dict,
+    transaction,
 )
 from sqls.medication import (
     GET_MEDICATION,
     GET_MEDICATION_BY_ID,
     GET_NETWORK_PROVIDERS,
     INSERT_MEDICATION,
+    INSERT_MEDICATION_INGREDIENTS,
     UPDATE_MEDICATION,
 )
 
@@ -28,33 +33,17 @@ logger.setLevel(logging.INFO)
 connection = get_db_connect()
 dynamodb = boto3.resource("dynamodb")
 
+MAX_BULK_CHANGES = 50
 
-def save_medication(cnx, patient_id, med_data, logged_in_user_id):
+
+def get_medication_insert_params(patient_id, med_data, created_time):
     """
-    Insert the medication to database
+    Returns the INSERT_MEDICATION params of the medication data of a request
     """
-    created_time = datetime.utcnow()
-    if med_data.get("RecordId"):
-        params = {
-            "modified_by": logged_in_user_id,
-            "upd_date": created_time,
-            "status": "M",
-            "ids": tuple([med_data["RecordId"]]),
-            "discontinue_reason": None,
-        }
-        with cnx.cursor() as cursor:
-            cursor.execute(UPDATE_MEDICATION, params)
-            cnx.commit()
-            medication_row = get_medication_row(cnx, med_data.get("RecordId"))
-            type = "modified"
-            insert_medication_notification_for_network_providers(
-                cnx, type, medication_row
-            )
-
     med_reasons = ""
     if med_data.get("MedReasons"):
         med_reasons = ",".join(med_data["MedReasons"])
-    params = {
+    return {
         "patient_id": patient_id,
         "product_id": med_data["ProductId"],
         "product_short_name": med_data["ProductShortName"].replace("\\", ""),
@@ -75,10 +64,41 @@ def save_medication(cnx, patient_id, med_data, logged_in_user_id):
         "sig_extra_note": med_data["SigExtraNote"],
         "medication_reasons": med_reasons,
     }
+
+
+def save_medication(cnx, patient_id, med_data, logged_in_user_id):
+    """
+    Insert the medication to database
+    """
+    created_time = datetime.utcnow()
+    if med_data.get("RecordId"):
+        params = {
+            "modified_by": logged_in_user_id,
+            "upd_date": created_time,
+            "status": "M",
+            "ids": tuple([med_data["RecordId"]]),
+            "discontinue_reason": None,
+        }
+        with cnx.cursor() as cursor:
+            cursor.execute(UPDATE_MEDICATION, params)
+            cnx.commit()
+            medication_row = get_medication_row(cnx, med_data.get("RecordId"))
+            type = "modified"
+            insert_medication_notification_for_network_providers(
+                cnx, type, medication_row
+            )
+
+    params = get_medication_insert_params(patient_id, med_data, created_time)
+    med_reasons = params["medication_reasons"]
     try:
         with cnx.cursor() as cursor:
             cursor.execute(INSERT_MEDICATION, params)
             medication_row_id = cursor.lastrowid
+            ingredient_rows = get_ingredient_rows(
+                medication_row_id, patient_id, parse_ingredients(med_data["Ingredient"])
+            )
+            if ingredient_rows:
+                cursor.executemany(INSERT_MEDICATION_INGREDIENTS, ingredient_rows)
             cnx.commit()
             medication_row = {
                 "id": medication_row_id,
@@ -182,6 +202,183 @@ def update_medication(
         return 500, err
 
 
+def get_cursor_medication_row(cursor, medication_id):
+    """
+    Returns the medication row read in the transaction of the cursor
+    """
+    cursor.execute(GET_MEDICATION_BY_ID, {"id": medication_id})
+    return cursor.fetchone()
+
+
+def apply_medication_change(cursor, patient_id, change, user_id, now):
+    """
+    Applies one change of a bulk request on the cursor, without committing.
+    Returns the (type, medication row) of the notifications it needs.
+    Raises GeneralException if the change can't be applied
+    """
+    action = change.get("Action")
+    if action == "save":
+        med_data = change["Medication"]
+        changes = []
+        if med_data.get("RecordId"):
+            previous = get_cursor_medication_row(cursor, med_data["RecordId"])
+            if not previous or str(previous["patient_internal_id"]) != str(patient_id):
+                raise GeneralException(f"Medication {med_data['RecordId']} not found")
+            params = {
+                "modified_by": user_id,
+                "upd_date": now,
+                "status": "M",
+                "ids": tuple([med_data["RecordId"]]),
+                "discontinue_reason": None,
+            }
+            cursor.execute(UPDATE_MEDICATION, params)
+            changes.append(
+                ("modified", get_cursor_medication_row(cursor, med_data["RecordId"]))
+            )
+        cursor.execute(
+            INSERT_MEDICATION, get_medication_insert_params(patient_id, med_data, now)
+        )
+        medication_id = cursor.lastrowid
+        ingredient_rows = get_ingredient_rows(
+            medication_id, patient_id, parse_ingredients(med_data["Ingredient"])
+        )
+        if ingredient_rows:
+            cursor.executemany(INSERT_MEDICATION_INGREDIENTS, ingredient_rows)
+        changes.append(("added", get_cursor_medication_row(cursor, medication_id)))
+        return changes
+    if action == "stop":
+        cursor.execute(
+            GET_MEDICATION,
+            {"product_id": change.get("ProductId"), "patient_id": patient_id},
+        )
+        rec_ids = [med["id"] for med in cursor.fetchall()]
+        if not rec_ids:
+            raise GeneralException(f"Medication {change.get('ProductId')} not active")
+        reasons = change.get("DiscontinueReason")
+        params = {
+            "modified_by": user_id,
+            "upd_date": now,
+            "status": "S",
+            "ids": tuple(rec_ids),
+            "discontinue_reason": json.dumps(reasons) if reasons else None,
+        }
+        cursor.execute(UPDATE_MEDICATION, params)
+        return [("discontinued", get_cursor_medication_row(cursor, rec_ids[0]))]
+    if action == "delete":
+        rec = get_cursor_medication_row(cursor, change.get("RecordId"))
+        if not rec or str(rec["patient_internal_id"]) != str(patient_id):
+            raise GeneralException(f"Medication {change.get('RecordId')} not found")
+        if not now - timedelta(hours=24) <= rec["create_time"] <= now:
+            raise GeneralException("Medication can't be deleted")
+        params = {
+            "modified_by": user_id,
+            "upd_date": now,
+            "discontinue_reason": None,
+            "status": "D",
+            "ids": tuple([rec["id"]]),
+        }
+        cursor.execute(UPDATE_MEDICATION, params)
+        return [("deleted", get_cursor_medication_row(cursor, rec["id"]))]
+    raise GeneralException(f"Invalid action {action}")
+
+
+def get_bulk_notification_details(
+    changes, patient_name, by_patient, user_name=None, user_name_degree=None
+):
+    """
+    Generates the notification_details summarizing every change of a bulk request
+    """
+    if by_patient:
+        author = patient_name
+    elif user_name_degree:
+        author = f"{user_name},{user_name_degree}"
+    else:
+        author = user_name
+    summary = []
+    for type, row in changes:
+        medicine_name = row["product_short_name"].replace("\\", "")
+        summary.append(
+            f"{type} {medicine_name}({row['quantity']}{row['unit_code']},{row['sig']})"
+        )
+    summary = "; ".join(summary)
+    return f"Medications have been updated for {patient_name} by {author} :{summary}"
+
+
+def get_network_user_ids(cnx, patient_id):
+    """
+    Returns the internal ids of the providers and caregivers of the patient network
+    """
+    network_providers = read_as_dict(
+        cnx, GET_NETWORK_PROVIDERS, {"patient_internal_id": patient_id}
+    )
+    return [
+        user["provider_internal_id"] or user["caregiver_internal_id"]
+        for user in network_providers or []
+        if user["provider_internal_id"] or user["caregiver_internal_id"]
+    ]
+
+
+def save_medication_changes(cnx, patient_id, changes, user_id):
+    """
+    Applies a list of medication changes (save / stop / delete) in one
+    transaction, with one notification per network user summarizing them all.
+    The network and the names are resolved once, before the transaction,
+    a change that fails rolls back the whole request
+    """
+    if not isinstance(changes, list) or not changes:
+        raise GeneralException("Changes must be a non empty list")
+    if len(changes) > MAX_BULK_CHANGES:
+        raise GeneralException(f"At most {MAX_BULK_CHANGES} changes per request")
+    network_user_ids = get_network_user_ids(cnx, patient_id)
+    patient_phi_data = get_phi_data_from_internal_id(cnx, dynamodb, patient_id)
+    patient_name = (
+        f"{patient_phi_data['first_name']} {patient_phi_data['last_name']}"
+        if patient_phi_data
+        else ""
+    )
+    by_patient = str(user_id) == str(patient_id)
+    user_name, user_name_degree = (
+        (None, None) if by_patient else get_user_name_and_degree(user_id)
+    )
+
+    now = datetime.utcnow()
+    applied = []
+    with transaction(cnx, pymysql.cursors.DictCursor) as cursor:
+        for change in changes:
+            applied.extend(
+                apply_medication_change(cursor, patient_id, change, user_id, now)
+            )
+        notification_details = get_bulk_notification_details(
+            applied, patient_name, by_patient, user_name, user_name_degree
+        )
+        cursor.executemany(
+            INSERT_MEDICATION_NOTIFICATION,
+            [
+                {
+                    "patient_internal_id": patient_id,
+                    "medication_row_id": applied[0][1]["id"],
+                    "notifier_internal_id": network_user_id,
+                    "level": 1,
+                    "notification_details": encrypt(notification_details),
+                    "created_on": now,
+                    "created_by": user_id,
+                    "updated_on": now,
+                    "updated_by": user_id,
+                    "notification_status": 1,
+                }
+                for network_user_id in network_user_ids
+            ],
+        )
+    return [
+        {
+            "Action": type,
+            "RecordId": str(row["id"]),
+            "ProductId": str(row["product_id"]),
+        }
+        for type, row in applied
+    ]
+
+
 def lambda_handler(event, context):
     """
     Save Medication Handler
@@ -214,6 +411,22 @@ def lambda_handler(event, context):
                 "S",
                 discontinue_reasons,
             )
+        elif "bulk" in event["path"].split("/"):
+            try:
+                result = save_medication_changes(
+                    connection,
+                    patient_id,
+                    json.loads(event["body"]).get("Changes"),
+                    user["internal_id"],
+                )
+                status_code = HTTPStatus.OK
+            except (GeneralException, KeyError, ValueError) as err:
+                logger.error(err)
+                result = {"message": str(err)}
+            except pymysql.MySQLError as err:
+                logger.exception(err)
+                status_code = HTTPStatus.INTERNAL_SERVER_ERROR
+                result = {"message": str(err)}
         elif "delete" in event["path"].split("/"):
             med_id = event["pathParameters"].get("med_id")
             status_code, result = delete_medication(
@@ -1,27 +1,18 @@
-import os
+import ast
+import json
 
-import requests
-from dotenv import load_dotenv
+from med_catalog import catalog
 from shared import read_as_dict, read_query
-
-load_dotenv()
-
-
-clinical_table_url = os.getenv("CLINICALTABLES_URL")
-rxcui_url = os.getenv("RXCUIS_URL")
+from sqls.medication import GET_ACTIVE_INGREDIENTS
 
 
 def get_product_name_on_rxcui(rxcui):
     """
     Get the product names on rxcuis
     Request params: rxcui id
+    Raises MedCatalogError if RxNav can't be reached
     """
-    url = rxcui_url.format(rxcui=str(rxcui))
-    try:
-        response = requests.get(url, timeout=5)
-    except requests.exceptions.RequestException as e:
-        raise SystemExit(e)
-    return response.json()
+    return catalog.get_rxcui_history(rxcui)
 
 
 def get_product_by_names(name, max_results):
@@ -29,28 +20,60 @@ def get_product_by_names(name, max_results):
     This lambda fetches the medications from third party url based on the names.
     Request params: names, max_count
     Response : Medication names, ruxcii, strength_and_form
+    Raises MedCatalogError if ClinicalTables can't be reached
+    """
+    return catalog.search_products(name, max_results)
+
+
+def parse_ingredients(value):
+    """
+    Returns the ingredient list of a medication, stored in the ingredient
+    column as the str() of the list of {"Identifier": ..., "Name": ...}
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = ast.literal_eval(value)
+    return value
+
+
+def normalize_ingredient_name(name):
+    """
+    Returns the ingredient name as stored in medication_ingredients
+    """
+    return " ".join(str(name or "").lower().split())[:255]
+
+
+def get_ingredient_rows(medication_id, patient_id, ingredient_list):
+    """
+    Returns the medication_ingredients rows of a medication
     """
-    url = clinical_table_url
-    url = url + name + "&maxList=" + str(max_results)
-    try:
-        response = requests.get(url, timeout=5)
-    except requests.exceptions.RequestException as e:
-        raise SystemExit(e)
-    return response.json()
+    rows = {}
+    for ingredient in ingredient_list:
+        name = normalize_ingredient_name(ingredient.get("Name"))
+        if name and name not in rows:
+            rows[name] = {
+                "medication_id": medication_id,
+                "patient_internal_id": patient_id,
+                "ingredient_name": name,
+                "ingredient_rxcui": ingredient.get("Identifier"),
+            }
+    return list(rows.values())
 
 
-def get_ingredients_by_internal_id(cnx, patient_id, ingredient_name):
+def get_ingredient_index(cnx, patient_id):
     """
-    Returns list of medications having same ingredient for a given internal ID.
+    Returns the active medications of the patient by ingredient,
+    normalized ingredient name -> list of medication rows, in one query
     """
-    condition = "%" + ingredient_name + "%"
-    query = """ SELECT product_id, product_short_name
-                FROM medication
-                WHERE patient_internal_id = %s
-                AND medication.`status` = 'A'
-                AND Lower(medication.ingredient) like %s"""
-    result = read_as_dict(cnx, query, (patient_id, condition))
-    return result if result else []
+    index = {}
+    rows = read_as_dict(cnx, GET_ACTIVE_INGREDIENTS, {"patient_id": patient_id})
+    for row in rows or []:
+        index.setdefault(row["ingredient_name"], []).append(row)
+    return index
 
 
 def get_external_id_form_internal_id(cnx, internal_ids):
@@ -72,14 +95,18 @@ def get_external_id_form_internal_id(cnx, internal_ids):
     return mapping_dict
 
 
-def med_dup_check(cnx, patient_id, ingredient_list, is_check):
+def find_duplicates(ingredient_index, ingredient_list, is_check):
     """
-    Returns the list of duplication list for a given medication
+    Returns the active medications sharing an ingredient of ingredient_list,
+    looked up in the index of get_ingredient_index.
+    If is_check is False, an ingredient is only reported if more than one
+    medication has it (the medication itself is in the index)
     """
     dup_list = []
 
     for ingredient in ingredient_list:
-        dup_med = get_ingredients_by_internal_id(cnx, patient_id, ingredient["Name"])
+        name = normalize_ingredient_name(ingredient.get("Name"))
+        dup_med = ingredient_index.get(name, []) if name else []
         if is_check:
             dup_list.extend(
                 [
@@ -102,3 +129,12 @@ def med_dup_check(cnx, patient_id, ingredient_list, is_check):
                     ]
                 )
     return dup_list
+
+
+def med_dup_check(cnx, patient_id, ingredient_list, is_check):
+    """
+    Returns the list of duplication list for a given medication
+    """
+    return find_duplicates(
+        get_ingredient_index(cnx, patient_id), ingredient_list, is_check
+    )
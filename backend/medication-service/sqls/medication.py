@@ -115,3 +115,56 @@ VALUES     (%(patient_id)s,
             %(sig_extra_note)s,
             %(medication_reasons)s); 
 """
+
+INSERT_MEDICATION_INGREDIENTS = """
+INSERT IGNORE INTO medication_ingredients
+            (medication_id,
+             patient_internal_id,
+             ingredient_name,
+             ingredient_rxcui)
+VALUES     (%(medication_id)s,
+            %(patient_internal_id)s,
+            %(ingredient_name)s,
+            %(ingredient_rxcui)s)
+"""
+
+GET_ACTIVE_INGREDIENTS = """
+SELECT
+    medication_ingredients.ingredient_name,
+    medication.id,
+    medication.product_id,
+    medication.product_short_name
+FROM
+    medication_ingredients
+    JOIN medication
+        ON medication.id = medication_ingredients.medication_id
+WHERE
+    medication_ingredients.patient_internal_id = %(patient_id)s
+        AND medication.`status` = 'A'
+ORDER BY medication.id
+"""
+
+MEDICATION_PAGE = """
+        {conditions}
+ORDER BY medication.update_time, medication.id
+LIMIT %(page_size)s
+"""
+
+MEDICATION_NAME_FILTER = """AND ( medication.product_short_name LIKE %(name)s
+      OR EXISTS (SELECT 1
+                 FROM   medication_ingredients
+                 WHERE  medication_ingredients.medication_id = medication.id
+                        AND medication_ingredients.ingredient_name LIKE %(ingredient_name)s) )"""
+
+MEDICATION_REASON_FILTER = "medication.medication_reasons LIKE %({name})s"
+
+MEDICATION_INGREDIENTS_IN = """AND EXISTS (SELECT 1
+            FROM   medication_ingredients
+            WHERE  medication_ingredients.medication_id = medication.id
+                   AND medication_ingredients.ingredient_name IN %(ingredients)s)"""
+
+MEDICATION_UPDATED_SINCE = "AND medication.update_time >= %(updated_since)s"
+
+MEDICATION_AFTER = """AND ( medication.update_time > %(after_time)s
+      OR ( medication.update_time = %(after_time)s
+           AND medication.id > %(after_id)s ) )"""
@@ -3,6 +3,7 @@ import logging
 from datetime import datetime
 
 import pymysql
+from call_records import update_call
 from shared import get_db_connect
 from sqls.chime import UPDATE_ATTENDEE_JOINED
 
@@ -24,10 +25,8 @@ def update_attendee_joined(cnx, meeting_id, participant, start_time):
             "participant": participant,
             "start_time": start_time,
         }
-        with cnx.cursor() as cursor:
-            cursor.execute(UPDATE_ATTENDEE_JOINED, params)
-            cnx.commit()
-            return f"{participant} joined Meeting"
+        update_call(cnx, UPDATE_ATTENDEE_JOINED, params, meeting_id=meeting_id)
+        return f"{participant} joined Meeting"
     except pymysql.MySQLError as err:
         logger.exception(err)
         return 500, str(err)
@@ -8,6 +8,7 @@ from datetime import datetime
 import boto3
 import pymysql
 from botocore.exceptions import ClientError
+from call_records import update_call
 from shared import (
     check_user_access_for_patient_data,
     find_user_by_external_id,
@@ -235,9 +236,9 @@ def update_join_meeting(cnx, meeting_data, attendee):
         "meeting_id": meeting_data["meeting_id"],
     }
     try:
-        with cnx.cursor() as cursor:
-            cursor.execute(UPDATE_JOIN_MEETING, params)
-            cnx.commit()
+        update_call(
+            cnx, UPDATE_JOIN_MEETING, params, meeting_id=meeting_data["meeting_id"]
+        )
         return True
     except pymysql.MySQLError as err:
         logger.error(err)
@@ -261,9 +262,7 @@ def update_end_meeting_status(cnx, meeting_id):
         "meeting_id": meeting_id,
     }
     try:
-        with cnx.cursor() as cursor:
-            cursor.execute(UPDATE_END_MEETING, params)
-            cnx.commit()
+        update_call(cnx, UPDATE_END_MEETING, params, meeting_id=meeting_id)
         return True
     except pymysql.MySQLError as err:
         logger.error(err)
@@ -0,0 +1,70 @@
+"""
+Backfills device_reading_raw with the compressed raw payloads of the
+existing device readings, in id ranges so the hot table is never locked
+for long. Safe to re-run, rows already copied are skipped.
+
+Run after creating device_reading_raw and before dropping device_reading.raw:
+    python archive_device_reading_raw.py [--batch-size 5000]
+"""
+import argparse
+import logging
+
+from dotenv import load_dotenv
+from shared import get_db_connect, read_as_dict
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s:%(message)s"
+)
+logger = logging.getLogger(__name__)
+
+connection = get_db_connect()
+
+GET_DEVICE_READING_ID_RANGE = """
+SELECT MIN(id) AS min_id,
+       MAX(id) AS max_id
+FROM   device_reading
+"""
+
+COPY_DEVICE_READING_RAW = """
+INSERT IGNORE INTO device_reading_raw (reading_id, raw, s3_key, created_on)
+SELECT id,
+       COMPRESS(raw),
+       NULL,
+       UTC_TIMESTAMP()
+FROM   device_reading
+WHERE  id >= %(start_id)s
+       AND id < %(end_id)s
+       AND raw IS NOT NULL
+"""
+
+
+def archive_raw_payloads(cnx, batch_size):
+    """
+    Copies the raw payloads batch_size reading ids at a time,
+    committing after every batch
+    """
+    id_range = read_as_dict(cnx, GET_DEVICE_READING_ID_RANGE, fetchone=True)
+    if not id_range or id_range["min_id"] is None:
+        logger.info("No device readings to archive")
+        return 0
+    copied = 0
+    for start_id in range(id_range["min_id"], id_range["max_id"] + 1, batch_size):
+        with cnx.cursor() as cursor:
+            cursor.execute(
+                COPY_DEVICE_READING_RAW,
+                {"start_id": start_id, "end_id": start_id + batch_size},
+            )
+            copied += cursor.rowcount
+        cnx.commit()
+        logger.info("Archived readings up to id %s", start_id + batch_size - 1)
+    logger.info("Archived %s raw payloads", copied)
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    archive_raw_payloads(connection, args.batch_size)
@@ -0,0 +1,74 @@
+"""
+Builds the local medication search index of the FindMed lambda from the
+monthly RxTerms extract of RxNorm (RxTerms<yyyymm>.txt, pipe delimited),
+the data the ClinicalTables rxterms API serves.
+
+Products are grouped by DISPLAY_NAME with the strengths/forms and rxcuis
+of their non retired, non suppressed rows, like the remote search returns them.
+
+Run with medication-service on the PYTHONPATH:
+    python build_med_catalog_index.py RxTerms202610.txt med_catalog.idx [--upload]
+
+Ship the index in a layer under /opt/med_catalog/med_catalog.idx or upload it
+to MED_CATALOG_INDEX_BUCKET with --upload, the lambda copies it to /tmp.
+"""
+import argparse
+import csv
+import logging
+from collections import OrderedDict
+
+import boto3
+from dotenv import load_dotenv
+from med_catalog_index import catalog_index_bucket, catalog_index_key, write_index
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s:%(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def read_rxterms(path):
+    """
+    Returns the products of the RxTerms file, grouped by display name
+    """
+    products = OrderedDict()
+    skipped = 0
+    with open(path, newline="", encoding="utf-8") as rxterms_file:
+        for row in csv.DictReader(rxterms_file, delimiter="|"):
+            if row.get("IS_RETIRED") or row.get("SUPPRESS_FOR"):
+                skipped += 1
+                continue
+            name = row["DISPLAY_NAME"].strip()
+            if not name:
+                skipped += 1
+                continue
+            product = products.setdefault(
+                name, {"productName": name, "strengthsAndForms": [], "rxcuis": []}
+            )
+            product["strengthsAndForms"].append(
+                " ".join(filter(None, [row["STRENGTH"], row["NEW_DOSE_FORM"]]))
+            )
+            product["rxcuis"].append(row["RXCUI"])
+    logger.info("Read %s products, skipped %s rows", len(products), skipped)
+    return list(products.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rxterms")
+    parser.add_argument("index")
+    parser.add_argument("--upload", action="store_true")
+    args = parser.parse_args()
+
+    product_count, key_count = write_index(read_rxterms(args.rxterms), args.index)
+    logger.info("Wrote %s products, %s keys", product_count, key_count)
+    if args.upload:
+        s3_client = boto3.client("s3")
+        s3_client.upload_file(args.index, catalog_index_bucket, catalog_index_key)
+        logger.info("Uploaded to s3://%s/%s", catalog_index_bucket, catalog_index_key)
+
+
+if __name__ == "__main__":
+    main()
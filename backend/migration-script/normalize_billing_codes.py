@@ -0,0 +1,92 @@
+"""
+Rewrites the billing_charge_code / billing_diagnose_code columns of
+billing_detail as validated JSON before they are converted to JSON columns.
+Rows stored as python literals are converted, rows that cannot be parsed
+are logged with their value and set to NULL. Safe to re-run.
+
+Run before the billing_detail JSON column migration:
+    python normalize_billing_codes.py [--batch-size 1000]
+"""
+import argparse
+import logging
+
+from billing_records import dump_billing_codes
+from custom_exception import GeneralException
+from dotenv import load_dotenv
+from shared import get_db_connect, read_as_dict
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s:%(message)s"
+)
+logger = logging.getLogger(__name__)
+
+connection = get_db_connect()
+
+GET_BILLING_CODES_PAGE = """
+SELECT id,
+       billing_charge_code,
+       billing_diagnose_code
+FROM   billing_detail
+WHERE  id > %(last_id)s
+ORDER  BY id
+LIMIT  %(batch_size)s
+"""
+
+UPDATE_BILLING_CODES = """
+UPDATE billing_detail
+SET    billing_charge_code = %(billing_charge_code)s,
+       billing_diagnose_code = %(billing_diagnose_code)s
+WHERE  id = %(id)s
+"""
+
+BILLING_CODE_COLUMNS = ("billing_charge_code", "billing_diagnose_code")
+
+
+def normalize_value(billing_id, column, value):
+    """
+    Returns the canonical JSON of the stored value, None if it is unreadable
+    """
+    try:
+        return dump_billing_codes(value)
+    except GeneralException as err:
+        logger.error("billing %s %s %r: %s", billing_id, column, value, err)
+        return None
+
+
+def normalize_billing_codes(cnx, batch_size):
+    """
+    Walks billing_detail by id and updates the rows
+    whose codes are not stored as canonical JSON
+    """
+    last_id, updated = 0, 0
+    while True:
+        rows = read_as_dict(
+            cnx, GET_BILLING_CODES_PAGE, {"last_id": last_id, "batch_size": batch_size}
+        )
+        if not rows:
+            break
+        changed = []
+        for row in rows:
+            normalized = {
+                column: normalize_value(row["id"], column, row[column])
+                for column in BILLING_CODE_COLUMNS
+            }
+            if any(normalized[col] != row[col] for col in BILLING_CODE_COLUMNS):
+                changed.append({"id": row["id"], **normalized})
+        if changed:
+            with cnx.cursor() as cursor:
+                cursor.executemany(UPDATE_BILLING_CODES, changed)
+            cnx.commit()
+        updated += len(changed)
+        last_id = rows[-1]["id"]
+        logger.info("Normalized billing up to id %s, %s rows updated", last_id, updated)
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    normalize_billing_codes(connection, args.batch_size)
@@ -0,0 +1,87 @@
+"""
+Rewrites the notes column of call_logs as validated JSON before it is
+converted to a JSON column. Rows stored as python literals are converted,
+rows that cannot be parsed are logged with their value and set to NULL.
+Safe to re-run.
+
+Run before the call_logs JSON column migration:
+    python normalize_call_notes.py [--batch-size 1000]
+"""
+import argparse
+import logging
+
+from call_records import dump_call_notes
+from custom_exception import GeneralException
+from dotenv import load_dotenv
+from shared import get_db_connect, read_as_dict
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s:%(message)s"
+)
+logger = logging.getLogger(__name__)
+
+connection = get_db_connect()
+
+GET_CALL_NOTES_PAGE = """
+SELECT id,
+       notes
+FROM   call_logs
+WHERE  id > %(last_id)s
+ORDER  BY id
+LIMIT  %(batch_size)s
+"""
+
+UPDATE_CALL_NOTES = """
+UPDATE call_logs
+SET    notes = %(notes)s
+WHERE  id = %(id)s
+"""
+
+
+def normalize_value(call_id, value):
+    """
+    Returns the canonical JSON of the stored notes, None if they are unreadable
+    """
+    if value is None:
+        return None
+    try:
+        return dump_call_notes(value)
+    except GeneralException as err:
+        logger.error("call %s notes %r: %s", call_id, value, err)
+        return None
+
+
+def normalize_call_notes(cnx, batch_size):
+    """
+    Walks call_logs by id and updates the rows
+    whose notes are not stored as canonical JSON
+    """
+    last_id, updated = 0, 0
+    while True:
+        rows = read_as_dict(
+            cnx, GET_CALL_NOTES_PAGE, {"last_id": last_id, "batch_size": batch_size}
+        )
+        if not rows:
+            break
+        changed = []
+        for row in rows:
+            notes = normalize_value(row["id"], row["notes"])
+            if notes != row["notes"]:
+                changed.append({"id": row["id"], "notes": notes})
+        if changed:
+            with cnx.cursor() as cursor:
+                cursor.executemany(UPDATE_CALL_NOTES, changed)
+            cnx.commit()
+        updated += len(changed)
+        last_id = rows[-1]["id"]
+        logger.info("Normalized call notes up to id %s, %s rows updated", last_id, updated)
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    normalize_call_notes(connection, args.batch_size)
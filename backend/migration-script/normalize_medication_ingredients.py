@@ -0,0 +1,87 @@
+"""
+Fills medication_ingredients, the normalized ingredients used by the
+medication duplicate check, from the ingredient column of the medications
+saved before the table existed. Rows whose ingredient cannot be parsed are
+logged with their value and skipped. Safe to re-run.
+
+Run after the medication_ingredients migration, with medication-service
+on the PYTHONPATH:
+    python normalize_medication_ingredients.py [--batch-size 1000]
+"""
+import argparse
+import logging
+
+from dotenv import load_dotenv
+from med_utils import get_ingredient_rows, parse_ingredients
+from shared import get_db_connect, read_as_dict
+from sqls.medication import INSERT_MEDICATION_INGREDIENTS
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s:%(message)s"
+)
+logger = logging.getLogger(__name__)
+
+connection = get_db_connect()
+
+GET_MEDICATION_INGREDIENTS_PAGE = """
+SELECT id,
+       patient_internal_id,
+       ingredient
+FROM   medication
+WHERE  id > %(last_id)s
+ORDER  BY id
+LIMIT  %(batch_size)s
+"""
+
+
+def get_rows(medication):
+    """
+    Returns the medication_ingredients rows of a medication,
+    none if its ingredient is unreadable
+    """
+    try:
+        ingredients = parse_ingredients(medication["ingredient"])
+        return get_ingredient_rows(
+            medication["id"], medication["patient_internal_id"], ingredients
+        )
+    except (ValueError, SyntaxError, TypeError, AttributeError) as err:
+        logger.error(
+            "medication %s ingredient %r: %s",
+            medication["id"],
+            medication["ingredient"],
+            err,
+        )
+        return []
+
+
+def normalize_medication_ingredients(cnx, batch_size):
+    """
+    Walks medication by id and inserts the ingredients of every row
+    """
+    last_id, inserted = 0, 0
+    while True:
+        rows = read_as_dict(
+            cnx,
+            GET_MEDICATION_INGREDIENTS_PAGE,
+            {"last_id": last_id, "batch_size": batch_size},
+        )
+        if not rows:
+            break
+        ingredient_rows = [row for medication in rows for row in get_rows(medication)]
+        if ingredient_rows:
+            with cnx.cursor() as cursor:
+                cursor.executemany(INSERT_MEDICATION_INGREDIENTS, ingredient_rows)
+                inserted += cursor.rowcount
+            cnx.commit()
+        last_id = rows[-1]["id"]
+        logger.info("Normalized medications up to id %s, %s inserted", last_id, inserted)
+    return inserted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    normalize_medication_ingredients(connection, args.batch_size)
@@ -0,0 +1,304 @@
+-- patient guidelines batch job
+
+CREATE TABLE `carex`.`job_watermarks` (
+  `job_name` VARCHAR(64) NOT NULL,
+  `watermark` BIGINT NOT NULL DEFAULT 0,
+  `updated_on` DATETIME NOT NULL,
+  PRIMARY KEY (`job_name`));
+
+CREATE INDEX `idx_mi_guidelines_patient_recent` ON `carex`.`mi_guidelines` (`patient_id`, `most_recent_flag`);
+
+-- lab data time series
+
+CREATE INDEX `idx_lab_data_patient_name_date` ON `carex`.`lab_data` (`patient_id`, `name`, `date_tested`, `value`);
+
+-- chart availability (mlprep database)
+-- analytics_<symptom_type> views are probed by internal_id
+
+CREATE INDEX `idx_survey_appetite_patient_internal_id` ON `survey_appetite` (`patient_internal_id`);
+CREATE INDEX `idx_survey_breath_patient_internal_id` ON `survey_breath` (`patient_internal_id`);
+CREATE INDEX `idx_survey_chestpain_patient_internal_id` ON `survey_chestpain` (`patient_internal_id`);
+CREATE INDEX `idx_survey_dialysis_patient_internal_id` ON `survey_dialysis` (`patient_internal_id`);
+CREATE INDEX `idx_survey_falls_patient_internal_id` ON `survey_falls` (`patient_internal_id`);
+CREATE INDEX `idx_survey_fatigue_patient_internal_id` ON `survey_fatigue` (`patient_internal_id`);
+CREATE INDEX `idx_survey_fever_patient_internal_id` ON `survey_fever` (`patient_internal_id`);
+CREATE INDEX `idx_survey_lightheadedness_patient_internal_id` ON `survey_lightheadedness` (`patient_internal_id`);
+CREATE INDEX `idx_survey_mood_patient_internal_id` ON `survey_mood` (`patient_internal_id`);
+CREATE INDEX `idx_survey_nausea_patient_internal_id` ON `survey_nausea` (`patient_internal_id`);
+CREATE INDEX `idx_survey_pain_patient_internal_id` ON `survey_pain` (`patient_internal_id`);
+CREATE INDEX `idx_survey_swelling_patient_internal_id` ON `survey_swelling` (`patient_internal_id`);
+CREATE INDEX `idx_survey_ulcers_patient_internal_id` ON `survey_ulcers` (`patient_internal_id`);
+CREATE INDEX `idx_survey_urinary_patient_internal_id` ON `survey_urinary` (`patient_internal_id`);
+CREATE INDEX `idx_survey_vital_patient_internal_id` ON `survey_vital` (`patient_internal_id`);
+CREATE INDEX `idx_survey_weightchange_patient_internal_id` ON `survey_weightchange` (`patient_internal_id`);
+
+-- daily device reading rollup
+-- Invoke the DeviceReadingRollup lambda with {"start_date": "<first reading date>"} after creating the table
+
+CREATE TABLE `carex`.`device_reading_daily` (
+  `patient_internal_id` INT NOT NULL,
+  `imei` VARCHAR(45) NOT NULL,
+  `reading_date` DATE NOT NULL,
+  `reading_count` INT NOT NULL DEFAULT 0,
+  `min_systolic` INT NULL,
+  `max_systolic` INT NULL,
+  `min_diastolic` INT NULL,
+  `max_diastolic` INT NULL,
+  `min_pulse` INT NULL,
+  `max_pulse` INT NULL,
+  `updated_on` DATETIME NOT NULL,
+  PRIMARY KEY (`patient_internal_id`, `imei`, `reading_date`),
+  INDEX `idx_device_reading_daily_patient_date` (`patient_internal_id`, `reading_date`));
+
+CREATE INDEX `idx_device_reading_timestamp` ON `carex`.`device_reading` (`timestamp`);
+
+-- rpm billing eligibility snapshots
+
+CREATE TABLE `carex`.`rpm_eligibility_snapshots` (
+  `org_id` INT NOT NULL,
+  `period_start` DATE NOT NULL,
+  `patient_internal_id` INT NOT NULL,
+  `provider_internal_id` INT NOT NULL,
+  `days_recorded` INT NOT NULL DEFAULT 0,
+  `interactive_minutes` DECIMAL(8,2) NOT NULL DEFAULT 0,
+  `last_99453_date` DATETIME NULL,
+  `next_window_start` DATETIME NULL,
+  `record` MEDIUMTEXT NOT NULL,
+  `refreshed_on` DATETIME NOT NULL,
+  PRIMARY KEY (`org_id`, `period_start`, `provider_internal_id`, `patient_internal_id`),
+  INDEX `idx_rpm_eligibility_snapshots_patient` (`org_id`, `period_start`, `patient_internal_id`));
+
+-- remote monitoring report exports
+
+CREATE TABLE `carex`.`rm_report_exports` (
+  `export_id` VARCHAR(32) NOT NULL,
+  `org_id` INT NOT NULL,
+  `provider_internal_id` INT NULL,
+  `requested_by` VARCHAR(255) NULL,
+  `export_format` VARCHAR(10) NOT NULL,
+  `start_date` DATETIME NOT NULL,
+  `end_date` DATETIME NOT NULL,
+  `status` VARCHAR(20) NOT NULL,
+  `patients_total` INT NOT NULL DEFAULT 0,
+  `patients_done` INT NOT NULL DEFAULT 0,
+  `rows_written` INT NOT NULL DEFAULT 0,
+  `s3_key` VARCHAR(255) NOT NULL,
+  `error` TEXT NULL,
+  `created_on` DATETIME NOT NULL,
+  `updated_on` DATETIME NOT NULL,
+  PRIMARY KEY (`export_id`),
+  INDEX `idx_rm_report_exports_org` (`org_id`));
+
+-- batched device reading ingestion
+-- readings are unique per device and timestamp, remove the existing duplicates first
+-- and re-run the DeviceReadingRollup backfill afterwards
+
+DELETE duplicate_reading FROM `carex`.`device_reading` duplicate_reading
+JOIN `carex`.`device_reading` first_reading
+  ON first_reading.imei = duplicate_reading.imei
+  AND first_reading.timestamp = duplicate_reading.timestamp
+  AND first_reading.id < duplicate_reading.id;
+
+CREATE UNIQUE INDEX `uq_device_reading_imei_timestamp` ON `carex`.`device_reading` (`imei`, `timestamp`);
+
+-- raw device payloads move out of device_reading into a compressed cold table
+-- run migration-script/archive_device_reading_raw.py between the two steps
+
+CREATE TABLE `carex`.`device_reading_raw` (
+  `reading_id` BIGINT NOT NULL,
+  `raw` BLOB NULL,
+  `s3_key` VARCHAR(255) NULL,
+  `created_on` DATETIME NOT NULL,
+  PRIMARY KEY (`reading_id`))
+  ROW_FORMAT=COMPRESSED;
+
+ALTER TABLE `carex`.`device_reading`
+  MODIFY `systolic` SMALLINT UNSIGNED NULL,
+  MODIFY `diastolic` SMALLINT UNSIGNED NULL,
+  MODIFY `pulse` SMALLINT UNSIGNED NULL,
+  MODIFY `irregular` TINYINT NULL,
+  MODIFY `unit` TINYINT NULL,
+  MODIFY `battery_voltage` SMALLINT UNSIGNED NULL,
+  MODIFY `signalStrength` SMALLINT NULL,
+  DROP COLUMN `raw`;
+
+-- billing charges and diagnoses stored as validated JSON
+-- run migration-script/normalize_billing_codes.py first
+
+ALTER TABLE `carex`.`billing_detail`
+  MODIFY `billing_charge_code` JSON NULL,
+  MODIFY `billing_diagnose_code` JSON NULL;
+
+CREATE INDEX `idx_billing_detail_patient_dos` ON `carex`.`billing_detail` (`patient_internal_id`, `date_of_service`);
+
+-- approved bills are submitted to CDS through an outbox drained by the cds_submission worker
+
+CREATE TABLE `carex`.`cds_submission_outbox` (
+  `billing_id` INT NOT NULL,
+  `status` VARCHAR(16) NOT NULL,
+  `attempts` INT NOT NULL DEFAULT 0,
+  `next_attempt_at` DATETIME NOT NULL,
+  `claimed_by` VARCHAR(32) NULL,
+  `claimed_on` DATETIME NULL,
+  `cds_id` VARCHAR(64) NULL,
+  `last_error` TEXT NULL,
+  `created_on` DATETIME NOT NULL,
+  `updated_on` DATETIME NOT NULL,
+  PRIMARY KEY (`billing_id`),
+  INDEX `idx_cds_submission_outbox_due` (`status`, `next_attempt_at`),
+  INDEX `idx_cds_submission_outbox_claim` (`claimed_by`));
+
+CREATE TABLE `carex`.`cds_submission_dead_letter` (
+  `billing_id` INT NOT NULL,
+  `attempts` INT NOT NULL,
+  `last_error` TEXT NULL,
+  `request` JSON NULL,
+  `failed_on` DATETIME NOT NULL,
+  PRIMARY KEY (`billing_id`));
+
+-- org billing log is filtered by org, status and date of service
+
+CREATE INDEX `idx_billing_detail_org_status_dos` ON `carex`.`billing_detail` (`billing_org_id`, `status`, `date_of_service`);
+
+-- call notes stored as validated JSON
+-- run migration-script/normalize_call_notes.py first
+
+ALTER TABLE `carex`.`call_logs`
+  MODIFY `notes` JSON NULL;
+
+CREATE INDEX `idx_call_logs_patient_start` ON `carex`.`call_logs` (`patient_internal_id`, `start_timestamp`);
+
+-- call durations per patient, provider, org, status and month (CST),
+-- maintained by the call log writers in the transaction changing the call
+
+CREATE TABLE `carex`.`call_log_monthly_totals` (
+  `patient_internal_id` INT NOT NULL,
+  `provider_internal_id` INT NOT NULL,
+  `org_id` INT NOT NULL DEFAULT 0,
+  `status` VARCHAR(32) NOT NULL,
+  `period` DATE NOT NULL,
+  `total_duration` BIGINT NOT NULL DEFAULT 0,
+  `call_count` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`patient_internal_id`, `period`, `provider_internal_id`, `org_id`, `status`));
+
+INSERT INTO `carex`.`call_log_monthly_totals`
+  (patient_internal_id, provider_internal_id, org_id, `status`, period, total_duration, call_count)
+SELECT patient_internal_id,
+       provider_internal_id,
+       COALESCE(org_id, 0),
+       COALESCE(`status`, ''),
+       DATE_FORMAT(CONVERT_TZ(start_timestamp, 'UTC', 'America/Chicago'), '%Y-%m-01'),
+       SUM(duration),
+       COUNT(*)
+FROM   `carex`.`call_logs`
+WHERE  start_timestamp IS NOT NULL
+       AND duration IS NOT NULL
+       AND patient_internal_id IS NOT NULL
+       AND provider_internal_id IS NOT NULL
+GROUP  BY 1, 2, 3, 4, 5;
+
+-- change markers of the reference tables cached by the reference_data layer module,
+-- bumped by triggers so the caches only reload when a table changes
+
+CREATE TABLE `carex`.`reference_data_version` (
+  `name` VARCHAR(64) NOT NULL,
+  `version` BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`name`));
+
+INSERT INTO `carex`.`reference_data_version` (`name`, `version`) VALUES
+  ('code_detail', 0),
+  ('code_category', 0),
+  ('notes', 0),
+  ('provider_degrees', 0),
+  ('med_sig', 0),
+  ('med_reasons', 0),
+  ('med_unit', 0),
+  ('med_info_from', 0),
+  ('med_duration', 0),
+  ('med_discontinue', 0);
+
+CREATE TRIGGER `trg_code_detail_insert_version` AFTER INSERT ON `carex`.`code_detail` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'code_detail';
+CREATE TRIGGER `trg_code_detail_update_version` AFTER UPDATE ON `carex`.`code_detail` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'code_detail';
+CREATE TRIGGER `trg_code_detail_delete_version` AFTER DELETE ON `carex`.`code_detail` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'code_detail';
+
+CREATE TRIGGER `trg_code_category_insert_version` AFTER INSERT ON `carex`.`code_category` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'code_category';
+CREATE TRIGGER `trg_code_category_update_version` AFTER UPDATE ON `carex`.`code_category` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'code_category';
+CREATE TRIGGER `trg_code_category_delete_version` AFTER DELETE ON `carex`.`code_category` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'code_category';
+
+CREATE TRIGGER `trg_notes_insert_version` AFTER INSERT ON `carex`.`notes` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'notes';
+CREATE TRIGGER `trg_notes_update_version` AFTER UPDATE ON `carex`.`notes` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'notes';
+CREATE TRIGGER `trg_notes_delete_version` AFTER DELETE ON `carex`.`notes` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'notes';
+
+CREATE TRIGGER `trg_provider_degrees_insert_version` AFTER INSERT ON `carex`.`provider_degrees` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'provider_degrees';
+CREATE TRIGGER `trg_provider_degrees_update_version` AFTER UPDATE ON `carex`.`provider_degrees` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'provider_degrees';
+CREATE TRIGGER `trg_provider_degrees_delete_version` AFTER DELETE ON `carex`.`provider_degrees` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'provider_degrees';
+
+CREATE TRIGGER `trg_med_sig_insert_version` AFTER INSERT ON `carex`.`med_sig` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_sig';
+CREATE TRIGGER `trg_med_sig_update_version` AFTER UPDATE ON `carex`.`med_sig` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_sig';
+CREATE TRIGGER `trg_med_sig_delete_version` AFTER DELETE ON `carex`.`med_sig` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_sig';
+
+CREATE TRIGGER `trg_med_reasons_insert_version` AFTER INSERT ON `carex`.`med_reasons` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_reasons';
+CREATE TRIGGER `trg_med_reasons_update_version` AFTER UPDATE ON `carex`.`med_reasons` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_reasons';
+CREATE TRIGGER `trg_med_reasons_delete_version` AFTER DELETE ON `carex`.`med_reasons` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_reasons';
+
+CREATE TRIGGER `trg_med_unit_insert_version` AFTER INSERT ON `carex`.`med_unit` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_unit';
+CREATE TRIGGER `trg_med_unit_update_version` AFTER UPDATE ON `carex`.`med_unit` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_unit';
+CREATE TRIGGER `trg_med_unit_delete_version` AFTER DELETE ON `carex`.`med_unit` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_unit';
+
+CREATE TRIGGER `trg_med_info_from_insert_version` AFTER INSERT ON `carex`.`med_info_from` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_info_from';
+CREATE TRIGGER `trg_med_info_from_update_version` AFTER UPDATE ON `carex`.`med_info_from` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_info_from';
+CREATE TRIGGER `trg_med_info_from_delete_version` AFTER DELETE ON `carex`.`med_info_from` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_info_from';
+
+CREATE TRIGGER `trg_med_duration_insert_version` AFTER INSERT ON `carex`.`med_duration` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_duration';
+CREATE TRIGGER `trg_med_duration_update_version` AFTER UPDATE ON `carex`.`med_duration` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_duration';
+CREATE TRIGGER `trg_med_duration_delete_version` AFTER DELETE ON `carex`.`med_duration` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_duration';
+
+CREATE TRIGGER `trg_med_discontinue_insert_version` AFTER INSERT ON `carex`.`med_discontinue` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_discontinue';
+CREATE TRIGGER `trg_med_discontinue_update_version` AFTER UPDATE ON `carex`.`med_discontinue` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_discontinue';
+CREATE TRIGGER `trg_med_discontinue_delete_version` AFTER DELETE ON `carex`.`med_discontinue` FOR EACH ROW
+  UPDATE `carex`.`reference_data_version` SET `version` = `version` + 1 WHERE `name` = 'med_discontinue';
+
+-- medication ingredients, normalized at save time for the duplicate check.
+-- Filled for the existing rows by normalize_medication_ingredients.py
+CREATE TABLE `carex`.`medication_ingredients` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `medication_id` INT NOT NULL,
+  `patient_internal_id` INT NOT NULL,
+  `ingredient_name` VARCHAR(255) NOT NULL,
+  `ingredient_rxcui` VARCHAR(32) NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_medication_ingredients_med_name` (`medication_id`, `ingredient_name`),
+  KEY `idx_medication_ingredients_patient_name` (`patient_internal_id`, `ingredient_name`));
+
+-- keyset pages and incremental sync of the medication lists
+ALTER TABLE `carex`.`medication`
+  ADD INDEX `idx_medication_patient_update` (`patient_internal_id`, `update_time`, `id`);
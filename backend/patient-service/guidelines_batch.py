@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+import pymysql
+from custom_exception import GeneralException
+from guidelines_engine import (
+    GUIDELINE_LAB_NAMES,
+    VISIT_FREQUENCY_RULES,
+    LabSnapshot,
+    cal_mbd,
+    cal_monitor_caphos_one,
+    cal_monitor_caphos_six,
+    cal_monitor_caphos_three,
+    cal_monitor_pth_six,
+    cal_monitor_pth_three,
+    cal_oral_bicarb,
+    cal_reduce_phos,
+    cal_visit_frequency,
+)
+from lab_series import latest_bulk
+from shared import chunks, get_reusable_connection, read_as_dict, transaction
+from sqls.guidelines import (
+    BULK_INVALIDATE_GUIDELINES_QUERY,
+    GET_JOB_WATERMARK_QUERY,
+    INSERT_GUIDELINE_QUERY,
+    MAX_LAB_DATA_ID_QUERY,
+    PATIENTS_WITH_LAB_DATA_QUERY,
+    UPSERT_JOB_WATERMARK_QUERY,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+batch_size = int(os.getenv("GUIDELINES_BATCH_SIZE", "500"))
+
+WATERMARK_JOB_NAME = "patient_guidelines"
+JOB_MODES = ("incremental", "full")
+
+CKD_STAGES = ["CKD1", "CKD2", "CKD3A", "CKD3B", "CKD4"]
+CKD_STAGE_LOWER_BOUNDS = [90, 60, 45, 30, 15]
+
+
+class LabColumns:
+    """
+    Columnar view of the latest labs of many patients.
+    Every lab has a value array and an hours since tested array,
+    missing labs and values that are not a number are NaN
+    """
+
+    def __init__(self, patient_ids, snapshots):
+        self.patient_ids = patient_ids
+        self.snapshots = snapshots
+        self.values = {}
+        self.hours = {}
+        for name in GUIDELINE_LAB_NAMES:
+            values = np.full(len(patient_ids), np.nan)
+            hours = np.full(len(patient_ids), np.nan)
+            for index, patient_id in enumerate(patient_ids):
+                snapshot = snapshots[patient_id]
+                if name in snapshot.labs:
+                    values[index] = snapshot.numeric(name)
+                    hours[index] = snapshot.hours_since(name)
+                    if np.isnan(values[index]):
+                        logger.warning(
+                            "Patient %s %s value %r is not a number",
+                            patient_id,
+                            name,
+                            snapshot.raw(name),
+                        )
+            self.values[name] = values
+            self.hours[name] = hours
+
+    def ckd_stages(self):
+        """
+        Returns the CKD stage of every patient from its eGFR,
+        missing eGFR maps to CKD5
+        """
+        egfr = self.values["eGFR"]
+        conditions = [egfr >= bound for bound in CKD_STAGE_LOWER_BOUNDS]
+        return np.select(conditions, CKD_STAGES, default="CKD5")
+
+
+def _overdue_or_missing(hours, threshold):
+    """
+    Mask of the labs tested more than threshold hours ago or never tested
+    """
+    return np.isnan(hours) | (hours > threshold)
+
+
+def get_rule_masks(columns: LabColumns, stages):
+    """
+    Evaluates the lab thresholds of every guideline rule for all patients at once.
+    Returns (rule, mask) pairs in display order, the rule text is only built
+    for the patients whose mask is set
+    """
+    values, hours = columns.values, columns.hours
+    rule_masks = [
+        (cal_mbd, values["CA"] > 10.2),
+        (
+            cal_monitor_pth_six,
+            np.isin(stages, ["CKD3A", "CKD3B", "CKD4"]) & (hours["PTH"] > 365 * 24),
+        ),
+        (cal_monitor_pth_three, (stages == "CKD5") & (hours["PTH"] > 4380)),
+        (
+            cal_monitor_caphos_one,
+            (stages == "CKD5")
+            & (
+                _overdue_or_missing(hours["CA"], 2190)
+                | _overdue_or_missing(hours["PHOS"], 2190)
+            ),
+        ),
+        (
+            cal_monitor_caphos_three,
+            (stages == "CKD4")
+            & (
+                _overdue_or_missing(hours["CA"], 4380)
+                | _overdue_or_missing(hours["PHOS"], 4380)
+            ),
+        ),
+        (
+            cal_monitor_caphos_six,
+            np.isin(stages, ["CKD3A", "CKD3B"])
+            & (
+                _overdue_or_missing(hours["CA"], 365 * 24)
+                | _overdue_or_missing(hours["PHOS"], 365 * 24)
+            ),
+        ),
+        (cal_reduce_phos, values["PHOS"] > 5),
+    ]
+    has_uacr = ~np.isnan(values["UACR"])
+    rule_masks.extend(
+        (partial(cal_visit_frequency, rule=rule), has_uacr)
+        for rule in VISIT_FREQUENCY_RULES
+    )
+    rule_masks.append((cal_oral_bicarb, values["CO2"] < 22))
+    return rule_masks
+
+
+def evaluate_guidelines_bulk(snapshots):
+    """
+    This function evaluates the guideline rules for many patients
+    and returns a dict of patient_id -> list of guideline texts
+    """
+    patient_ids = list(snapshots)
+    if not patient_ids:
+        return {}
+    columns = LabColumns(patient_ids, snapshots)
+    stages = columns.ckd_stages()
+    rule_masks = get_rule_masks(columns, stages)
+    results = {}
+    for index, patient_id in enumerate(patient_ids):
+        guidelines = []
+        for rule, mask in rule_masks:
+            if not mask[index]:
+                continue
+            guide = rule(snapshots[patient_id], str(stages[index]))
+            if guide:
+                guidelines.append(guide)
+        results[patient_id] = guidelines
+    return results
+
+
+def get_lab_snapshots(cnx, patient_ids, now):
+    """
+    Loads the latest labs of all input patients in a single query
+    and returns a dict of patient_id -> LabSnapshot
+    """
+    labs_by_patient = latest_bulk(cnx, patient_ids, GUIDELINE_LAB_NAMES)
+    return {
+        patient_id: LabSnapshot(labs=labs, now=now)
+        for patient_id, labs in labs_by_patient.items()
+    }
+
+
+def save_guidelines_bulk(cnx, guidelines_by_patient, time_now):
+    """
+    This function invalidates the previous guidelines of all input patients
+    and inserts the new guidelines in a single transaction
+    """
+    create_date = time_now.strftime("%Y/%m/%d %H:%M:%S")
+    params = [
+        {
+            "patient_id": patient_id,
+            "create_date": create_date,
+            "guidelines": guide,
+            "most_recent_flag": "1",
+        }
+        for patient_id, guidelines in guidelines_by_patient.items()
+        for guide in guidelines
+    ]
+    with transaction(cnx) as cursor:
+        cursor.execute(
+            BULK_INVALIDATE_GUIDELINES_QUERY,
+            {"patient_ids": tuple(guidelines_by_patient)},
+        )
+        if params:
+            cursor.executemany(INSERT_GUIDELINE_QUERY, params)
+    return len(params)
+
+
+def refresh_guidelines(cnx, patient_ids, time_now=None):
+    """
+    Recomputes and stores the guidelines of the input patients
+    in batches of batch_size patients
+    """
+    time_now = time_now or datetime.now()
+    inserted = 0
+    for patient_id_chunk in chunks(list(patient_ids), batch_size):
+        snapshots = get_lab_snapshots(cnx, patient_id_chunk, time_now)
+        guidelines_by_patient = evaluate_guidelines_bulk(snapshots)
+        inserted += save_guidelines_bulk(cnx, guidelines_by_patient, time_now)
+    return inserted
+
+
+def get_watermark(cnx):
+    """
+    Returns the last lab_data id processed by the guidelines job
+    """
+    result = read_as_dict(
+        cnx, GET_JOB_WATERMARK_QUERY, {"job_name": WATERMARK_JOB_NAME}, fetchone=True
+    )
+    if result is None:
+        raise GeneralException("Could not read the guidelines job watermark")
+    return result.get("watermark", 0)
+
+
+def set_watermark(cnx, watermark):
+    """
+    Stores the last lab_data id processed by the guidelines job
+    """
+    with transaction(cnx) as cursor:
+        cursor.execute(
+            UPSERT_JOB_WATERMARK_QUERY,
+            {
+                "job_name": WATERMARK_JOB_NAME,
+                "watermark": watermark,
+                "updated_on": datetime.utcnow(),
+            },
+        )
+
+
+def run_guidelines_job(cnx, mode="incremental", patient_ids=None):
+    """
+    This function
+    1. Selects the patients to process:
+        - the input patient_ids
+        - all patients with lab data in "full" mode
+        - patients with lab data added since the watermark in "incremental" mode
+    2. Recomputes and stores their guidelines in batches
+    3. Moves the watermark to the last processed lab_data id
+    """
+    if mode not in JOB_MODES:
+        raise GeneralException(f"Invalid mode {mode!r}")
+    max_lab_id = None
+    if not patient_ids:
+        last_lab_id = 0 if mode == "full" else get_watermark(cnx)
+        result = read_as_dict(cnx, MAX_LAB_DATA_ID_QUERY, fetchone=True)
+        if result is None:
+            raise GeneralException("Could not read the last lab_data id")
+        max_lab_id = result.get("max_lab_id", 0)
+        rows = read_as_dict(
+            cnx,
+            PATIENTS_WITH_LAB_DATA_QUERY,
+            {"last_lab_id": last_lab_id, "max_lab_id": max_lab_id},
+        )
+        # read_as_dict returns None on a MySQL error, the watermark must not
+        # move past patients that were never processed
+        if rows is None:
+            raise GeneralException("Could not read the patients with new lab data")
+        patient_ids = [row["patient_id"] for row in rows]
+    logger.info("Refreshing guidelines of %s patients", len(patient_ids))
+    inserted = refresh_guidelines(cnx, patient_ids)
+    if max_lab_id is not None:
+        set_watermark(cnx, max_lab_id)
+    return {"patients": len(patient_ids), "guidelines": inserted}
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled task to recompute patient guidelines
+    """
+    event = event or {}
+    try:
+        result = run_guidelines_job(
+            get_reusable_connection(),
+            mode=event.get("mode", "incremental"),
+            patient_ids=event.get("patient_ids"),
+        )
+        return {"statusCode": 200, "body": json.dumps(result)}
+    except (pymysql.MySQLError, GeneralException) as err:
+        logger.exception(err)
+        return {"statusCode": 500, "body": json.dumps(str(err))}
@@ -0,0 +1,427 @@
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from lab_series import LabResult
+
+# Labs the guideline rules are evaluated against
+GUIDELINE_LAB_NAMES = ("Creatinine", "eGFR", "PHOS", "CA", "PTH", "UACR", "CO2")
+
+HOURS_PER_MONTH = 24 * 30
+
+
+@dataclass
+class LabSnapshot:
+    """
+    Latest lab values of a patient along with the time of evaluation.
+    All guideline rules are evaluated in memory against this snapshot
+    """
+
+    labs: Dict[str, LabResult] = field(default_factory=dict)
+    now: datetime = field(default_factory=datetime.now)
+
+    def raw(self, name):
+        """
+        Returns the raw lab value or -1 if the lab is missing
+        """
+        lab = self.labs.get(name)
+        return lab.value if lab else -1
+
+    def numeric(self, name):
+        """
+        Returns the lab value as float, -1 if the lab is missing
+        and NaN if its value is not a number
+        """
+        lab = self.labs.get(name)
+        if not lab:
+            return -1
+        try:
+            return float(lab.value)
+        except (TypeError, ValueError):
+            return math.nan
+
+    def hours_since(self, name) -> Optional[float]:
+        """
+        Returns the hours elapsed since the lab was tested
+        or None if the lab is missing
+        """
+        lab = self.labs.get(name)
+        if not lab:
+            return None
+        return (self.now - lab.date_tested).total_seconds() / 3600.0
+
+    def tested_on(self, name):
+        """
+        Returns the lab test date formatted for the guideline text
+        """
+        return datetime.strftime(self.labs[name].date_tested, "%m-%d-%Y")
+
+
+def show_red(str_):
+    """
+    Function to enclose the input string in #R and #
+    if input string is not empty
+    """
+    if str_ == "":
+        return ""
+    return "#R" + str_ + "#"
+
+
+def print_lab(snapshot: LabSnapshot, name, label, numeric=True):
+    """
+    Return Lab Guideline string based on value
+    """
+    # missing (-1) or unparsable (NaN) labs are left out
+    if not snapshot.numeric(name) >= 0:
+        return ""
+    value = snapshot.numeric(name) if numeric else snapshot.raw(name)
+    return label + " " + str(value)
+
+
+def print_phos(snapshot: LabSnapshot):
+    """
+    Return Phos Guideline string based on value
+    """
+    return print_lab(snapshot, "PHOS", "Phos")
+
+
+def print_ca(snapshot: LabSnapshot):
+    """
+    Return Calcium Guideline string based on value
+    """
+    return print_lab(snapshot, "CA", "Ca")
+
+
+def print_cr(snapshot: LabSnapshot):
+    """
+    Return Creatinine Guideline string based on value
+    """
+    return print_lab(snapshot, "Creatinine", "Cr", numeric=False)
+
+
+def print_egfr(snapshot: LabSnapshot):
+    """
+    Return eGFR Guideline string based on value
+    """
+    return print_lab(snapshot, "eGFR", "eGFR")
+
+
+def months_since(hours):
+    """
+    Converts the input hours to (30 day) months
+    """
+    return int(hours / HOURS_PER_MONTH)
+
+
+def cal_mbd(snapshot: LabSnapshot, ckd_value):
+    """
+    Returns a guideline regarding MBD (Mineral Bone Disease)
+    if the calcium value > 10.2
+    """
+    if snapshot.numeric("CA") <= 10.2:
+        return None
+    return (
+        ckd_value
+        + "   "
+        + show_red(print_ca(snapshot))
+        + "   "
+        + print_phos(snapshot)
+        + "   "
+        + print_egfr(snapshot)
+        + "   "
+        + print_cr(snapshot)
+        + "\n#RKDOQI MBD: Avoid Hypercalcemia#"
+    )
+
+
+def _pth_guideline(snapshot: LabSnapshot, ckd_value, period):
+    """
+    Returns the PTH monitoring guideline text
+    """
+    hours = snapshot.hours_since("PTH")
+    return (
+        ckd_value
+        + "   "
+        + "PTH "
+        + str(snapshot.raw("PTH"))
+        + "   "
+        + print_ca(snapshot)
+        + "   "
+        + print_phos(snapshot)
+        + "   "
+        + print_egfr(snapshot)
+        + "   "
+        + print_cr(snapshot)
+        + "   #Rlast test: "
+        + snapshot.tested_on("PTH")
+        + " ("
+        + str(months_since(hours))
+        + " months)#"
+        + "\n#RKDOQI monitor PTH every "
+        + period
+        + " months#"
+    )
+
+
+def cal_monitor_pth_six(snapshot: LabSnapshot, ckd_value):
+    """
+    Returns a guideline regarding PTH (Parathyroid Hormone) if
+    CKD Stage is in CKD3A / CKD3B / CKD4
+    and
+    the time difference between last PTH test and now > 365 days
+    """
+    hours = snapshot.hours_since("PTH")
+    if hours is None:
+        return None
+    if ckd_value in ["CKD3A", "CKD3B", "CKD4"] and hours > 365 * 24:
+        return _pth_guideline(snapshot, ckd_value, "6-12")
+    return None
+
+
+def cal_monitor_pth_three(snapshot: LabSnapshot, ckd_value):
+    """
+    Returns a guideline regarding PTH (Parathyroid Hormone) if
+    CKD Stage is CKD5
+    and
+    the time difference between last PTH test and now > 4380 hours (~6 months)
+    """
+    hours = snapshot.hours_since("PTH")
+    if hours is None:
+        return None
+    if ckd_value == "CKD5" and hours > 4380:
+        return _pth_guideline(snapshot, ckd_value, "3-6")
+    return None
+
+
+def _ca_phos_guideline(snapshot: LabSnapshot, ckd_value, threshold, period):
+    """
+    Returns the Calcium / Phos monitoring guideline text based on
+    how long ago each lab was tested (None when the lab is missing)
+    """
+    ca_hours = snapshot.hours_since("CA")
+    phos_hours = snapshot.hours_since("PHOS")
+    ca_overdue = ca_hours is not None and ca_hours > threshold
+    phos_overdue = phos_hours is not None and phos_hours > threshold
+    dt_print_ca = snapshot.tested_on("CA") if ca_hours is not None else "No Ca"
+    dt_print_phos = snapshot.tested_on("PHOS") if phos_hours is not None else "No Phos"
+    ca_since = (
+        dt_print_ca + " (" + str(months_since(ca_hours)) + " months)"
+        if ca_hours is not None
+        else ""
+    )
+    phos_since = (
+        dt_print_phos + " (" + str(months_since(phos_hours)) + " months)"
+        if phos_hours is not None
+        else ""
+    )
+    footer = "\nKDOQI monitor Ca and Phos every " + period + " months#"
+    base = "   " + print_egfr(snapshot) + "   " + print_cr(snapshot)
+
+    if ca_overdue and phos_hours is None:
+        return (
+            ckd_value
+            + "   "
+            + print_ca(snapshot)
+            + base
+            + "   #RCa: "
+            + ca_since
+            + "   "
+            + dt_print_phos
+            + footer
+        )
+    if phos_overdue and ca_hours is None:
+        return (
+            ckd_value
+            + "   "
+            + print_phos(snapshot)
+            + base
+            + "   #RPhos: "
+            + phos_since
+            + "   "
+            + dt_print_ca
+            + footer
+        )
+    if ca_hours is None and phos_hours is None:
+        return ckd_value + base + "   #R" + dt_print_phos + "   " + dt_print_ca + footer
+    if ca_overdue and phos_overdue:
+        return (
+            ckd_value
+            + "   "
+            + print_ca(snapshot)
+            + "   "
+            + print_phos(snapshot)
+            + base
+            + "   #RCa: "
+            + ca_since
+            + "   Phos: "
+            + phos_since
+            + footer
+        )
+    if ca_overdue:
+        return ckd_value + "   " + print_ca(snapshot) + base + "   #RCa: " + ca_since + footer
+    if phos_overdue:
+        return (
+            ckd_value
+            + "   "
+            + print_phos(snapshot)
+            + base
+            + "   #RPhos: "
+            + phos_since
+            + footer
+        )
+    if ca_hours is None:
+        return ckd_value + base + "   #R" + dt_print_ca + footer
+    if phos_hours is None:
+        return ckd_value + base + "   #R" + dt_print_phos + footer
+    return None
+
+
+def _cal_monitor_caphos(snapshot: LabSnapshot, ckd_value, stages, threshold, period):
+    """
+    Returns the Calcium / Phos monitoring guideline if the CKD stage
+    is in the input stages and one of the labs is overdue or missing
+    """
+    if ckd_value not in stages:
+        return None
+    return _ca_phos_guideline(snapshot, ckd_value, threshold, period)
+
+
+def cal_monitor_caphos_one(snapshot: LabSnapshot, ckd_value):
+    """
+    Ca and Phos monitoring guideline for CKD5 (every 1-3 months)
+    """
+    return _cal_monitor_caphos(snapshot, ckd_value, ["CKD5"], 2190, "1-3")
+
+
+def cal_monitor_caphos_three(snapshot: LabSnapshot, ckd_value):
+    """
+    Ca and Phos monitoring guideline for CKD4 (every 3-6 months)
+    """
+    return _cal_monitor_caphos(snapshot, ckd_value, ["CKD4"], 4380, "3-6")
+
+
+def cal_monitor_caphos_six(snapshot: LabSnapshot, ckd_value):
+    """
+    Ca and Phos monitoring guideline for CKD3A / CKD3B (every 6-12 months)
+    """
+    return _cal_monitor_caphos(
+        snapshot, ckd_value, ["CKD3A", "CKD3B"], 365 * 24, "6-12"
+    )
+
+
+def cal_reduce_phos(snapshot: LabSnapshot, ckd_value):
+    """
+    Returns a guideline regarding reduction of Phos if phos value > 5
+    """
+    phos_val = snapshot.numeric("PHOS")
+    if phos_val <= 5:
+        return None
+    return (
+        ckd_value
+        + "   eGFR "
+        + str(snapshot.numeric("eGFR"))
+        + "   Creatinine "
+        + str(snapshot.raw("Creatinine"))
+        + "   #RPhos "
+        + str(phos_val)
+        + "#"
+        + "\n#RKDOQI Reduce Phos level to normal range#"
+    )
+
+
+@dataclass
+class VisitFrequencyRule:
+    times: str
+    last_clinic_visit: str
+    threshold: int
+    applies: Callable[[str, int], bool]
+
+
+# Clinic visit frequency rules, the last clinic visit is not tracked yet
+# so the dates below are placeholders carried over from the original rules
+VISIT_FREQUENCY_RULES = [
+    VisitFrequencyRule(
+        times="1x",
+        last_clinic_visit="2018-02-15 16:05:55",
+        threshold=8760,
+        applies=lambda ckd, uacr: (ckd in ["CKD2", "CKD1"] and uacr <= 300)
+        or (ckd == "CKD3A" and uacr <= 30),
+    ),
+    VisitFrequencyRule(
+        times="2x",
+        last_clinic_visit="2017-02-15 16:05:55",
+        threshold=4380,
+        applies=lambda ckd, uacr: (ckd in ["CKD2", "CKD1"] and uacr > 300)
+        or (ckd == "CKD3B" and uacr < 30)
+        or (ckd == "CKD3A" and 30 <= uacr <= 300),
+    ),
+    VisitFrequencyRule(
+        times="3x",
+        last_clinic_visit="2018-02-15 16:05:55",
+        threshold=2920,
+        applies=lambda ckd, uacr: (ckd == "CKD4" and uacr <= 300)
+        or (ckd == "CKD3B" and uacr > 30)
+        or (ckd == "CKD3A" and uacr > 300),
+    ),
+    VisitFrequencyRule(
+        times="4x",
+        last_clinic_visit="2018-02-15 16:05:55",
+        threshold=2190,
+        applies=lambda ckd, uacr: ckd == "CKD5"
+        or (ckd == "CKD4" and uacr > 300)
+        or ckd == "CKD3A",
+    ),
+]
+
+
+def cal_visit_frequency(snapshot: LabSnapshot, ckd_value, rule: VisitFrequencyRule):
+    """
+    Returns a guideline regarding clinic visit frequency based on
+    the UACR value, CKD stage and the time since the last visit
+    """
+    if "UACR" not in snapshot.labs:
+        return None
+    uacr = int(float(snapshot.raw("UACR")))
+    lcv = datetime.strptime(rule.last_clinic_visit, "%Y-%m-%d %H:%M:%S")
+    time_diff = (snapshot.now - lcv).total_seconds() / 3600.0
+    if not (rule.applies(ckd_value, uacr) and time_diff > rule.threshold):
+        return None
+    return (
+        ckd_value
+        + "   UACR "
+        + str(uacr)
+        + "   "
+        + print_egfr(snapshot)
+        + "   "
+        + print_cr(snapshot)
+        + "   #Rlast visit: "
+        + datetime.strftime(lcv, "%m-%d-%Y")
+        + " ("
+        + str(months_since(time_diff))
+        + " months)#"
+        + "\n#RKDOQI Frequency of follow up "
+        + rule.times
+        + " per year#"
+    )
+
+
+def cal_oral_bicarb(snapshot: LabSnapshot, ckd_value):
+    """
+    Returns a guideline regarding Oral Bicarb if CO2 value < 22
+    """
+    if "CO2" not in snapshot.labs:
+        return None
+    co_val = int(float(snapshot.raw("CO2")))
+    if co_val >= 22:
+        return None
+    return (
+        ckd_value
+        + "   "
+        + print_egfr(snapshot)
+        + "   "
+        + print_cr(snapshot)
+        + "   CO2 "
+        + str(co_val)
+        + "\n#RKDIGO CKD: GL CKD: Give oral bicarb supplementation for serum bicarb less than 22#"
+    )
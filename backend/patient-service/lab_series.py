@@ -0,0 +1,123 @@
+import logging
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict
+
+from custom_exception import GeneralException
+from shared import read_query
+from sqls.lab_series import LAB_WINDOW_QUERY, LATEST_LAB_VALUES_QUERY
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+@dataclass
+class LabResult:
+    value: str
+    date_tested: datetime
+
+
+@dataclass
+class LabSeries:
+    """
+    Compact time series of one lab.
+    timestamps are UTC epoch seconds and values are floats,
+    both stored as typed arrays sorted by timestamp
+    """
+
+    name: str
+    timestamps: array = field(default_factory=lambda: array("d"))
+    values: array = field(default_factory=lambda: array("d"))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, date_tested, value):
+        """
+        Appends a point, values which are not numeric are skipped
+        """
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            logger.warning("Skipping non numeric %s value %s", self.name, value)
+            return
+        self.timestamps.append(to_epoch(date_tested))
+        self.values.append(value)
+
+    def to_dict(self):
+        """
+        Returns the series in a JSON serializable columnar format
+        """
+        return {
+            "name": self.name,
+            "timestamps": self.timestamps.tolist(),
+            "values": self.values.tolist(),
+        }
+
+
+def to_epoch(date_tested):
+    """
+    Converts a naive UTC datetime to epoch seconds
+    """
+    return date_tested.replace(tzinfo=timezone.utc).timestamp()
+
+
+def latest_bulk(cnx, patient_ids, names) -> Dict[str, Dict[str, LabResult]]:
+    """
+    Returns the most recent result of every input lab for every input patient
+    as a dict of patient_id -> {lab name -> LabResult}.
+    Patients without any of the labs map to an empty dict,
+    a failed read raises rather than returning no labs
+    """
+    results = {str(patient_id): {} for patient_id in patient_ids}
+    if not results:
+        return results
+    rows = read_query(
+        cnx,
+        LATEST_LAB_VALUES_QUERY,
+        {"patient_ids": tuple(patient_ids), "names": tuple(names)},
+    )
+    if rows is None:
+        raise GeneralException("Could not read the latest lab values")
+    for patient_id, name, value, date_tested in rows:
+        labs = results.setdefault(str(patient_id), {})
+        if name not in labs or labs[name].date_tested < date_tested:
+            labs[name] = LabResult(value=value, date_tested=date_tested)
+    return results
+
+
+def latest(cnx, patient_id, names) -> Dict[str, LabResult]:
+    """
+    Returns the most recent result of every input lab for the patient
+    as a dict of lab name -> LabResult
+    """
+    return latest_bulk(cnx, [patient_id], names)[str(patient_id)]
+
+
+def window_bulk(cnx, patient_ids, name, since) -> Dict[str, LabSeries]:
+    """
+    Returns the points of the input lab tested on or after since
+    for every input patient as a dict of patient_id -> LabSeries,
+    a failed read raises rather than returning empty series
+    """
+    series = {str(patient_id): LabSeries(name) for patient_id in patient_ids}
+    if not series:
+        return series
+    rows = read_query(
+        cnx,
+        LAB_WINDOW_QUERY,
+        {"patient_ids": tuple(patient_ids), "name": name, "since": since},
+    )
+    if rows is None:
+        raise GeneralException("Could not read the lab series")
+    for patient_id, date_tested, value in rows:
+        series.setdefault(str(patient_id), LabSeries(name)).append(date_tested, value)
+    return series
+
+
+def window(cnx, patient_id, name, since) -> LabSeries:
+    """
+    Returns the points of the input lab tested on or after since for the patient
+    """
+    return window_bulk(cnx, [patient_id], name, since)[str(patient_id)]
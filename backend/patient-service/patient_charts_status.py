@@ -1,57 +1,94 @@
 import logging
+import re
+from http import HTTPStatus
 
-import boto3
-from custom_exception import GeneralException
-from shared import (
-    get_analytics_connect,
-    get_db_connect,
-    get_phi_data,
-    json_response,
-    read_as_dict,
-)
-from sqls.patient_queries import PATIENT_DETAILS
-
-dynamodb = boto3.resource("dynamodb")
+import pymysql
+from shared import get_analytics_connect, json_response, read_as_dict
+from sqls.patient_queries import ANALYTICS_VIEWS_QUERY, CHART_AVAILABILITY_QUERY
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-connection = get_db_connect()
 aconnection = get_analytics_connect()
 
+ANALYTICS_VIEW_PREFIX = "analytics_"
+VALID_VIEW_NAME = re.compile(r"^analytics_[a-z0-9_]+$")
+
+# symptom_type -> view name, loaded once per container
+_analytics_views = {}
+
 
-def get_patient_chart_status(cnx, acnx, patient_internal_id, symptom_type):
+def get_analytics_views(acnx):
     """
-    Patient Chart Status
+    Returns a dict of symptom_type -> analytics view name.
+    The views are read from information_schema once per container
+    and also serve as the allow list for the symptom_type path parameter
     """
-    try:
-        patient_info = read_as_dict(
-            cnx, PATIENT_DETAILS, {"patient_id": patient_internal_id}
-        )[0]
-        if patient_info is None:
-            return 200, []
-        patient_phi = get_phi_data(patient_info["external_id"], dynamodb)
-        patient_info.update(patient_phi)
-        name = f"{patient_info['last_name']}, {patient_info['first_name']}"
-        view_name = "analytics_" + symptom_type
-        username = patient_info["email"]
-        sql = (
-            "SELECT *, '"
-            + name
-            + "' as name, tstamp AS submission_date FROM "
-            + view_name
-            + " WHERE email_id = '"
-            + username
-            + "' ORDER  BY STR_TO_DATE(tstamp, '%m/%d/%Y') "
+    if not _analytics_views:
+        rows = read_as_dict(acnx, ANALYTICS_VIEWS_QUERY) or []
+        for row in rows:
+            view_name = row["view_name"]
+            if VALID_VIEW_NAME.match(view_name):
+                symptom_type = view_name[len(ANALYTICS_VIEW_PREFIX) :]
+                _analytics_views[symptom_type] = view_name
+    return _analytics_views
+
+
+def get_chart_availability(acnx, patient_internal_id, symptom_types=None):
+    """
+    Returns a dict of symptom_type -> "True" / "False" telling if the patient
+    has chart data for the symptom type.
+    All symptom types are answered in a single query with one EXISTS probe
+    per analytics view, keyed by the patient internal_id
+    """
+    views = get_analytics_views(acnx)
+    if symptom_types is None:
+        symptom_types = sorted(views)
+    probes = [
+        CHART_AVAILABILITY_QUERY.format(
+            symptom_type=symptom_type, view_name=views[symptom_type]
         )
+        for symptom_type in symptom_types
+        if symptom_type in views
+    ]
+    if not probes:
+        return {}
+    rows = read_as_dict(
+        acnx,
+        " UNION ALL ".join(probes),
+        {"patient_internal_id": patient_internal_id},
+    )
+    return {
+        row["symptom_type"]: "True" if row["is_available"] else "False"
+        for row in rows or []
+    }
+
 
-        patient_dict_rows = read_as_dict(acnx, sql)
+def get_patient_chart_status(acnx, patient_internal_id, symptom_type):
+    """
+    Patient Chart Status for a single symptom type
+    """
+    try:
+        if symptom_type not in get_analytics_views(acnx):
+            return HTTPStatus.BAD_REQUEST, {"message": "Invalid symptom type"}
+        availability = get_chart_availability(
+            acnx, patient_internal_id, [symptom_type]
+        )
+        return HTTPStatus.OK, {"result": availability.get(symptom_type, "False")}
+    except pymysql.MySQLError as err:
+        logger.exception(err)
+        return HTTPStatus.INTERNAL_SERVER_ERROR, str(err)
 
-        is_available = len(patient_dict_rows) > 0
-        return {"result": "True" if is_available else "False"}
 
-    except GeneralException as e:
-        logger.exception(e)
+def get_patient_charts_status(acnx, patient_internal_id):
+    """
+    Patient Chart Status for all symptom types
+    """
+    try:
+        return HTTPStatus.OK, get_chart_availability(acnx, patient_internal_id)
+    except pymysql.MySQLError as err:
+        logger.exception(err)
+        return HTTPStatus.INTERNAL_SERVER_ERROR, str(err)
 
 
 def lambda_handler(event, context):
@@ -60,7 +97,12 @@ def lambda_handler(event, context):
     """
     patient_internal_id = event["pathParameters"].get("patient_internal_id")
     symptom_type = event["pathParameters"].get("symptom_type")
-    status_code, user_result = get_patient_chart_status(
-        connection, aconnection, patient_internal_id, symptom_type
-    )
-    return json_response(data=user_result, response_code=status_code)
+    if symptom_type:
+        status_code, user_result = get_patient_chart_status(
+            aconnection, patient_internal_id, symptom_type
+        )
+    else:
+        status_code, user_result = get_patient_charts_status(
+            aconnection, patient_internal_id
+        )
+    return json_response(data=user_result, response_code=status_code.value)
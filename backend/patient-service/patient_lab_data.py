@@ -1,7 +1,9 @@
 import logging
+from datetime import datetime, timedelta
 from http import HTTPStatus
 
 from custom_exception import GeneralException
+from lab_series import window
 from shared import (
     find_user_by_external_id,
     get_db_connect,
@@ -16,6 +18,9 @@ logger.setLevel(logging.INFO)
 
 connection = get_db_connect()
 
+# longest lab series a client can request, in (30 day) months
+MAX_DURATION_MONTHS = 600
+
 
 def get_lab_data(cnx, patient_id):
     """
@@ -43,6 +48,25 @@ def get_lab_data(cnx, patient_id):
         return 500, str(err)
 
 
+def get_lab_series(cnx, patient_id, name, duration):
+    """
+    Get the (timestamp, value) series of one lab of the patient
+    tested within the last duration months, 1 to MAX_DURATION_MONTHS
+    """
+    try:
+        duration = int(duration)
+    except ValueError:
+        return HTTPStatus.BAD_REQUEST, "Invalid duration"
+    if not 1 <= duration <= MAX_DURATION_MONTHS:
+        return HTTPStatus.BAD_REQUEST, "Invalid duration"
+    since = datetime.utcnow() - timedelta(days=30 * duration)
+    try:
+        return 200, window(cnx, patient_id, name, since).to_dict()
+    except GeneralException as err:
+        logger.exception(err)
+        return 500, str(err)
+
+
 def lambda_handler(event, context):
     """
     Handler function
@@ -58,8 +82,17 @@ def lambda_handler(event, context):
         user_data=user_data,
         patient_internal_id=patient_id,
     )
+    query_params = event.get("queryStringParameters") or {}
     if is_allowed and access_result and access_result["message"] == "Success":
-        status_code, user_result = get_lab_data(connection, patient_id)
+        if query_params.get("name"):
+            status_code, user_result = get_lab_series(
+                connection,
+                patient_id,
+                query_params["name"],
+                query_params.get("duration", 12),
+            )
+        else:
+            status_code, user_result = get_lab_data(connection, patient_id)
     else:
         status_code = HTTPStatus.BAD_REQUEST
         user_result = access_result
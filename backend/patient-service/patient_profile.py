@@ -4,6 +4,7 @@ import os
 
 import boto3
 from custom_exception import GeneralException
+from instrumentation import instrument_handler
 from medical_info import MedicalType
 from patient_utils import (
     get_chat_summary_base_query,
@@ -491,6 +492,7 @@ def get_patient_profile(
     return patient_data
 
 
+@instrument_handler
 def lambda_handler(event, context):
     """
     The api will handle Get Network for providers and caregivers.
@@ -1,6 +1,5 @@
 import json
 import logging
-from datetime import timedelta
 from http import HTTPStatus
 
 from custom_exception import GeneralException
@@ -9,9 +8,17 @@ from shared import (
     get_db_connect,
     get_headers,
     read_as_dict,
+    read_query,
     check_user_access_for_patient_data,
 )
-from sqls.vital import BP_HR_QUERY, RM_VALES_QUERY, WEIGHT_QUERY
+from rm_vitals import get_timezone, transform_rm_readings
+from vital_charts import get_chart_params, get_vital_chart, is_chart_request
+from sqls.vital import (
+    BP_HR_QUERY,
+    RM_DAILY_SUMMARY_QUERY,
+    RM_VALES_QUERY,
+    WEIGHT_QUERY,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -104,50 +111,56 @@ def get_vital_signs(cnx, patient_id, duration):
         return 500, err
 
 
-def convert_regular_to_string(reg):
+def get_rm_values(cnx, patient_internal_id, duration, tzinfo=None):
+    """
+    Get BP Device Readings reported from the remote device linked to the patient.
+    The readings are fetched as tuples and transformed column wise,
+    AM/PM is bucketed in the local time of tzinfo (RM_TIMEZONE by default)
+    """
+    try:
+        rows = read_query(cnx, RM_VALES_QUERY, (patient_internal_id, duration))
+        final_rm_values = transform_rm_readings(rows or [], tzinfo or get_timezone())
+        logger.info("Completed Execution for Patient RM Values")
+        return 200, final_rm_values
+    except GeneralException as err:
+        logger.error(err)
+        return 500, err
+
+
+def format_bp(systolic, diastolic):
     """
-    Converts 0/1 value in input to Regular/Irregular for BP data
+    Converts the pressures reported by the BP device to a mmHg
+    systolic/diastolic string
     """
-    if reg == "0":
-        return "Regular"
-    return "Irregular"
+    if systolic is None or diastolic is None:
+        return ""
+    bp_top = int(round(int(systolic) * 0.0075006))
+    bp_bot = int(round(int(diastolic) * 0.0075006))
+    return str(bp_top) + "/" + str(bp_bot)
 
 
-def get_rm_values(cnx, patient_internal_id, duration):
+def get_rm_daily_summary(cnx, patient_internal_id, duration):
     """
-    Get BP Device Readings reported from the remote device linked to the patient
+    Get the daily summary of the BP Device Readings of the patient
+    from the device_reading_daily rollup
     """
     try:
         patient_dict_rows = read_as_dict(
-            cnx, RM_VALES_QUERY, (patient_internal_id, duration)
+            cnx, RM_DAILY_SUMMARY_QUERY, (patient_internal_id, duration)
         )
-
-        final_rm_values = []
-
-        for row in patient_dict_rows:
-            bp_top = int(round(int(row.get("systolic", "")) * 0.0075006))
-            bp_bot = int(round(int(row.get("diastolic", "")) * 0.0075006))
-            bp_join = str(bp_top) + "/" + str(bp_bot)
-            pulse = row.get("pulse", "")
-            regular = convert_regular_to_string(row.get("irregular", ""))
-            bpt = row.get("timestamp", "")
-            key_id = row.get("id", "")
-            final_rm_values.append(
-                {
-                    "bp_taken_on": bpt.strftime("%m-%d-%Y %I:%M %p"),
-                    "am_bp": bp_join
-                    if (bpt - timedelta(hours=5)).strftime("%p") == "AM"
-                    else "",
-                    "pm_bp": bp_join
-                    if (bpt - timedelta(hours=5)).strftime("%p") == "PM"
-                    else "",
-                    "h_pulse": pulse,
-                    "reg": regular,
-                    "key_id": key_id,
-                }
-            )
-        logger.info("Completed Execution for Patient RM Values")
-        return 200, final_rm_values
+        final_rm_summary = [
+            {
+                "reading_date": row["reading_date"].strftime("%m-%d-%Y"),
+                "reading_count": int(row["reading_count"]),
+                "min_bp": format_bp(row["min_systolic"], row["min_diastolic"]),
+                "max_bp": format_bp(row["max_systolic"], row["max_diastolic"]),
+                "min_pulse": row["min_pulse"],
+                "max_pulse": row["max_pulse"],
+            }
+            for row in patient_dict_rows
+        ]
+        logger.info("Completed Execution for Patient RM Summary")
+        return 200, final_rm_summary
     except GeneralException as err:
         logger.error(err)
         return 500, err
@@ -155,29 +168,54 @@ def get_rm_values(cnx, patient_internal_id, duration):
 
 def lambda_handler(event, context):
     """
-    The api will handle getting vital signs for a patient
+    The api will handle getting vital signs for a patient.
+    Passing bucket, aggregate or max_points returns bounded chart series
+    instead of every reported point
     """
     auth_user = event["requestContext"].get("authorizer")
     external_id = auth_user["userSub"]
     role = auth_user["userRole"]
     user_data = find_user_by_external_id(connection, external_id, role)
     patient_id = event["pathParameters"].get("patient_id")
-    v_type = event["queryStringParameters"].get("type")
-    duration = event["queryStringParameters"].get("duration")
+    query_params = event["queryStringParameters"]
+    v_type = query_params.get("type")
+    duration = query_params.get("duration")
+    tzinfo = get_timezone(query_params.get("tz"))
+    chart_params, chart_error = (
+        get_chart_params(query_params) if is_chart_request(query_params) else ({}, None)
+    )
     is_allowed, access_result = check_user_access_for_patient_data(
         cnx=connection,
         role=role,
         user_data=user_data,
         patient_internal_id=patient_id,
     )
-    if is_allowed and access_result and access_result["message"] == "Success":
-        if v_type == "Manual":
+    if not tzinfo:
+        status_code = HTTPStatus.BAD_REQUEST
+        user_result = {"message": "Unknown timezone"}
+    elif chart_error:
+        status_code = HTTPStatus.BAD_REQUEST
+        user_result = {"message": chart_error}
+    elif is_allowed and access_result and access_result["message"] == "Success":
+        if chart_params:
+            status_code, user_result = get_vital_chart(
+                connection, patient_id, duration, v_type, chart_params, tzinfo
+            )
+        elif v_type == "Manual":
             status_code, user_result = get_vital_signs(connection, patient_id, duration)
         elif v_type == "Remote":
-            status_code, user_result = get_rm_values(connection, patient_id, duration)
+            status_code, user_result = get_rm_values(
+                connection, patient_id, duration, tzinfo
+            )
+        elif v_type == "RemoteSummary":
+            status_code, user_result = get_rm_daily_summary(
+                connection, patient_id, duration
+            )
         else:
             status_code, user_result = get_vital_signs(connection, patient_id, duration)
-            status_code, result = get_rm_values(connection, patient_id, duration)
+            status_code, result = get_rm_values(
+                connection, patient_id, duration, tzinfo
+            )
             user_result.extend(result)
     else:
         status_code = HTTPStatus.BAD_REQUEST
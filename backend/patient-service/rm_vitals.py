@@ -0,0 +1,169 @@
+import os
+from datetime import timezone
+
+import numpy as np
+from dateutil import tz
+
+# BP devices report pressures in Pa
+PA_TO_MMHG = 0.0075006
+
+rm_timezone = os.getenv("RM_TIMEZONE", "America/Chicago")
+
+# %I:%M %p of every minute of the day
+TIME_LABELS = np.array(
+    [
+        "%02d:%02d %s" % (hour % 12 or 12, minute, "AM" if hour < 12 else "PM")
+        for hour in range(24)
+        for minute in range(60)
+    ],
+    dtype=object,
+)
+
+
+def get_timezone(tz_name=None):
+    """
+    Returns the tzinfo used for AM/PM bucketing, None if the name is unknown
+    """
+    return tz.gettz(tz_name or rm_timezone)
+
+
+def _offsets_at(instants, tzinfo):
+    """
+    UTC offsets in seconds of tzinfo at the UTC instants
+    """
+    return np.array(
+        [
+            instant.replace(tzinfo=timezone.utc)
+            .astimezone(tzinfo)
+            .utcoffset()
+            .total_seconds()
+            for instant in instants.astype(object)
+        ],
+        dtype=np.int64,
+    )
+
+
+def utc_offsets(timestamps, tzinfo):
+    """
+    Returns the UTC offset in seconds in tzinfo of every datetime64 UTC timestamp.
+    Offsets are resolved once per distinct UTC day, only the timestamps
+    of days with a DST transition are resolved per hour
+    """
+    days, day_index = np.unique(timestamps.astype("datetime64[D]"), return_inverse=True)
+    day_index = day_index.reshape(-1)
+    day_start = _offsets_at(days.astype("datetime64[s]"), tzinfo)
+    day_end = _offsets_at(
+        days.astype("datetime64[s]") + np.timedelta64(86399, "s"), tzinfo
+    )
+    offsets = day_start[day_index]
+    transition = (day_start != day_end)[day_index]
+    if transition.any():
+        hours, hour_index = np.unique(
+            timestamps[transition].astype("datetime64[h]"), return_inverse=True
+        )
+        offsets[transition] = _offsets_at(hours.astype("datetime64[s]"), tzinfo)[
+            hour_index.reshape(-1)
+        ]
+    return offsets
+
+
+class ReadingColumns:
+    """
+    Columnar view of device readings fetched as
+    (id, systolic, diastolic, pulse, irregular, epoch seconds) tuples.
+    Missing pressures and flags are NaN
+    """
+
+    def __init__(self, rows):
+        ids, systolic, diastolic, pulse, irregular, epoch_seconds = (
+            zip(*rows) if rows else ((),) * 6
+        )
+        self.ids = list(ids)
+        self.pulse = list(pulse)
+        self.systolic = np.array(systolic, dtype=np.float64)
+        self.diastolic = np.array(diastolic, dtype=np.float64)
+        self.irregular = np.array(irregular, dtype=np.float64)
+        self.timestamps = np.array(epoch_seconds, dtype=np.int64).astype(
+            "datetime64[s]"
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_am(self, tzinfo):
+        """
+        Mask of the readings taken before noon local time
+        """
+        local = self.timestamps + utc_offsets(self.timestamps, tzinfo).astype(
+            "timedelta64[s]"
+        )
+        local_hour = local.astype("datetime64[h]") - local.astype("datetime64[D]")
+        return local_hour.astype(np.int64) < 12
+
+    def bp_labels(self):
+        """
+        Returns the mmHg systolic/diastolic string of every reading,
+        each distinct pair is only formatted once.
+        Readings without both pressures are empty
+        """
+        missing = np.isnan(self.systolic) | np.isnan(self.diastolic)
+        top = np.rint(np.nan_to_num(self.systolic) * PA_TO_MMHG).astype(np.int64)
+        bottom = np.rint(np.nan_to_num(self.diastolic) * PA_TO_MMHG).astype(np.int64)
+        pairs, inverse = np.unique(top << 32 | bottom, return_inverse=True)
+        labels = np.array(
+            [f"{pair >> 32}/{pair & 0xFFFFFFFF}" for pair in pairs.tolist()],
+            dtype=object,
+        )[inverse.reshape(-1)]
+        labels[missing] = ""
+        return labels
+
+    def taken_on_labels(self):
+        """
+        Returns the timestamps formatted as %m-%d-%Y %I:%M %p.
+        The date part is formatted once per distinct day and the time part
+        once per minute of the day, rows only join the two
+        """
+        days = self.timestamps.astype("datetime64[D]")
+        unique_days, day_index = np.unique(days, return_inverse=True)
+        day_labels = np.array(
+            [day.strftime("%m-%d-%Y ") for day in unique_days.astype(object)],
+            dtype=object,
+        )
+        minute_of_day = (
+            self.timestamps.astype("datetime64[m]") - days.astype("datetime64[m]")
+        ).astype(np.int64)
+        return (day_labels[day_index.reshape(-1)] + TIME_LABELS[minute_of_day]).tolist()
+
+
+def transform_rm_readings(rows, tzinfo):
+    """
+    Converts device reading tuples to the Remote vitals rows of the vital
+    signs api. Unit conversion, AM/PM bucketing in tzinfo and the regular
+    flag are computed over whole columns, strings are only built at the end
+    """
+    columns = ReadingColumns(rows)
+    if not len(columns):
+        return []
+    bp = columns.bp_labels()
+    is_am = columns.is_am(tzinfo)
+    am_bp = np.where(is_am, bp, "").tolist()
+    pm_bp = np.where(is_am, "", bp).tolist()
+    regular = np.where(columns.irregular == 0, "Regular", "Irregular").tolist()
+    return [
+        {
+            "bp_taken_on": taken_on,
+            "am_bp": am,
+            "pm_bp": pm,
+            "h_pulse": pulse,
+            "reg": reg,
+            "key_id": key_id,
+        }
+        for taken_on, am, pm, pulse, reg, key_id in zip(
+            columns.taken_on_labels(),
+            am_bp,
+            pm_bp,
+            columns.pulse,
+            regular,
+            columns.ids,
+        )
+    ]
@@ -0,0 +1,67 @@
+# Insert Guideline Query
+
+INSERT_GUIDELINE_QUERY = """
+INSERT INTO mi_guidelines (`patient_id`, `create_date`, `guidelines`, `most_recent_flag`)
+VALUES (%(patient_id)s, %(create_date)s, %(guidelines)s, %(most_recent_flag)s)
+"""
+
+# Most Recent Guidelines Query
+
+MOST_RECENT_GUIDELINES_QUERY = """
+SELECT
+    *
+FROM
+    mi_guidelines
+WHERE
+    patient_id = %(patient_id)s
+        AND most_recent_flag = '1'
+"""
+
+# Invalidate Guidelines Of Many Patients Query
+
+BULK_INVALIDATE_GUIDELINES_QUERY = """
+UPDATE mi_guidelines
+SET
+    most_recent_flag = '0'
+WHERE
+    patient_id IN %(patient_ids)s
+        AND most_recent_flag = '1'
+"""
+
+# Patients With Lab Data Query
+
+PATIENTS_WITH_LAB_DATA_QUERY = """
+SELECT DISTINCT
+    patient_id
+FROM
+    lab_data
+WHERE
+    id > %(last_lab_id)s
+        AND id <= %(max_lab_id)s
+"""
+
+# Max Lab Data Id Query
+
+MAX_LAB_DATA_ID_QUERY = """
+SELECT
+    COALESCE(MAX(id), 0) AS max_lab_id
+FROM
+    lab_data
+"""
+
+# Job Watermark Queries
+
+GET_JOB_WATERMARK_QUERY = """
+SELECT
+    watermark
+FROM
+    job_watermarks
+WHERE
+    job_name = %(job_name)s
+"""
+
+UPSERT_JOB_WATERMARK_QUERY = """
+INSERT INTO job_watermarks (job_name, watermark, updated_on)
+VALUES (%(job_name)s, %(watermark)s, %(updated_on)s)
+ON DUPLICATE KEY UPDATE watermark = VALUES(watermark), updated_on = VALUES(updated_on)
+"""
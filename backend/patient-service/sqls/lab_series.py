@@ -0,0 +1,41 @@
+# Latest Lab Values Query
+# Returns the most recent row of every requested lab for every requested patient
+# Served by idx_lab_data_patient_name_date (patient_id, name, date_tested, value)
+
+LATEST_LAB_VALUES_QUERY = """
+SELECT
+    lab_data.patient_id,
+    lab_data.name,
+    lab_data.value,
+    lab_data.date_tested
+FROM
+    lab_data
+        INNER JOIN
+    (SELECT
+        patient_id, name, MAX(date_tested) AS date_tested
+    FROM
+        lab_data
+    WHERE
+        patient_id IN %(patient_ids)s
+            AND name IN %(names)s
+    GROUP BY patient_id , name) latest ON latest.patient_id = lab_data.patient_id
+        AND latest.name = lab_data.name
+        AND latest.date_tested = lab_data.date_tested
+"""
+
+# Lab Window Query
+# Returns the (date_tested, value) points of a lab tested since the input date
+
+LAB_WINDOW_QUERY = """
+SELECT
+    patient_id,
+    date_tested,
+    value
+FROM
+    lab_data
+WHERE
+    patient_id IN %(patient_ids)s
+        AND name = %(name)s
+        AND date_tested >= %(since)s
+ORDER BY patient_id , date_tested
+"""
@@ -263,3 +263,30 @@ WHERE  union_table.internal_id = %(notifier_internal_id)s
 GROUP  BY notifications_table.medical_data_type,
           notifications_table.patient_internal_id; 
 """
+
+# Analytics Views Query
+# Lists the analytics_<symptom_type> views available for charts
+
+ANALYTICS_VIEWS_QUERY = """
+SELECT
+    TABLE_NAME AS view_name
+FROM
+    information_schema.VIEWS
+WHERE
+    TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME LIKE 'analytics\\_%%'
+"""
+
+# Chart Availability Query
+# One EXISTS probe per analytics view, joined with UNION ALL
+
+CHART_AVAILABILITY_QUERY = """
+SELECT
+    '{symptom_type}' AS symptom_type,
+    EXISTS( SELECT
+            1
+        FROM
+            {view_name}
+        WHERE
+            internal_id = %(patient_internal_id)s) AS is_available
+"""
@@ -2,15 +2,12 @@
 
 RM_VALES_QUERY = """
 SELECT 
-    device_pairing.imei,
     device_reading.id,
-    patient_internal_id,
     systolic,
     diastolic,
     pulse,
-    irregular,
-    active,
-    timestamp
+    CAST(irregular AS SIGNED) AS irregular,
+    TIMESTAMPDIFF(SECOND, '1970-01-01', timestamp) AS epoch_seconds
 FROM
     device_reading
         INNER JOIN
@@ -24,6 +21,27 @@ WHERE
 ORDER BY timestamp DESC
 """
 
+# RM Daily Summary Query
+
+RM_DAILY_SUMMARY_QUERY = """
+SELECT
+    reading_date,
+    SUM(reading_count) AS reading_count,
+    MIN(min_systolic) AS min_systolic,
+    MAX(max_systolic) AS max_systolic,
+    MIN(min_diastolic) AS min_diastolic,
+    MAX(max_diastolic) AS max_diastolic,
+    MIN(min_pulse) AS min_pulse,
+    MAX(max_pulse) AS max_pulse
+FROM
+    device_reading_daily
+WHERE
+    patient_internal_id = %s
+        AND reading_date >= CURDATE() - INTERVAL %s MONTH
+GROUP BY reading_date
+ORDER BY reading_date DESC
+"""
+
 # BP HR Query
 
 BP_HR_QUERY = """
@@ -71,3 +89,37 @@ WHERE
         AND tstamp >= NOW() - INTERVAL %s MONTH
 ORDER BY tstamp DESC;
 """
+
+# Vital chart queries, points as (epoch seconds, values...) tuples
+
+CHART_BP_HR_QUERY = """
+SELECT 
+    TIMESTAMPDIFF(SECOND, '1970-01-01', COALESCE(mv.bp_taken_date, mv.tstamp)) AS epoch_seconds,
+    CAST(NULLIF(mv.am_systolic_top, '') AS DECIMAL(6,1)) AS am_systolic,
+    CAST(NULLIF(mv.am_diastolic_bottom, '') AS DECIMAL(6,1)) AS am_diastolic,
+    CAST(NULLIF(mv.pm_systolic_top, '') AS DECIMAL(6,1)) AS pm_systolic,
+    CAST(NULLIF(mv.pm_diastolic_bottom, '') AS DECIMAL(6,1)) AS pm_diastolic,
+    CAST(NULLIF(mv.heart_rate, '') AS DECIMAL(6,1)) AS heart_rate
+FROM
+    mi_vitals mv
+        JOIN
+    mi_symptoms ms ON mv.tstamp = ms.enter_date
+WHERE
+    mv.patient_id = %s
+        AND ms.survey_type = 'Vital Signs'
+        AND (mv.bp_report = 'yes'
+        OR mv.hr_report = 'yes')
+        AND tstamp >= NOW() - INTERVAL %s MONTH
+"""
+
+CHART_WEIGHT_QUERY = """
+SELECT 
+    TIMESTAMPDIFF(SECOND, '1970-01-01', COALESCE(mv.weight_taken_date, mv.tstamp)) AS epoch_seconds,
+    CAST(NULLIF(mv.weight_pounds, '') AS DECIMAL(6,1)) AS weight_pounds
+FROM
+    mi_vitals mv
+WHERE
+    mv.patient_id = %s
+        AND mv.weight_report = 'yes'
+        AND tstamp >= NOW() - INTERVAL %s MONTH
+"""
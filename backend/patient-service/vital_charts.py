@@ -0,0 +1,188 @@
+import os
+from http import HTTPStatus
+
+import numpy as np
+from rm_vitals import PA_TO_MMHG, utc_offsets
+from shared import read_query
+from sqls.vital import CHART_BP_HR_QUERY, CHART_WEIGHT_QUERY, RM_VALES_QUERY
+
+default_max_points = int(os.getenv("CHART_MAX_POINTS", "500"))
+
+CHART_BUCKETS = ("day", "week")
+CHART_AGGREGATES = ("min", "max", "mean", "last")
+CHART_PARAMS = ("bucket", "aggregate", "max_points")
+MIN_CHART_POINTS = 3
+MAX_CHART_POINTS = 2000
+SECONDS_PER_DAY = 86400
+
+
+def is_chart_request(query_params):
+    """
+    Returns True if any chart aggregation parameter is passed
+    """
+    return any(query_params.get(name) for name in CHART_PARAMS)
+
+
+def get_chart_params(query_params):
+    """
+    Validates the chart aggregation parameters.
+    Returns (params, None) or (None, error message)
+    """
+    bucket = query_params.get("bucket") or None
+    aggregate = query_params.get("aggregate") or "mean"
+    if bucket and bucket not in CHART_BUCKETS:
+        return None, f"bucket must be one of {', '.join(CHART_BUCKETS)}"
+    if aggregate not in CHART_AGGREGATES:
+        return None, f"aggregate must be one of {', '.join(CHART_AGGREGATES)}"
+    try:
+        max_points = int(query_params.get("max_points") or default_max_points)
+    except ValueError:
+        return None, "max_points must be a number"
+    if not MIN_CHART_POINTS <= max_points <= MAX_CHART_POINTS:
+        return None, (
+            f"max_points must be between {MIN_CHART_POINTS} and {MAX_CHART_POINTS}"
+        )
+    return {"bucket": bucket, "aggregate": aggregate, "max_points": max_points}, None
+
+
+def aggregate_buckets(times, values, bucket, aggregate, tzinfo):
+    """
+    Aggregates the time sorted points per local day or week (starting Monday).
+    Every bucket is reported at the UTC instant its local day or week starts
+    """
+    offsets = utc_offsets(times.astype("datetime64[s]"), tzinfo)
+    keys = (times + offsets) // SECONDS_PER_DAY
+    if bucket == "week":
+        # 1970-01-01 was a Thursday
+        keys -= (keys + 3) % 7
+    order = np.argsort(keys, kind="stable")
+    keys, values, offsets = keys[order], values[order], offsets[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    if aggregate == "min":
+        aggregated = np.minimum.reduceat(values, starts)
+    elif aggregate == "max":
+        aggregated = np.maximum.reduceat(values, starts)
+    elif aggregate == "mean":
+        aggregated = np.add.reduceat(values, starts) / (ends - starts)
+    else:
+        aggregated = values[ends - 1]
+    return keys[starts] * SECONDS_PER_DAY - offsets[starts], aggregated
+
+
+def lttb(times, values, max_points):
+    """
+    Largest Triangle Three Buckets downsampling of a time sorted line.
+    Keeps the first and last point and from every bucket in between the point
+    forming the largest triangle with the previous pick and the next bucket mean
+    """
+    count = len(times)
+    if count <= max_points:
+        return times, values
+    x = times.astype(np.float64)
+    edges = np.linspace(1, count - 1, max_points - 1).astype(np.int64)
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0], picked[-1] = 0, count - 1
+    previous = 0
+    for index in range(max_points - 2):
+        start, end = edges[index], edges[index + 1]
+        if index + 2 < len(edges):
+            next_x = x[end : edges[index + 2]].mean()
+            next_y = values[end : edges[index + 2]].mean()
+        else:
+            next_x, next_y = x[-1], values[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (values[start:end] - values[previous])
+            - (x[previous] - x[start:end]) * (next_y - values[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        picked[index + 1] = previous
+    return times[picked], values[picked]
+
+
+def build_series(times, values, params, tzinfo):
+    """
+    Returns the [epoch ms, value] points of a series,
+    bucketed when requested and downsampled to max_points
+    """
+    present = ~np.isnan(values)
+    times, values = times[present], values[present]
+    order = np.argsort(times, kind="stable")
+    times, values = times[order], values[order]
+    if params["bucket"] and len(times):
+        times, values = aggregate_buckets(
+            times, values, params["bucket"], params["aggregate"], tzinfo
+        )
+    times, values = lttb(times, values, params["max_points"])
+    return [
+        [time_ms, value]
+        for time_ms, value in zip(
+            (times * 1000).tolist(), np.round(values, 1).tolist()
+        )
+    ]
+
+
+def _columns(rows, count):
+    """
+    Splits tuples into an epoch seconds array and count float value arrays
+    """
+    columns = list(zip(*rows)) if rows else [()] * (count + 1)
+    return np.array(columns[0], dtype=np.int64), [
+        np.array(column, dtype=np.float64) for column in columns[1:]
+    ]
+
+
+def get_raw_series(cnx, patient_id, duration, v_type):
+    """
+    Returns series name -> (epoch seconds, values) of the manually reported
+    and the remote device vitals, Manual/Remote limit the sources
+    """
+    series = {}
+
+    def add(name, times, values):
+        current_times, current_values = series.get(
+            name, (np.empty(0, dtype=np.int64), np.empty(0))
+        )
+        series[name] = (
+            np.concatenate((current_times, times)),
+            np.concatenate((current_values, values)),
+        )
+
+    if v_type != "Remote":
+        times, (am_sys, am_dia, pm_sys, pm_dia, heart_rate) = _columns(
+            read_query(cnx, CHART_BP_HR_QUERY, (patient_id, duration)), 5
+        )
+        # a manual report may hold an AM and a PM blood pressure
+        both_times = np.concatenate((times, times))
+        add("systolic", both_times, np.concatenate((am_sys, pm_sys)))
+        add("diastolic", both_times, np.concatenate((am_dia, pm_dia)))
+        add("pulse", times, heart_rate)
+        times, (weight,) = _columns(
+            read_query(cnx, CHART_WEIGHT_QUERY, (patient_id, duration)), 1
+        )
+        add("weight", times, weight)
+    if v_type != "Manual":
+        rows = read_query(cnx, RM_VALES_QUERY, (patient_id, duration)) or []
+        times, (systolic, diastolic, pulse, _) = _columns(
+            [row[-1:] + row[1:5] for row in rows], 4
+        )
+        add("systolic", times, systolic * PA_TO_MMHG)
+        add("diastolic", times, diastolic * PA_TO_MMHG)
+        add("pulse", times, pulse)
+    return series
+
+
+def get_vital_chart(cnx, patient_id, duration, v_type, params, tzinfo):
+    """
+    Returns the chart series of the vitals of the patient.
+    The response size is bounded by max_points per series,
+    not by the length of the history
+    """
+    series = get_raw_series(cnx, patient_id, duration, v_type)
+    return HTTPStatus.OK, {
+        **params,
+        "series": {
+            name: build_series(times, values, params, tzinfo)
+            for name, (times, values) in series.items()
+        },
+    }
@@ -3,15 +3,18 @@ import logging
 from datetime import datetime, timedelta
 
 import boto3
+from billing_records import get_charge_codes
 from custom_exception import GeneralException
+from instrumentation import instrument_handler
+from rm_report_engine import get_call_periods
 from shared import (
     get_db_connect,
     get_headers,
     get_logged_in_user,
     get_phi_data,
     read_as_dict,
-    utc_to_cst,
 )
+from sqls.remote_monitoring import GET_CALL_TOTALS_OF_PATIENT_AND_PROVIDERS
 
 cnx = get_db_connect()
 logger = logging.getLogger(__name__)
@@ -100,8 +103,7 @@ def get_billing_date_of_service(patient_id):
     result = read_as_dict(cnx, query, (patient_id))
     try:
         for record in result:
-            billing_charge_code_list = json.loads((str(record["billing_charge_code"])))
-            if "99453" in [obj["code"] for obj in billing_charge_code_list]:
+            if "99453" in get_charge_codes(record["billing_charge_code"]):
                 return record["date_of_service"], record["provider_name"]
             return None, None
         return None, None
@@ -114,31 +116,20 @@ def get_billing_date_of_service(patient_id):
 def get_duration_between_date(pat_int_id, prv_int_ids, start_dt, end_dt):
     """
     Returns dict with the total call duration for each month between
-    the input start and end date for the selected patient and providers
+    the input start and end date for the selected patient and providers,
+    read from the monthly call totals
     """
-    f_str = ",".join(["%s"] * len(prv_int_ids))
     call_records = {}
-    query = """ SELECT call_logs.id,
-                       call_logs.start_timestamp,
-                       call_logs.duration
-                FROM   call_logs
-                WHERE  call_logs.patient_internal_id = %s
-                       AND call_logs.provider_internal_id IN ({f_str})
-                       AND call_logs.start_timestamp >= %s
-                       AND call_logs.start_timestamp <= %s
-            """.format(
-        f_str=f_str
-    )
-    result = read_as_dict(
-        cnx, query, ((pat_int_id,) + tuple(prv_int_ids) + (start_dt, end_dt))
-    )
-    for call in result:
-        st_timestamp = utc_to_cst(call["start_timestamp"])
-        month = st_timestamp.month
-        if month in call_records:
-            call_records[month] += call["duration"]
-        else:
-            call_records[month] = call["duration"]
+    if not prv_int_ids:
+        return call_records
+    params = {
+        "patient_id": pat_int_id,
+        "provider_ids": tuple(prv_int_ids),
+        **get_call_periods(start_dt, end_dt),
+    }
+    result = read_as_dict(cnx, GET_CALL_TOTALS_OF_PATIENT_AND_PROVIDERS, params)
+    for call in result or []:
+        call_records[call["period"].month] = int(call["duration"])
     logger.info(call_records)
     return call_records
 
@@ -161,14 +152,13 @@ def get_billing_detail(pat_int_id, start_dt, end_dt):
     final_result = []
     try:
         for record in result:
-            billing_charge_code_list = json.loads(str(record["billing_charge_code"]))
             billing_charge_code_ids = [
                 {
-                    "billing_charge_code": obj["code"],
+                    "billing_charge_code": code,
                     "date_of_service": record["date_of_service"],
                     "provider_name": record["provider_name"],
                 }
-                for obj in billing_charge_code_list
+                for code in get_charge_codes(record["billing_charge_code"])
             ]
             final_result.extend(billing_charge_code_ids)
     except GeneralException as e:
@@ -181,7 +171,7 @@ def get_device_reading_within_timestamp(pat_int_id, start_dt, end_dt):
     Returns count of distinct readings reported between the input time range
     """
     query = """ SELECT count(distinct(reading_date))
-                    FROM device_pairing_view WHERE
+                    FROM device_reading_daily WHERE
                     reading_date >= %s AND reading_date <= %s AND
                     patient_internal_id= %s """
     record = (str(start_dt.date()), str(end_dt.date()), pat_int_id)
@@ -363,6 +353,7 @@ def get_remote_monitoring_report_for_single_provider(org_id, provider_id):
     return result
 
 
+@instrument_handler
 def lambda_handler(event, context):
     """
     The api will handle Get Network for providers and caregivers.
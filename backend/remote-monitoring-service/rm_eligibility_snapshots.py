@@ -0,0 +1,261 @@
+import calendar
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+import boto3
+import pymysql
+from custom_exception import GeneralException
+from rm_report_engine import (
+    DATE_FORMAT,
+    get_patient_records_by_provider,
+    get_physician_with_rm_enabled,
+    load_report_dataset,
+)
+from shared import get_reusable_connection, read_as_dict, transaction, utc_to_cst
+from sqls.remote_monitoring import (
+    DELETE_RPM_ELIGIBILITY_SNAPSHOT_OF_PATIENT,
+    DELETE_RPM_ELIGIBILITY_SNAPSHOTS,
+    GET_ORGS_WITH_RM_ENABLED,
+    GET_RPM_ELIGIBILITY_SNAPSHOTS,
+    UPSERT_RPM_ELIGIBILITY_SNAPSHOT,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+dynamodb = boto3.resource("dynamodb")
+
+# Number of billing periods refreshed by the scheduled job,
+# the current month and the previous ones
+snapshot_periods = int(os.getenv("RPM_SNAPSHOT_PERIODS", "2"))
+
+
+def get_billing_period(period=None):
+    """
+    Returns the (start, end) report dates of the billing period.
+    A billing period is a calendar month, period is "YYYY-MM"
+    and defaults to the current month
+    """
+    if period:
+        period_start = datetime.strptime(period, "%Y-%m").date()
+    else:
+        period_start = utc_to_cst(datetime.utcnow()).date().replace(day=1)
+    last_day = calendar.monthrange(period_start.year, period_start.month)[1]
+    start_date = datetime.combine(period_start, datetime.min.time())
+    end_date = datetime.combine(
+        period_start.replace(day=last_day), datetime.max.time()
+    ).replace(microsecond=0)
+    return start_date.strftime(DATE_FORMAT), end_date.strftime(DATE_FORMAT)
+
+
+def get_previous_periods(count, today=None):
+    """
+    Returns the last count billing periods as "YYYY-MM", current month first
+    """
+    period_start = (today or utc_to_cst(datetime.utcnow()).date()).replace(day=1)
+    periods = []
+    for _ in range(count):
+        periods.append(period_start.strftime("%Y-%m"))
+        period_start = (period_start - timedelta(days=1)).replace(day=1)
+    return periods
+
+
+def get_eligibility_summary(record, start_date, end_date):
+    """
+    Returns the eligibility columns of a patient record for the billing period:
+    days recorded in the last RPM window starting in the period,
+    minutes of interactive communication in the period month,
+    last 99453 date of service and start of the next RPM window
+    """
+    period_start = datetime.strptime(start_date, DATE_FORMAT)
+    period_end = datetime.strptime(end_date, DATE_FORMAT)
+    windows = [
+        window
+        for window in record["days_recording"]
+        if window["start_date"] <= period_end
+    ]
+    last_window = windows[-1] if windows else None
+    call_seconds = record["call_records"].get(period_start.month, 0)
+    return {
+        "days_recorded": last_window["number_of_days"] if last_window else 0,
+        "interactive_minutes": round(call_seconds / 60, 2),
+        "last_99453_date": record["date_of_service_99453"],
+        "next_window_start": last_window["end_date"] + timedelta(days=1)
+        if last_window
+        else None,
+    }
+
+
+def get_snapshot_params(org_id, provider_internal_id, record, start_date, end_date):
+    """
+    Returns the snapshot row of a patient record.
+    The record is stored as serialized by the report api
+    """
+    params = get_eligibility_summary(record, start_date, end_date)
+    params.update(
+        {
+            "org_id": org_id,
+            "period_start": start_date[:10],
+            "patient_internal_id": record["patient_internal_id"],
+            "provider_internal_id": provider_internal_id,
+            "record": json.dumps(record, default=str),
+            "refreshed_on": datetime.utcnow(),
+        }
+    )
+    return params
+
+
+def refresh_org_snapshots(cnx, org_id, period=None):
+    """
+    This function recomputes the eligibility snapshots of all patients
+    of the org for the billing period and replaces the stored ones
+    in a single transaction
+    """
+    start_date, end_date = get_billing_period(period)
+    providers = get_physician_with_rm_enabled(cnx, org_id) or []
+    dataset = load_report_dataset(
+        cnx, dynamodb, org_id, providers, start_date, end_date
+    )
+    records_by_provider = get_patient_records_by_provider(
+        dataset, start_date, end_date, dedupe=False
+    )
+    params = [
+        get_snapshot_params(org_id, provider_id, record, start_date, end_date)
+        for provider_id, records in records_by_provider.items()
+        for record in records
+    ]
+    with transaction(cnx) as cursor:
+        cursor.execute(
+            DELETE_RPM_ELIGIBILITY_SNAPSHOTS,
+            {"org_id": org_id, "period_start": start_date[:10]},
+        )
+        if params:
+            cursor.executemany(UPSERT_RPM_ELIGIBILITY_SNAPSHOT, params)
+    return len({param["patient_internal_id"] for param in params})
+
+
+def refresh_patient_snapshot(cnx, org_id, patient_internal_id, period=None):
+    """
+    Recomputes the eligibility snapshots of a single patient of the org
+    for the billing period. The snapshots are removed if the patient
+    is no longer part of the report
+    """
+    start_date, end_date = get_billing_period(period)
+    providers = get_physician_with_rm_enabled(cnx, org_id) or []
+    dataset = load_report_dataset(
+        cnx,
+        dynamodb,
+        org_id,
+        providers,
+        start_date,
+        end_date,
+        patient_internal_ids={int(patient_internal_id)},
+    )
+    records_by_provider = get_patient_records_by_provider(
+        dataset, start_date, end_date, dedupe=False
+    )
+    params = [
+        get_snapshot_params(org_id, provider_id, record, start_date, end_date)
+        for provider_id, records in records_by_provider.items()
+        for record in records
+    ]
+    with transaction(cnx) as cursor:
+        cursor.execute(
+            DELETE_RPM_ELIGIBILITY_SNAPSHOT_OF_PATIENT,
+            {
+                "org_id": org_id,
+                "period_start": start_date[:10],
+                "patient_internal_id": patient_internal_id,
+            },
+        )
+        if params:
+            cursor.executemany(UPSERT_RPM_ELIGIBILITY_SNAPSHOT, params)
+    return bool(params)
+
+
+def get_snapshot_records(cnx, org_id, period=None, provider_internal_id=None):
+    """
+    Returns the stored patient records of the org for the billing period
+    and the oldest refresh time, optionally only for the input provider.
+    Every patient is reported once for the org.
+    Returns (None, None) if the period was never materialized
+    """
+    start_date, _ = get_billing_period(period)
+    rows = read_as_dict(
+        cnx,
+        GET_RPM_ELIGIBILITY_SNAPSHOTS,
+        {"org_id": org_id, "period_start": start_date[:10]},
+    )
+    if not rows:
+        return None, None
+    if provider_internal_id is not None:
+        rows = [
+            row
+            for row in rows
+            if int(row["provider_internal_id"]) == int(provider_internal_id)
+        ]
+    records = {}
+    for row in rows:
+        record = json.loads(row["record"])
+        records.setdefault(record["patient_internal_id"], record)
+    refreshed_on = min((row["refreshed_on"] for row in rows), default=None)
+    return list(records.values()), refreshed_on
+
+
+def run_snapshot_job(cnx, org_ids=None, periods=None):
+    """
+    This function refreshes the eligibility snapshots of the input orgs,
+    all orgs with remote monitoring physicians by default,
+    for the input billing periods, the last snapshot_periods by default.
+    An org and period that fails is logged and reported in "failures",
+    the other orgs are still refreshed
+    """
+    if not org_ids:
+        rows = read_as_dict(cnx, GET_ORGS_WITH_RM_ENABLED) or []
+        org_ids = [row["org_id"] for row in rows]
+    periods = periods or get_previous_periods(snapshot_periods)
+    patients = 0
+    failures = []
+    for org_id in org_ids:
+        for period in periods:
+            try:
+                patients += refresh_org_snapshots(cnx, org_id, period)
+            except (pymysql.MySQLError, GeneralException) as err:
+                logger.exception(
+                    "Eligibility snapshot of org %s for %s failed", org_id, period
+                )
+                failures.append({"org_id": org_id, "period": period, "error": str(err)})
+    logger.info(
+        "Refreshed %s eligibility snapshots of %s orgs, %s failed",
+        patients,
+        len(org_ids),
+        len(failures),
+    )
+    return {
+        "orgs": len(org_ids),
+        "periods": periods,
+        "patients": patients,
+        "failures": failures,
+    }
+
+
+def lambda_handler(event, context):
+    """
+    Scheduled task to materialize the RPM billing eligibility snapshots.
+    The event can carry "org_ids" and "periods" (YYYY-MM)
+    """
+    event = event or {}
+    try:
+        result = run_snapshot_job(
+            get_reusable_connection(),
+            org_ids=event.get("org_ids"),
+            periods=event.get("periods"),
+        )
+        return {"statusCode": 200, "body": json.dumps(result)}
+    except ValueError as err:
+        logger.error(err)
+        return {"statusCode": 400, "body": json.dumps("Invalid billing period")}
+    except (pymysql.MySQLError, GeneralException) as err:
+        logger.exception(err)
+        return {"statusCode": 500, "body": json.dumps(str(err))}
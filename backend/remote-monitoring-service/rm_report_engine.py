@@ -0,0 +1,378 @@
+import logging
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from billing_records import get_billing_of_patients
+from call_records import get_call_period
+from custom_exception import GeneralException
+from shared import chunks, get_phi_data_list, read_as_dict
+from sqls.remote_monitoring import (
+    GET_CALL_TOTALS_OF_PATIENTS,
+    GET_CONNECTED_PROVIDERS_WITH_PATIENTS,
+    GET_DEVICE_DETAILS_OF_PATIENTS,
+    GET_PATIENTS_OF_PROVIDERS,
+    GET_PHYSICIAN_WITH_RM_ENABLED,
+    GET_READING_DATES_OF_PATIENTS,
+)
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+RPM_WINDOW_DAYS = 30
+IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def read_for_ids(cnx, query, key, ids, params=None):
+    """
+    Runs the input query for the ids in chunks of IN_CLAUSE_CHUNK_SIZE
+    and returns all the rows
+    """
+    rows = []
+    for id_chunk in chunks(list(ids), IN_CLAUSE_CHUNK_SIZE):
+        query_params = dict(params or {})
+        query_params[key] = tuple(id_chunk)
+        rows.extend(read_as_dict(cnx, query, query_params) or [])
+    return rows
+
+
+def group_by(rows, key):
+    """
+    Groups the rows in a dict of row[key] -> list of rows keeping the row order
+    """
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[key]].append(row)
+    return grouped
+
+
+def get_physician_with_rm_enabled(cnx, org_id, provider_id=None):
+    """Get Physicians with remote monitoring enabled"""
+    query = GET_PHYSICIAN_WITH_RM_ENABLED
+    if provider_id:
+        query = query + " AND providers.internal_id = %(provider_id)s"
+    return read_as_dict(cnx, query, {"org_id": org_id, "provider_id": provider_id})
+
+
+@dataclass
+class ReportDataset:
+    """
+    Every dataset the remote monitoring report needs
+    for all patients of the report, keyed by patient
+    """
+
+    providers: list
+    patients: dict = field(default_factory=dict)
+    devices: dict = field(default_factory=dict)
+    connected_providers: dict = field(default_factory=dict)
+    billing: dict = field(default_factory=dict)
+    calls: dict = field(default_factory=dict)
+    reading_dates: dict = field(default_factory=dict)
+    phi: dict = field(default_factory=dict)
+
+    def date_of_service_code_nine_four(self, patient_internal_id, start_dt, end_dt):
+        """
+        Returns the latest approved 99454 date of service between the input dates
+        """
+        for record in self.billing.get(patient_internal_id, []):
+            if start_dt <= record["date_of_service"] <= end_dt:
+                if "99454" in record["codes"]:
+                    return record["date_of_service"]
+        return None
+
+    def date_of_service_code_nine_three(self, patient_internal_id):
+        """
+        Returns the date of service and the provider name
+        of the latest approved 99453 bill
+        """
+        for record in self.billing.get(patient_internal_id, []):
+            if "99453" in record["codes"]:
+                return record["date_of_service"], record["provider_name"]
+        return None, None
+
+    def reading_count(self, patient_internal_id, start_dt, end_dt):
+        """
+        Returns the number of distinct days with device readings between the input dates
+        """
+        dates = self.reading_dates.get(patient_internal_id, [])
+        return bisect_right(dates, str(end_dt.date())) - bisect_left(
+            dates, str(start_dt.date())
+        )
+
+
+def get_report_patients(cnx, providers):
+    """
+    Returns the (provider_internal_id, patient) rows of all patients
+    with remote monitoring in the network of the input providers
+    """
+    provider_ids = [provider["internal_id"] for provider in providers]
+    if not provider_ids:
+        return []
+    return read_for_ids(cnx, GET_PATIENTS_OF_PROVIDERS, "provider_ids", provider_ids)
+
+
+def load_report_dataset(
+    cnx,
+    dynamodb,
+    org_id,
+    providers,
+    start_dt,
+    end_dt,
+    patient_internal_ids=None,
+    patient_rows=None,
+):
+    """
+    This function loads the report datasets for all patients
+    in the network of the input providers with one set based query per dataset:
+    patients, device pairing, connected providers, approved billing,
+    call logs and device reading days from the daily rollup.
+    PHI is fetched with batch gets.
+    patient_internal_ids restricts the report to the input patients,
+    patient_rows skips the patients query for an already loaded batch
+    """
+    dataset = ReportDataset(providers=providers)
+    if patient_rows is None:
+        patient_rows = get_report_patients(cnx, providers)
+    if patient_internal_ids is not None:
+        patient_rows = [
+            pat for pat in patient_rows if pat["internal_id"] in patient_internal_ids
+        ]
+    dataset.patients = group_by(patient_rows, "provider_internal_id")
+    internal_ids = list({pat["internal_id"] for pat in patient_rows})
+    patient_ids = list({pat["id"] for pat in patient_rows})
+    if not internal_ids:
+        return dataset
+
+    dataset.devices = group_by(
+        read_for_ids(
+            cnx, GET_DEVICE_DETAILS_OF_PATIENTS, "patient_ids", internal_ids
+        ),
+        "patient_internal_id",
+    )
+    dataset.connected_providers = group_by(
+        read_for_ids(
+            cnx,
+            GET_CONNECTED_PROVIDERS_WITH_PATIENTS,
+            "patient_ids",
+            patient_ids,
+            {"org_id": org_id},
+        ),
+        "patient_id",
+    )
+    dataset.billing = get_billing_of_patients(cnx, internal_ids)
+    for records in dataset.billing.values():
+        for record in records:
+            record["codes"] = [
+                charge["code"] for charge in record["billing_charge_code"]
+            ]
+    dataset.calls = group_by(
+        read_for_ids(
+            cnx,
+            GET_CALL_TOTALS_OF_PATIENTS,
+            "patient_ids",
+            internal_ids,
+            get_call_periods(start_dt, end_dt),
+        ),
+        "patient_internal_id",
+    )
+    # RPM windows can start up to one window before the report start date
+    # and end up to one window after the report end date
+    margin = timedelta(days=RPM_WINDOW_DAYS + 2)
+    reading_rows = read_for_ids(
+        cnx,
+        GET_READING_DATES_OF_PATIENTS,
+        "patient_ids",
+        internal_ids,
+        {
+            "start_dt": str((datetime.strptime(start_dt, DATE_FORMAT) - margin).date()),
+            "end_dt": str((datetime.strptime(end_dt, DATE_FORMAT) + margin).date()),
+        },
+    )
+    reading_dates = defaultdict(set)
+    for row in reading_rows:
+        reading_dates[row["patient_internal_id"]].add(str(row["reading_date"]))
+    dataset.reading_dates = {
+        patient_id: sorted(dates) for patient_id, dates in reading_dates.items()
+    }
+    external_ids = list({pat["external_id"] for pat in patient_rows})
+    dataset.phi = get_phi_data_list(external_ids, dynamodb)
+    return dataset
+
+
+def get_call_periods(start_dt, end_dt):
+    """
+    Returns the first and last month (CST) of the monthly call totals
+    covering the report dates
+    """
+    return {
+        "start_period": get_call_period(datetime.strptime(start_dt, DATE_FORMAT)),
+        "end_period": get_call_period(datetime.strptime(end_dt, DATE_FORMAT)),
+    }
+
+
+def get_call_duration(dataset: ReportDataset, patient_internal_id, provider_ids):
+    """
+    Returns the total call duration per month (CST) of the calls
+    between the patient and the input providers
+    """
+    call_records = {}
+    for call in dataset.calls.get(patient_internal_id, []):
+        if int(call["provider_internal_id"]) not in provider_ids:
+            continue
+        month = call["period"].month
+        call_records[month] = call_records.get(month, 0) + int(call["duration"])
+    return call_records
+
+
+def get_billing_detail(dataset: ReportDataset, patient_internal_id, start_dt, end_dt):
+    """
+    Returns one entry per charge code of the approved bills of the patient
+    between the input dates
+    """
+    start = datetime.strptime(start_dt, DATE_FORMAT)
+    end = datetime.strptime(end_dt, DATE_FORMAT)
+    final_result = []
+    for record in dataset.billing.get(patient_internal_id, []):
+        if not start <= record["date_of_service"] <= end:
+            continue
+        date_of_service = record["date_of_service"].strftime("%a, %d %b %Y %H:%M:%S")
+        final_result.extend(
+            {
+                "billing_charge_code": code,
+                "date_of_service": date_of_service,
+                "provider_name": record["provider_name"],
+            }
+            for code in record["codes"]
+        )
+    return final_result
+
+
+def get_days_of_records(
+    dataset: ReportDataset, patient_internal_id, start_date, end_date, device
+):
+    """
+    Returns the 30 day RPM windows of the device pairing overlapping the input
+    date range with the number of days with readings in each window.
+    A window is re-anchored on the 99454 date of service billed inside it
+    """
+    final_result = []
+    date_of_pairing = device["start_date"]
+    if date_of_pairing is None:
+        return []
+    start_date1 = datetime.strptime(start_date, DATE_FORMAT)
+    end_date1 = datetime.strptime(end_date, DATE_FORMAT)
+    if start_date1 > date_of_pairing:
+        # case 1: device paired before the report start date
+        while True:
+            record_ = {"start_date": date_of_pairing}
+            date_of_pairing += timedelta(days=RPM_WINDOW_DAYS)
+            record_["end_date"] = date_of_pairing
+            if start_date1.date() <= date_of_pairing.date():
+                date_of_service_code_nine_four = (
+                    dataset.date_of_service_code_nine_four(
+                        patient_internal_id, record_["start_date"], record_["end_date"]
+                    )
+                )
+                if date_of_service_code_nine_four:
+                    record_["start_date"] = date_of_service_code_nine_four
+                    record_["end_date"] = date_of_service_code_nine_four + timedelta(
+                        days=RPM_WINDOW_DAYS
+                    )
+                    date_of_pairing = record_["end_date"]
+                date_of_pairing += timedelta(days=1)
+                record_["number_of_days"] = dataset.reading_count(
+                    patient_internal_id, record_["start_date"], record_["end_date"]
+                )
+                final_result.append(record_)
+            if date_of_pairing.date() > end_date1.date():
+                break
+    else:
+        # case 2: device paired within the report date range
+        while True:
+            date_of_pairing += timedelta(days=1)
+            record_ = {"start_date": date_of_pairing}
+            date_of_pairing += timedelta(days=RPM_WINDOW_DAYS)
+            record_["end_date"] = date_of_pairing
+            record_["number_of_days"] = dataset.reading_count(
+                patient_internal_id, record_["start_date"], record_["end_date"]
+            )
+            final_result.append(record_)
+            if date_of_pairing.date() > end_date1.date():
+                break
+    return final_result
+
+
+def build_patient_record(dataset: ReportDataset, pat, start_dt, end_dt):
+    """
+    Builds the report record of a patient from the loaded datasets.
+    Returns None if the patient has no paired device, raises if the PHI
+    of the patient could not be read rather than leaving them out of the report
+    """
+    patient_internal_id = pat["internal_id"]
+    device_details = [
+        {"imei": d["imei"], "start_date": d["start_date"], "end_date": d["end_date"]}
+        for d in dataset.devices.get(patient_internal_id, [])
+    ]
+    if not device_details:
+        return None
+    phi_data = dataset.phi.get(pat["external_id"])
+    if not phi_data:
+        logger.error("PHI not found for patient %s", patient_internal_id)
+        raise GeneralException("PHI not found for patient")
+    connected_prvs = dataset.connected_providers.get(pat["id"], [])
+    physician_names = [
+        x["name"]
+        for x in connected_prvs
+        if x["remote_monitoring"] == "Y" and x["role"] == "physician"
+    ]
+    rm_prv_ids = {
+        int(x["internal_id"]) for x in connected_prvs if x["remote_monitoring"] == "Y"
+    }
+    date_of_service_99453, creator_of_99453 = dataset.date_of_service_code_nine_three(
+        patient_internal_id
+    )
+    return {
+        "all_provider_name": ",".join(physician_names),
+        "patient_name": phi_data["first_name"] + " " + phi_data["last_name"],
+        "patient_first_name": phi_data["first_name"],
+        "patient_last_name": phi_data["last_name"],
+        "patient_internal_id": patient_internal_id,
+        "date_of_service_99453": date_of_service_99453,
+        "creator_of_99453": creator_of_99453,
+        "remote_monitoring": pat["remote_monitoring"],
+        "paired_device_details": device_details,
+        "call_records": get_call_duration(dataset, patient_internal_id, rm_prv_ids),
+        "billing_details": get_billing_detail(
+            dataset, patient_internal_id, start_dt, end_dt
+        ),
+        # Only the first paired device is used for the RPM windows
+        "days_recording": get_days_of_records(
+            dataset, patient_internal_id, start_dt, end_dt, device_details[0]
+        ),
+    }
+
+
+def get_patient_records_by_provider(
+    dataset: ReportDataset, start_dt, end_dt, dedupe=True
+):
+    """
+    Returns a dict of provider internal_id -> list of patient records.
+    A patient in the network of several providers is only reported
+    under the first provider unless dedupe is False
+    """
+    built = {}
+    result = {}
+    for provider in dataset.providers:
+        records = []
+        for pat in dataset.patients.get(provider["internal_id"], []):
+            if pat["internal_id"] in built:
+                if not dedupe and built[pat["internal_id"]]:
+                    records.append(built[pat["internal_id"]])
+                continue
+            record = build_patient_record(dataset, pat, start_dt, end_dt)
+            built[pat["internal_id"]] = record
+            if record:
+                records.append(record)
+        result[provider["internal_id"]] = records
+    return result
@@ -0,0 +1,310 @@
+import csv
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+
+import boto3
+import pymysql
+from botocore.exceptions import ClientError
+from custom_exception import GeneralException
+from rm_report_engine import (
+    get_patient_records_by_provider,
+    get_physician_with_rm_enabled,
+    get_report_patients,
+    load_report_dataset,
+)
+from s3_upload import S3MultipartWriter
+from shared import chunks, get_reusable_connection, transaction
+from sqls.remote_monitoring import (
+    CLAIM_REPORT_EXPORT,
+    INSERT_REPORT_EXPORT,
+    UPDATE_REPORT_EXPORT_PROGRESS,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+aws_region = os.getenv("AWSREGION")
+export_bucket = os.getenv("EXPORT_BUCKET_NAME")
+export_function_name = os.getenv("EXPORT_FUNCTION_NAME")
+export_batch_size = int(os.getenv("EXPORT_BATCH_SIZE", "200"))
+presigned_url_expiry = int(os.getenv("EXPORT_URL_EXPIRY", "900"))
+
+dynamodb = boto3.resource("dynamodb")
+s3_client = boto3.client("s3", region_name=aws_region)
+lambda_client = boto3.client("lambda", region_name=aws_region)
+
+# stop and fail the export when less time than this is left, a timed out
+# invocation could not record its failure
+MIN_REMAINING_MILLIS = 60000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+CSV_COLUMNS = [
+    "patient_internal_id",
+    "patient_name",
+    "all_provider_name",
+    "remote_monitoring",
+    "imei",
+    "date_of_service_99453",
+    "creator_of_99453",
+    "window_start_date",
+    "window_end_date",
+    "number_of_days",
+    "billing_charge_codes",
+    "call_duration",
+]
+
+
+def iter_patient_batches(cnx, org_id, providers, start_date, end_date):
+    """
+    Yields (patients_total, patients in batch, list of patient records)
+    per batch of export_batch_size patients.
+    Only the datasets of one batch are loaded at a time.
+    A patient in the network of several providers is only reported
+    under the first provider, the same way as in the report api
+    """
+    provider_order = {
+        provider["internal_id"]: index for index, provider in enumerate(providers)
+    }
+    patient_rows = sorted(
+        get_report_patients(cnx, providers),
+        key=lambda pat: provider_order[pat["provider_internal_id"]],
+    )
+    seen = set()
+    unique_rows = []
+    for pat in patient_rows:
+        if pat["internal_id"] not in seen:
+            seen.add(pat["internal_id"])
+            unique_rows.append(pat)
+    for batch in chunks(unique_rows, export_batch_size):
+        dataset = load_report_dataset(
+            cnx,
+            dynamodb,
+            org_id,
+            providers,
+            start_date,
+            end_date,
+            patient_rows=batch,
+        )
+        records_by_provider = get_patient_records_by_provider(
+            dataset, start_date, end_date
+        )
+        yield len(unique_rows), len(batch), [
+            record for records in records_by_provider.values() for record in records
+        ]
+
+
+def iter_csv_rows(record):
+    """
+    Yields one flat row per RPM window of the patient record
+    """
+    codes = ";".join(
+        detail["billing_charge_code"] for detail in record["billing_details"]
+    )
+    patient_columns = {
+        "patient_internal_id": record["patient_internal_id"],
+        "patient_name": record["patient_name"],
+        "all_provider_name": record["all_provider_name"],
+        "remote_monitoring": record["remote_monitoring"],
+        "imei": record["paired_device_details"][0]["imei"],
+        "date_of_service_99453": record["date_of_service_99453"] or "",
+        "creator_of_99453": record["creator_of_99453"] or "",
+        "billing_charge_codes": codes,
+        "call_duration": sum(record["call_records"].values()),
+    }
+    windows = record["days_recording"] or [{}]
+    for window in windows:
+        row = dict(patient_columns)
+        row["window_start_date"] = window.get("start_date", "")
+        row["window_end_date"] = window.get("end_date", "")
+        row["number_of_days"] = window.get("number_of_days", "")
+        yield row
+
+
+def encode_csv(records, write_header):
+    """
+    Returns the number of rows and the CSV bytes of the records
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    if write_header:
+        writer.writeheader()
+    rows = 0
+    for record in records:
+        for row in iter_csv_rows(record):
+            writer.writerow(row)
+            rows += 1
+    return rows, buffer.getvalue().encode()
+
+
+def encode_ndjson(records, write_header):
+    """
+    Returns the number of rows and the bytes of the records,
+    one json document per line
+    """
+    lines = [json.dumps(record, default=str) + "\n" for record in records]
+    return len(lines), "".join(lines).encode()
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson}
+
+
+def set_export_progress(cnx, export_id, status, progress, error=None):
+    """
+    Stores the status and progress counters of the export
+    """
+    with transaction(cnx) as cursor:
+        cursor.execute(
+            UPDATE_REPORT_EXPORT_PROGRESS,
+            {
+                "export_id": export_id,
+                "status": status,
+                "error": error,
+                "updated_on": datetime.utcnow(),
+                **progress,
+            },
+        )
+
+
+def claim_export(cnx, export_id):
+    """
+    Moves a queued export to running, returns False if it already ran
+    or is running, e.g. on an asynchronous invoke retry
+    """
+    with transaction(cnx) as cursor:
+        return bool(
+            cursor.execute(
+                CLAIM_REPORT_EXPORT,
+                {"export_id": export_id, "updated_on": datetime.utcnow()},
+            )
+        )
+
+
+def fail_export(cnx, export_id, writer, progress, err):
+    """
+    Aborts the multipart upload of the export and marks it failed
+    """
+    if writer:
+        try:
+            writer.abort()
+        except ClientError as abort_err:
+            logger.error(abort_err)
+    set_export_progress(cnx, export_id, "failed", progress, str(err))
+
+
+def run_export(cnx, export, context=None):
+    """
+    This function
+    1. Claims the queued export, an export that is not queued is skipped
+    2. Loads the report in batches of export_batch_size patients
+    3. Encodes every batch in the export format and streams it
+       to a S3 multipart upload
+    4. Records the progress after every batch so the client can poll it.
+       Any error marks the export failed
+    Returns the progress, None when the export was skipped
+    """
+    export_id = export["export_id"]
+    if not claim_export(cnx, export_id):
+        logger.info("Export %s is not queued, skipping", export_id)
+        return None
+    export_format = export["export_format"]
+    encoder = ENCODERS[export_format]
+    providers = (
+        get_physician_with_rm_enabled(
+            cnx, export["org_id"], export.get("provider_internal_id")
+        )
+        or []
+    )
+    progress = {"patients_total": 0, "patients_done": 0, "rows_written": 0}
+    writer = None
+    try:
+        writer = S3MultipartWriter(
+            s3_client, export_bucket, export["s3_key"], EXPORT_FORMATS[export_format]
+        )
+        for patients_total, patients_done, records in iter_patient_batches(
+            cnx, export["org_id"], providers, export["start_date"], export["end_date"]
+        ):
+            write_header = progress["patients_done"] == 0
+            rows, data = encoder(records, write_header)
+            writer.write(data)
+            progress["rows_written"] += rows
+            progress["patients_total"] = patients_total
+            progress["patients_done"] += patients_done
+            set_export_progress(cnx, export_id, "running", progress)
+            if (
+                context
+                and context.get_remaining_time_in_millis() < MIN_REMAINING_MILLIS
+            ):
+                raise GeneralException("Export ran out of time")
+        if export_format == "csv" and progress["patients_done"] == 0:
+            writer.write(",".join(CSV_COLUMNS).encode() + b"\r\n")
+        writer.complete()
+    except (pymysql.MySQLError, GeneralException, ClientError) as err:
+        logger.exception(err)
+        fail_export(cnx, export_id, writer, progress, err)
+        return progress
+    except Exception as err:
+        logger.exception(err)
+        fail_export(cnx, export_id, writer, progress, err)
+        raise
+    set_export_progress(cnx, export_id, "completed", progress)
+    return progress
+
+
+def start_export(
+    cnx, org_id, provider_id, requested_by, export_format, start_date, end_date
+):
+    """
+    Records a queued export and invokes the export lambda asynchronously.
+    Returns the export id the client polls
+    """
+    export_id = uuid.uuid4().hex
+    export = {
+        "export_id": export_id,
+        "org_id": org_id,
+        "provider_internal_id": provider_id,
+        "requested_by": requested_by,
+        "export_format": export_format,
+        "start_date": start_date,
+        "end_date": end_date,
+        "status": "queued",
+        "s3_key": f"rm-reports/{org_id}/{export_id}.{export_format}",
+        "created_on": datetime.utcnow(),
+    }
+    with transaction(cnx) as cursor:
+        cursor.execute(INSERT_REPORT_EXPORT, export)
+    lambda_client.invoke(
+        FunctionName=export_function_name,
+        InvocationType="Event",
+        Payload=json.dumps(export, default=str),
+    )
+    return export_id
+
+
+def get_export_url(s3_key):
+    """
+    Returns a presigned url to download the export
+    """
+    return s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": export_bucket, "Key": s3_key},
+        ExpiresIn=presigned_url_expiry,
+    )
+
+
+def lambda_handler(event, context):
+    """
+    Asynchronous task exporting the remote monitoring report to S3
+    """
+    logger.info("Exporting remote monitoring report %s", event.get("export_id"))
+    progress = run_export(get_reusable_connection(), event, context)
+    if progress is None:
+        return {"statusCode": 200, "body": json.dumps({"status": "skipped"})}
+    return {"statusCode": 200, "body": json.dumps(progress)}
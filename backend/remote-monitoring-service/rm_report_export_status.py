@@ -0,0 +1,46 @@
+import json
+import logging
+from http import HTTPStatus
+
+from rm_report_export import get_export_url
+from shared import get_db_connect, get_headers, read_as_dict
+from sqls.remote_monitoring import GET_REPORT_EXPORT
+
+connection = get_db_connect()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def get_export_status(cnx, org_id, export_id):
+    """
+    Returns the status and progress of the export of the org.
+    A presigned download url is added once the export is completed
+    """
+    export = read_as_dict(
+        cnx,
+        GET_REPORT_EXPORT,
+        {"export_id": export_id, "org_id": org_id},
+        fetchone=True,
+    )
+    if not export:
+        return HTTPStatus.NOT_FOUND, {"message": "Export not found"}
+    if export["status"] == "completed":
+        export["url"] = get_export_url(export["s3_key"])
+    export.pop("s3_key")
+    return HTTPStatus.OK, export
+
+
+def lambda_handler(event, context):
+    """
+    Handler function polled by the client for the progress of a report export
+    """
+    auth_user = event["requestContext"].get("authorizer")
+    export_id = event["pathParameters"].get("export_id")
+    status_code, result = get_export_status(
+        connection, auth_user["userOrg"], export_id
+    )
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(result, default=str),
+        "headers": get_headers(),
+    }
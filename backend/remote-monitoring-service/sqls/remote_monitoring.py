@@ -20,19 +20,9 @@ WHERE
         AND providers.remote_monitoring = 'Y'
 """
 
-GET_DEVICE_DETAILS = """
-SELECT 
-    *
-FROM
-    device_pairing
-WHERE
-    patient_internal_id = %(patient_id)s;
-"""
-
-GET_CONNECTED_PROVIDERS_WITH_PATIENT = """
+REMOTE_BILLING_PROVIDERS = """
 SELECT 
     providers.id,
-    providers.username,
     providers.activated,
     providers.name,
     providers.internal_id,
@@ -44,97 +34,227 @@ SELECT
 FROM
     providers
         JOIN
-    networks ON providers.internal_id = networks.user_internal_id
-        JOIN
     provider_org ON providers.id = provider_org.providers_id
 WHERE
-    networks._patient_id = %(patient_id)s
-        AND provider_org.organizations_id = %(org_id)s;
+    provider_org.organizations_id = %(org_id)s
+        AND providers.billing_permission = 'Y'
+        AND providers.remote_monitoring = 'Y';
 """
-GET_BILLING_DATE_OF_SERVICE = """
+
+# Set based queries used by the report engine, one query per dataset
+# for all patients of the report
+
+GET_PATIENTS_OF_PROVIDERS = """
 SELECT 
-    billing_charge_code, date_of_service, provider_name
+    networks.user_internal_id AS provider_internal_id,
+    patients.activated,
+    patients.id,
+    patients.external_id,
+    patients.internal_id,
+    patients.remote_monitoring
 FROM
-    billing_detail
+    patients
+        INNER JOIN
+    networks ON patients.id = networks._patient_id
 WHERE
-    billing_detail.patient_internal_id = %(patient_id)s
-        AND billing_detail.`status` = 'Approve'
-    AND (%(code_nine_four)s is NULL OR (billing_detail.date_of_service >= %(start_dt)s 
-         AND billing_detail.date_of_service <= %(end_dt)s))
-ORDER BY billing_detail.date_of_service DESC;
+    networks.user_internal_id IN %(provider_ids)s
+        AND patients.remote_monitoring = 'Y'
+ORDER BY networks.id;
 """
 
-GET_CALL_DURATION = """
+GET_DEVICE_DETAILS_OF_PATIENTS = """
 SELECT 
-    call_logs.id, call_logs.start_timestamp, call_logs.duration
+    patient_internal_id, imei, start_date, end_date
 FROM
-    call_logs
+    device_pairing
 WHERE
-    call_logs.patient_internal_id = %(patient_id)s
-        AND call_logs.provider_internal_id IN %(prv_ids)s
-        AND call_logs.start_timestamp >= %(start_dt)s
-        AND call_logs.start_timestamp <= %(end_dt)s ;
+    patient_internal_id IN %(patient_ids)s
+ORDER BY id;
 """
 
-GET_BILLING_DETAIL = """
+GET_CONNECTED_PROVIDERS_WITH_PATIENTS = """
 SELECT 
-    billing_charge_code,
-    DATE_FORMAT(date_of_service, '%%a, %%d %%b %%Y %%T') AS date_of_service,
-    provider_name,
-    billing_detail.`status`
+    networks._patient_id AS patient_id,
+    providers.id,
+    providers.name,
+    providers.internal_id,
+    providers.`role`,
+    providers.remote_monitoring
 FROM
-    billing_detail
+    providers
+        JOIN
+    networks ON providers.internal_id = networks.user_internal_id
+        JOIN
+    provider_org ON providers.id = provider_org.providers_id
 WHERE
-    billing_detail.patient_internal_id = %(patient_id)s
-        AND billing_detail.date_of_service >= %(start_dt)s
-        AND billing_detail.date_of_service <= %(end_dt)s
-        AND billing_detail.`status` = 'Approve'
+    networks._patient_id IN %(patient_ids)s
+        AND provider_org.organizations_id = %(org_id)s;
 """
 
-GET_DEVICE_READING_COUNT = """
+GET_CALL_TOTALS_OF_PATIENTS = """
 SELECT 
-    COUNT(DISTINCT(reading_date)) AS reading_count
+    call_log_monthly_totals.patient_internal_id,
+    call_log_monthly_totals.provider_internal_id,
+    call_log_monthly_totals.period,
+    SUM(call_log_monthly_totals.total_duration) AS duration
 FROM
-    device_pairing_view
+    call_log_monthly_totals
 WHERE
-    reading_date >= %(start_dt)s
-        AND reading_date <= %(end_dt)s
-        AND patient_internal_id = %(patient_id)s;
+    call_log_monthly_totals.patient_internal_id IN %(patient_ids)s
+        AND call_log_monthly_totals.period >= %(start_period)s
+        AND call_log_monthly_totals.period <= %(end_period)s
+        AND call_log_monthly_totals.`status` <> 'DELETED'
+GROUP BY call_log_monthly_totals.patient_internal_id,
+    call_log_monthly_totals.provider_internal_id,
+    call_log_monthly_totals.period;
 """
 
-GET_PROVIDER_NETWORK = """
+GET_CALL_TOTALS_OF_PATIENT_AND_PROVIDERS = """
 SELECT 
-    patients.activated,
-    patients.id,
-    patients.external_id,
-    patients.internal_id,
-    patients.remote_monitoring
+    call_log_monthly_totals.period,
+    SUM(call_log_monthly_totals.total_duration) AS duration
 FROM
-    patients
-        INNER JOIN
-    networks ON patients.id = networks._patient_id
+    call_log_monthly_totals
 WHERE
-    networks.user_internal_id = %(provider_id)s
-        AND patients.remote_monitoring = 'Y';
+    call_log_monthly_totals.patient_internal_id = %(patient_id)s
+        AND call_log_monthly_totals.provider_internal_id IN %(provider_ids)s
+        AND call_log_monthly_totals.period >= %(start_period)s
+        AND call_log_monthly_totals.period <= %(end_period)s
+        AND call_log_monthly_totals.`status` <> 'DELETED'
+GROUP BY call_log_monthly_totals.period;
 """
 
-REMOTE_BILLING_PROVIDERS = """
-SELECT 
-    providers.id,
-    providers.activated,
-    providers.name,
-    providers.internal_id,
-    providers.`role`,
-    providers.`group`,
-    providers.specialty,
-    providers.remote_monitoring,
-    providers.billing_permission
+GET_READING_DATES_OF_PATIENTS = """
+SELECT DISTINCT
+    patient_internal_id, reading_date
+FROM
+    device_reading_daily
+WHERE
+    patient_internal_id IN %(patient_ids)s
+        AND reading_date >= %(start_dt)s
+        AND reading_date <= %(end_dt)s;
+"""
+
+# RPM eligibility snapshots, one row per org, billing period, patient
+# and provider with the patient in network
+
+GET_ORGS_WITH_RM_ENABLED = """
+SELECT DISTINCT
+    provider_org.organizations_id AS org_id
 FROM
     providers
         JOIN
     provider_org ON providers.id = provider_org.providers_id
 WHERE
-    provider_org.organizations_id = %(org_id)s
-        AND providers.billing_permission = 'Y'
+    providers.`role` = 'physician'
         AND providers.remote_monitoring = 'Y';
 """
+
+GET_RPM_ELIGIBILITY_SNAPSHOTS = """
+SELECT 
+    provider_internal_id, record, refreshed_on
+FROM
+    rpm_eligibility_snapshots
+WHERE
+    org_id = %(org_id)s
+        AND period_start = %(period_start)s
+ORDER BY provider_internal_id, patient_internal_id
+"""
+
+DELETE_RPM_ELIGIBILITY_SNAPSHOTS = """
+DELETE FROM rpm_eligibility_snapshots
+WHERE
+    org_id = %(org_id)s
+    AND period_start = %(period_start)s
+"""
+
+DELETE_RPM_ELIGIBILITY_SNAPSHOT_OF_PATIENT = """
+DELETE FROM rpm_eligibility_snapshots
+WHERE
+    org_id = %(org_id)s
+    AND period_start = %(period_start)s
+    AND patient_internal_id = %(patient_internal_id)s
+"""
+
+UPSERT_RPM_ELIGIBILITY_SNAPSHOT = """
+INSERT INTO rpm_eligibility_snapshots (
+    org_id, period_start, patient_internal_id, provider_internal_id,
+    days_recorded, interactive_minutes, last_99453_date,
+    next_window_start, record, refreshed_on
+)
+VALUES (
+    %(org_id)s, %(period_start)s, %(patient_internal_id)s, %(provider_internal_id)s,
+    %(days_recorded)s, %(interactive_minutes)s, %(last_99453_date)s,
+    %(next_window_start)s, %(record)s, %(refreshed_on)s
+)
+ON DUPLICATE KEY UPDATE
+    days_recorded = VALUES(days_recorded),
+    interactive_minutes = VALUES(interactive_minutes),
+    last_99453_date = VALUES(last_99453_date),
+    next_window_start = VALUES(next_window_start),
+    record = VALUES(record),
+    refreshed_on = VALUES(refreshed_on)
+"""
+
+# Report exports, progress of the export job polled by the client
+
+INSERT_REPORT_EXPORT = """
+INSERT INTO rm_report_exports (
+    export_id, org_id, provider_internal_id, requested_by,
+    export_format, start_date, end_date, status,
+    patients_total, patients_done, rows_written,
+    s3_key, created_on, updated_on
+)
+VALUES (
+    %(export_id)s, %(org_id)s, %(provider_internal_id)s, %(requested_by)s,
+    %(export_format)s, %(start_date)s, %(end_date)s, %(status)s,
+    0, 0, 0,
+    %(s3_key)s, %(created_on)s, %(created_on)s
+)
+"""
+
+CLAIM_REPORT_EXPORT = """
+UPDATE rm_report_exports
+SET
+    status = 'running',
+    updated_on = %(updated_on)s
+WHERE
+    export_id = %(export_id)s
+        AND status = 'queued'
+"""
+
+UPDATE_REPORT_EXPORT_PROGRESS = """
+UPDATE rm_report_exports
+SET
+    status = %(status)s,
+    patients_total = %(patients_total)s,
+    patients_done = %(patients_done)s,
+    rows_written = %(rows_written)s,
+    error = %(error)s,
+    updated_on = %(updated_on)s
+WHERE
+    export_id = %(export_id)s
+"""
+
+GET_REPORT_EXPORT = """
+SELECT 
+    export_id,
+    org_id,
+    provider_internal_id,
+    export_format,
+    start_date,
+    end_date,
+    status,
+    patients_total,
+    patients_done,
+    rows_written,
+    s3_key,
+    error,
+    created_on,
+    updated_on
+FROM
+    rm_report_exports
+WHERE
+    export_id = %(export_id)s
+        AND org_id = %(org_id)s
+"""
@@ -2,6 +2,8 @@ import json
 import logging
 from http import HTTPStatus
 
+from custom_exception import GeneralException
+from reference_data import get_reference_data, reference_data_response
 from shared import get_db_connect, get_headers, read_as_dict
 from sqls.user import GET_DIAGNOSIS
 
@@ -14,17 +16,25 @@ def load_diagnosis(cnx):
     """
     Get the Diagnosis List
     """
-    result = read_as_dict(cnx, GET_DIAGNOSIS)
-    return HTTPStatus.OK, result
+    return read_as_dict(cnx, GET_DIAGNOSIS)
 
 
 def lambda_handler(event, context):
     """
     Handler Function
     """
-    status_code, result = load_diagnosis(connection)
-    return {
-        "statusCode": status_code.value,
-        "body": json.dumps(result),
-        "headers": get_headers(),
-    }
+    try:
+        body, etag = get_reference_data(
+            connection,
+            "user_diagnosis",
+            ["code_detail", "code_category"],
+            load_diagnosis,
+        )
+    except GeneralException as err:
+        logger.exception(err)
+        return {
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR,
+            "body": json.dumps(str(err)),
+            "headers": get_headers(),
+        }
+    return reference_data_response(event, body, etag)